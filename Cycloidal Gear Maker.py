@@ -1,13 +1,30 @@
 # Assuming you have not changed the general structure of the template no modification is needed in this file.
-from . import commands
+import time
+
+import_start = time.perf_counter()
+
+from . import commands, config
 from .lib import fusion360utils as futil
 
+# Startup cost: importing the add-in's modules, and running every command's start()
+import_ms: float = (time.perf_counter() - import_start) * 1000
+start_ms: float = 0.0
+
 
 def run(context):
+    global start_ms
     try:
         # This will run the start function in each of your commands as defined in commands/__init__.py
 
+        start = time.perf_counter()
         commands.start()
+        start_ms = (time.perf_counter() - start) * 1000
+
+        message = f"Add-in imported in {import_ms:.1f} ms, started in {start_ms:.1f} ms"
+        if import_ms + start_ms > config.STARTUP_BUDGET_MS:
+            futil.log(f"Slow startup: {message}", force_console=True)
+        elif config.DEBUG:
+            futil.log(message)
 
     except:
         futil.handle_error("run")
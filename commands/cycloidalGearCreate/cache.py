@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional, Union
+
+from .profile import ProfileSample
+from .spline import SplineFit
+
+# Only these values change the rotor profile, so changing anything else (output
+# pins, spacing, thicknesses) reuses the cached lobe points.
+PROFILE_KEY_FIELDS = (
+    "rotor_diameter",
+    "ring_gear_pins",
+    "ring_gear_pin_radius",
+    "eccentric_offset",
+    "profile_tolerance",
+)
+
+
+# Hashed into every key. Bump it whenever the sampler, the spline fit or the
+# stored entry format changes, so profiles spilled to disk by an earlier
+# version of the add-in are not served again.
+CACHE_VERSION = 1
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    bytes: int = 0
+
+
+class ProfileCache:
+    def __init__(self, capacity: int = 32, directory: Optional[str] = None):
+        self._capacity = capacity
+        self._directory = directory
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = CacheStats()
+        # Guards the entries and stats; profiles are computed outside it so
+        # different keys can be computed on different threads.
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(settings) -> str:
+        values = [f"v{CACHE_VERSION}"] + [
+            repr(getattr(settings, name)) for name in PROFILE_KEY_FIELDS
+        ]
+        return hashlib.sha1(",".join(values).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def spline_key(settings) -> str:
+        # A lobe spline depends on the profile and the fit tolerance
+        value = f"{ProfileCache.key(settings)},{settings.spline_fit_tolerance!r}"
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        path = self._path(key)
+        return path is not None and os.path.exists(path)
+
+    def get(self, settings, compute: Callable[[], ProfileSample]) -> ProfileSample:
+        return self._get(ProfileCache.key(settings), compute, ProfileSample)
+
+    def get_spline(self, settings, compute: Callable[[], SplineFit]) -> SplineFit:
+        return self._get(ProfileCache.spline_key(settings), compute, SplineFit)
+
+    def _get(self, key: str, compute: Callable, entry_type: type):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[0]
+
+        sample = self._load(key, entry_type)
+        loaded = sample is not None
+        if not loaded:
+            sample = compute()
+            self._store(key, sample)
+
+        with self._lock:
+            if loaded:
+                self.stats.disk_hits += 1
+            else:
+                self.stats.misses += 1
+            self._insert(key, sample)
+        return sample
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats.bytes = 0
+
+    def _insert(self, key: str, sample: Union[ProfileSample, SplineFit]):
+        size = 16 * (len(sample.xs) + len(sample.ys))
+        self._entries[key] = (sample, size)
+        self.stats.bytes += size
+
+        while len(self._entries) > self._capacity:
+            (_, (_, evicted_size)) = self._entries.popitem(last=False)
+            self.stats.bytes -= evicted_size
+            self.stats.evictions += 1
+
+    def _path(self, key: str) -> Optional[str]:
+        if self._directory is None:
+            return None
+        return os.path.join(self._directory, f"{key}.json")
+
+    def _load(self, key: str, entry_type: type):
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "r") as f:
+                return entry_type(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store(self, key: str, sample: Union[ProfileSample, SplineFit]):
+        path = self._path(key)
+        if path is None:
+            return
+
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(asdict(sample), f)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
@@ -5,12 +5,16 @@ import adsk.fusion
 
 from ... import config
 from ...lib import fusion360utils as futil
-from .logic import CycloidalGearLogic
+from .timing import timer
 
 app = adsk.core.Application.get()
 ui = app.userInterface
 
-cycloidal_gear_logic: CycloidalGearLogic = None
+timer.enabled = config.TIMING
+
+# logic (and with it settings, kernel and profile) is imported on the first
+# command_created, so add-in startup only registers the button.
+cycloidal_gear_logic = None
 
 # TODO *** Specify the command identity information. ***
 CMD_ID = f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_cmdDialog"
@@ -37,6 +41,7 @@ local_handlers = []
 
 
 # Executed when add-in is run.
+@timer.timed("start")
 def start():
     # Create a command Definition.
     cmd_def = ui.commandDefinitions.addButtonDefinition(
@@ -82,10 +87,15 @@ def stop():
 
 # Function that is called when a user clicks the corresponding button in the UI.
 # This defines the contents of the command dialog and connects to the command related events.
+@timer.timed("command_created")
 def command_created(args: adsk.core.CommandCreatedEventArgs):
     # General logging for debug.
     futil.log(f"{CMD_NAME} Command Created Event")
 
+    # Each dialog starts from empty histograms, so the timings saved with a
+    # design only hold this command's stages
+    timer.reset()
+
     # https://help.autodesk.com/view/fusion360/ENU/?contextId=CommandInputs
     inputs = args.command.commandInputs
 
@@ -112,6 +122,9 @@ def command_created(args: adsk.core.CommandCreatedEventArgs):
     if des is None:
         return
 
+    with timer.stage("import_logic"):
+        from .logic import CycloidalGearLogic
+
     # Create an instance of the Cycloidal Gear command class
     global cycloidal_gear_logic
     cycloidal_gear_logic = CycloidalGearLogic(des=des)
@@ -124,6 +137,7 @@ def command_created(args: adsk.core.CommandCreatedEventArgs):
 
 # This event handler is called when the user clicks the OK button in the command dialog or
 # is immediately called after the created event not command inputs were created for the dialog.
+@timer.timed("command_execute")
 def command_execute(args: adsk.core.CommandEventArgs):
     # General logging for debug.
     futil.log(f"{CMD_NAME} Command Execute Event")
@@ -132,13 +146,17 @@ def command_execute(args: adsk.core.CommandEventArgs):
 
 
 # This event handler is called when the command needs to compute a new preview in the graphics window.
+@timer.timed("command_preview")
 def command_preview(args: adsk.core.CommandEventArgs):
     # General logging for debug.
     futil.log(f"{CMD_NAME} Command Preview Event")
 
+    cycloidal_gear_logic.HandlePreview(args)
+
 
 # This event handler is called when the user changes anything in the command dialog
 # allowing you to modify values of other inputs based on that change.
+@timer.timed("command_input_changed")
 def command_input_changed(args: adsk.core.InputChangedEventArgs):
     futil.log(f"{CMD_NAME} Input Changed Event fired from a change to {args.input.id}")
 
@@ -147,6 +165,7 @@ def command_input_changed(args: adsk.core.InputChangedEventArgs):
 
 # This event handler is called when the user interacts with any of the inputs in the dialog
 # which allows you to verify that all of the inputs are valid and enables the OK button.
+@timer.timed("command_validate_input")
 def command_validate_input(args: adsk.core.ValidateInputsEventArgs):
     # General logging for debug.
     futil.log(f"{CMD_NAME} Validate Input Event")
@@ -155,6 +174,7 @@ def command_validate_input(args: adsk.core.ValidateInputsEventArgs):
 
 
 # This event handler is called when the command terminates.
+@timer.timed("command_destroy")
 def command_destroy(args: adsk.core.CommandEventArgs):
     # General logging for debug.
     futil.log(f"{CMD_NAME} Command Destroy Event")
@@ -0,0 +1,253 @@
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import IO, Iterable, List, Optional, Sequence
+
+from . import kernel
+from .cache import ProfileCache
+from .settings import CycloidalGearSettings
+from .sweep import load_grid, make_settings
+
+# 2D cutting files for every part, straight from the kernel geometry. Writers
+# stream each entity to the file as it is produced, so a rotor outline of any
+# size is never formatted into one string. Output is in millimetres; the ring
+# gear bore is written as exact arcs, with the pin fillets of the Fusion body
+# wherever they fit.
+
+MM_PER_CM = 10.0
+FORMATS = ("dxf", "svg")
+
+
+@dataclass
+class Part:
+    name: str
+    polylines: List[kernel.Polyline] = field(default_factory=list)
+    circles: List[kernel.Circle] = field(default_factory=list)
+    # Closed chains of arcs, each arc starting where the previous one ends
+    contours: List[List[kernel.Arc]] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    def extent(self) -> float:
+        # Radius about the origin that contains the whole part
+        radius = 0.0
+        for polyline in self.polylines:
+            radius = max(
+                radius, max(math.hypot(x, y) for (x, y) in zip(polyline.xs, polyline.ys))
+            )
+        for circle in self.circles:
+            radius = max(radius, math.hypot(circle.x, circle.y) + circle.radius)
+        for contour in self.contours:
+            for arc in contour:
+                radius = max(radius, math.hypot(arc.x, arc.y) + arc.radius)
+        return radius
+
+
+def gear_parts(
+    settings: CycloidalGearSettings, cache: Optional[ProfileCache] = None
+) -> List[Part]:
+    geometry = kernel.build_gear(settings, cache)
+    rotor = geometry.rotors[0]
+    (bore, warning) = kernel.filleted_ring_gear_bore(settings, geometry)
+    return [
+        Part(
+            "rotor",
+            polylines=[rotor.outline],
+            circles=[rotor.bearing_hole] + rotor.output_holes,
+        ),
+        Part("camshaft", circles=[geometry.cams[0].circle]),
+        Part(
+            "ring_gear",
+            circles=[geometry.housing[1]],
+            contours=[bore],
+            warnings=[warning] if warning else [],
+        ),
+        Part("output", circles=[geometry.output_plate] + geometry.output_pins),
+    ]
+
+
+class DxfWriter:
+    # AutoCAD R12 entities only (POLYLINE/VERTEX, CIRCLE, ARC), which every
+    # CAM package reads.
+    def __init__(self, f: IO[str], extent: float):
+        self._f = f
+        size = extent * MM_PER_CM
+        f.write(
+            "0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n"
+            f"9\n$EXTMIN\n10\n{-size:.6f}\n20\n{-size:.6f}\n30\n0.0\n"
+            f"9\n$EXTMAX\n10\n{size:.6f}\n20\n{size:.6f}\n30\n0.0\n0\nENDSEC\n"
+        )
+        f.write("0\nSECTION\n2\nENTITIES\n")
+
+    def polyline(self, polyline: kernel.Polyline, layer: str):
+        f = self._f
+        f.write(
+            f"0\nPOLYLINE\n8\n{layer}\n66\n1\n70\n{1 if polyline.closed else 0}\n"
+            "10\n0.0\n20\n0.0\n30\n0.0\n"
+        )
+        vertex = f"0\nVERTEX\n8\n{layer}\n10\n%.6f\n20\n%.6f\n30\n0.0\n"
+        f.writelines(
+            vertex % (x * MM_PER_CM, y * MM_PER_CM)
+            for (x, y) in zip(polyline.xs, polyline.ys)
+        )
+        f.write(f"0\nSEQEND\n8\n{layer}\n")
+
+    def circle(self, circle: kernel.Circle, layer: str):
+        self._f.write(
+            f"0\nCIRCLE\n8\n{layer}\n10\n{circle.x * MM_PER_CM:.6f}\n"
+            f"20\n{circle.y * MM_PER_CM:.6f}\n30\n0.0\n"
+            f"40\n{circle.radius * MM_PER_CM:.6f}\n"
+        )
+
+    def contour(self, arcs: List[kernel.Arc], layer: str):
+        for arc in arcs:
+            # DXF arcs always run counter-clockwise from 50 to 51
+            start = arc.start + min(arc.sweep, 0.0)
+            end = start + abs(arc.sweep)
+            self._f.write(
+                f"0\nARC\n8\n{layer}\n10\n{arc.x * MM_PER_CM:.6f}\n"
+                f"20\n{arc.y * MM_PER_CM:.6f}\n30\n0.0\n"
+                f"40\n{arc.radius * MM_PER_CM:.6f}\n"
+                f"50\n{math.degrees(start):.6f}\n51\n{math.degrees(end):.6f}\n"
+            )
+
+    def close(self):
+        self._f.write("0\nENDSEC\n0\nEOF\n")
+
+
+class SvgWriter:
+    # y is flipped so the drawing matches the Fusion top view
+    def __init__(self, f: IO[str], extent: float):
+        self._f = f
+        size = 2 * extent * MM_PER_CM
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{size:.4f}mm" '
+            f'height="{size:.4f}mm" viewBox="{-size / 2:.4f} {-size / 2:.4f} '
+            f'{size:.4f} {size:.4f}">\n'
+            '<g fill="none" stroke="black" stroke-width="0.1">\n'
+        )
+
+    def polyline(self, polyline: kernel.Polyline, layer: str):
+        f = self._f
+        points = zip(polyline.xs, polyline.ys)
+        (x, y) = next(points)
+        f.write(f'<path id="{layer}" d="M{x * MM_PER_CM:.6f} {-y * MM_PER_CM:.6f}L')
+        f.writelines(" %.6f %.6f" % (x * MM_PER_CM, -y * MM_PER_CM) for (x, y) in points)
+        f.write('Z"/>\n' if polyline.closed else '"/>\n')
+
+    def circle(self, circle: kernel.Circle, layer: str):
+        self._f.write(
+            f'<circle cx="{circle.x * MM_PER_CM:.6f}" cy="{-circle.y * MM_PER_CM:.6f}" '
+            f'r="{circle.radius * MM_PER_CM:.6f}"/>\n'
+        )
+
+    def contour(self, arcs: List[kernel.Arc], layer: str):
+        (x, y) = arcs[0].point(0)
+        self._f.write(f'<path id="{layer}" d="M{x * MM_PER_CM:.6f} {-y * MM_PER_CM:.6f}')
+        for arc in arcs:
+            (x, y) = arc.point(1)
+            radius = arc.radius * MM_PER_CM
+            large = 1 if abs(arc.sweep) > math.pi else 0
+            # Flipping y turns the part's clockwise into SVG's positive direction
+            sweep = 1 if arc.sweep < 0 else 0
+            self._f.write(
+                f"A{radius:.6f} {radius:.6f} 0 {large} {sweep} "
+                f"{x * MM_PER_CM:.6f} {-y * MM_PER_CM:.6f}"
+            )
+        self._f.write('Z"/>\n')
+
+    def close(self):
+        self._f.write("</g>\n</svg>\n")
+
+
+WRITERS = {"dxf": DxfWriter, "svg": SvgWriter}
+
+
+def write_part(part: Part, path: str, format: str):
+    extent = part.extent()
+    with open(path, "w", newline="\n", buffering=1 << 16) as f:
+        writer = WRITERS[format](f, extent)
+        for polyline in part.polylines:
+            writer.polyline(polyline, part.name)
+        for circle in part.circles:
+            writer.circle(circle, part.name)
+        for contour in part.contours:
+            writer.contour(contour, part.name)
+        writer.close()
+
+
+def export_gear(
+    settings: CycloidalGearSettings,
+    directory: str,
+    formats: Sequence[str] = FORMATS,
+    cache: Optional[ProfileCache] = None,
+) -> List[str]:
+    os.makedirs(directory, exist_ok=True)
+    paths: List[str] = []
+    for part in gear_parts(settings, cache):
+        # Reported here, since batch exports run in worker processes
+        for warning in part.warnings:
+            print(f"{os.path.join(directory, part.name)}: {warning}", file=sys.stderr)
+        for format in formats:
+            path = os.path.join(directory, f"{part.name}.{format}")
+            write_part(part, path, format)
+            paths.append(path)
+    return paths
+
+
+def _export_record(record) -> List[str]:
+    (directory, overrides, formats) = record
+    return export_gear(make_settings(overrides), directory, formats)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Write DXF and SVG outlines of every cycloidal gear part."
+    )
+    parser.add_argument(
+        "grid",
+        nargs="?",
+        help="settings overrides as for the sweep; one sub-directory per variant",
+    )
+    parser.add_argument("-o", "--output", default=".", help="output directory")
+    parser.add_argument(
+        "-f", "--format", nargs="+", choices=FORMATS, default=list(FORMATS)
+    )
+    parser.add_argument(
+        "--tolerance", type=float, help="rotor profile tolerance (cm)"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, help="worker processes (default: all cores)"
+    )
+    args = parser.parse_args(argv)
+
+    grid = load_grid(args.grid) if args.grid else [{}]
+    if args.tolerance is not None:
+        grid = [dict(overrides, profile_tolerance=args.tolerance) for overrides in grid]
+
+    if len(grid) == 1:
+        records = [(args.output, grid[0], args.format)]
+    else:
+        records = [
+            (os.path.join(args.output, str(index)), overrides, args.format)
+            for (index, overrides) in enumerate(grid)
+        ]
+
+    start = time.perf_counter()
+    count = 0
+    if len(records) == 1:
+        count = len(_export_record(records[0]))
+    else:
+        with multiprocessing.Pool(args.workers) as pool:
+            for paths in pool.imap_unordered(_export_record, records):
+                count += len(paths)
+
+    print(
+        f"{len(records)} variants, {count} files, {time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+    return 0
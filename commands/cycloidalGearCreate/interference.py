@@ -0,0 +1,197 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from . import kernel
+from .settings import CycloidalGearSettings
+
+# Clearance between the rotor and the ring pins, housing and output pins over a
+# full input rotation. With crank angle phi the rotor centre sits at
+# e (cos phi, sin phi) and the rotor turns by -phi / rotor_lobes. Turning the
+# whole drive by one pin pitch maps pin j onto pin j + 1 and phi onto
+# phi + 2 pi / ring_gear_pins, so only one pin pitch of crank angles has to be
+# computed; the rest of the rotation is the same curve with the pins renumbered.
+
+
+class OutlineIndex:
+    # Buckets the segments of a closed outline by polar angle so the segments
+    # near a point can be found without scanning the whole outline.
+    def __init__(self, outline: kernel.Polyline, buckets: int):
+        self.xs = outline.xs
+        self.ys = outline.ys
+        self.buckets = buckets
+        self._width = 2 * math.pi / buckets
+        self._segments: List[List[int]] = [[] for _ in range(buckets)]
+
+        count = len(self.xs)
+        for i in range(count):
+            j = (i + 1) % count
+            a0 = math.atan2(self.ys[i], self.xs[i])
+            a1 = math.atan2(self.ys[j], self.xs[j])
+            if a1 < a0:
+                (a0, a1) = (a1, a0)
+            if a1 - a0 > math.pi:
+                (a0, a1) = (a1, a0 + 2 * math.pi)
+            for b in range(math.floor(a0 / self._width), math.floor(a1 / self._width) + 1):
+                self._segments[b % buckets].append(i)
+
+    def nearest(
+        self, x: float, y: float, half_window: float
+    ) -> Tuple[float, float, float]:
+        # Signed distance (negative inside the outline) and the nearest point.
+        angle = math.atan2(y, x)
+        first = math.floor((angle - half_window) / self._width)
+        last = math.floor((angle + half_window) / self._width)
+
+        xs = self.xs
+        ys = self.ys
+        count = len(xs)
+        best = math.inf
+        best_segment = 0
+        best_t = 0.0
+        for b in range(first, last + 1):
+            for i in self._segments[b % self.buckets]:
+                j = (i + 1) % count
+                dx = xs[j] - xs[i]
+                dy = ys[j] - ys[i]
+                t = ((x - xs[i]) * dx + (y - ys[i]) * dy) / (dx * dx + dy * dy)
+                t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                d = (x - xs[i] - t * dx) ** 2 + (y - ys[i] - t * dy) ** 2
+                if d < best:
+                    best = d
+                    best_segment = i
+                    best_t = t
+
+        i = best_segment
+        j = (i + 1) % count
+        dx = xs[j] - xs[i]
+        dy = ys[j] - ys[i]
+        qx = xs[i] + best_t * dx
+        qy = ys[i] + best_t * dy
+        # The outline runs clockwise, so (-dy, dx) points outwards.
+        sign = 1 if (x - qx) * -dy + (y - qy) * dx >= 0 else -1
+        return (sign * math.sqrt(best), qx, qy)
+
+
+@dataclass
+class ClearanceResult:
+    crank_angles: List[float] = field(default_factory=list)
+    pin_clearance: List[float] = field(default_factory=list)
+    pin_index: List[int] = field(default_factory=list)
+    housing_clearance: List[float] = field(default_factory=list)
+    output_clearance: List[float] = field(default_factory=list)
+
+    @property
+    def worst_index(self) -> int:
+        return min(range(len(self.pin_clearance)), key=self.pin_clearance.__getitem__)
+
+    @property
+    def worst_angle(self) -> float:
+        return self.crank_angles[self.worst_index]
+
+    @property
+    def worst_pin(self) -> int:
+        return self.pin_index[self.worst_index]
+
+    @property
+    def minimum_clearance(self) -> float:
+        return min(self.pin_clearance)
+
+    @property
+    def minimum_housing_clearance(self) -> float:
+        return min(self.housing_clearance)
+
+    @property
+    def minimum_output_clearance(self) -> float:
+        return min(self.output_clearance)
+
+
+def period_samples(settings: CycloidalGearSettings, samples: int) -> int:
+    # Crank angles per pin pitch, so the full rotation is a whole number of
+    # repeats of the computed period.
+    return max(1, math.ceil(samples / settings.ring_gear_pins))
+
+
+def rotor_pose(
+    settings: CycloidalGearSettings, rotor: kernel.RotorGeometry, crank_angle: float
+) -> Tuple[float, float, float]:
+    e = rotor.eccentric_offset
+    return (
+        e * math.cos(crank_angle),
+        e * math.sin(crank_angle),
+        rotor.offset_angle - crank_angle / settings.rotor_lobes,
+    )
+
+
+def check_clearance(
+    settings: CycloidalGearSettings,
+    samples: int = 3600,
+    invert: bool = False,
+    geometry: Optional[kernel.GearGeometry] = None,
+) -> ClearanceResult:
+    if geometry is None:
+        geometry = kernel.build_gear(settings)
+    rotor = geometry.rotors[1 if invert else 0]
+    pins = geometry.ring_pins
+    pin_count = len(pins)
+    housing_radius = geometry.housing[0].radius
+
+    index = OutlineIndex(rotor.outline, 4 * pin_count)
+    half_window = 1.5 * math.pi / pin_count
+    per_period = period_samples(settings, samples)
+    total = per_period * pin_count
+
+    period_clearance: List[float] = []
+    period_pin: List[int] = []
+    period_housing: List[float] = []
+    period_output: List[float] = []
+    for k in range(per_period):
+        phi = 2 * math.pi * k / total
+        (cx, cy, w) = rotor_pose(settings, rotor, phi)
+        c = math.cos(w)
+        s = math.sin(w)
+
+        # Ring pins, moved into the rotor frame
+        best = math.inf
+        best_pin = 0
+        for (j, pin) in enumerate(pins):
+            px = pin.x - cx
+            py = pin.y - cy
+            (d, _, _) = index.nearest(px * c + py * s, -px * s + py * c, half_window)
+            if d - pin.radius < best:
+                best = d - pin.radius
+                best_pin = j
+        period_clearance.append(best)
+        period_pin.append(best_pin)
+
+        # Housing bore, against the farthest outline point
+        reach = max(
+            (cx + x * c - y * s) ** 2 + (cy + x * s + y * c) ** 2
+            for (x, y) in zip(rotor.outline.xs, rotor.outline.ys)
+        )
+        period_housing.append(housing_radius - math.sqrt(reach))
+
+        # Output holes against the output pins, which turn with the rotor
+        output_rotation = w - rotor.offset_angle
+        oc = math.cos(output_rotation)
+        os_ = math.sin(output_rotation)
+        period_output.append(
+            min(
+                hole.radius
+                - pin.radius
+                - math.hypot(
+                    cx + hole.x * c - hole.y * s - (pin.x * oc - pin.y * os_),
+                    cy + hole.x * s + hole.y * c - (pin.x * os_ + pin.y * oc),
+                )
+                for (hole, pin) in zip(rotor.output_holes, geometry.output_pins)
+            )
+        )
+
+    result = ClearanceResult()
+    for repeat in range(pin_count):
+        result.pin_clearance.extend(period_clearance)
+        result.pin_index.extend((j + repeat) % pin_count for j in period_pin)
+        result.housing_clearance.extend(period_housing)
+        result.output_clearance.extend(period_output)
+    result.crank_angles = [2 * math.pi * i / total for i in range(total)]
+    return result
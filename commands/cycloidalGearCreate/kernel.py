@@ -0,0 +1,471 @@
+import importlib
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+from .cache import ProfileCache
+from .profile import Epitrochoid, ProfileSample
+from .settings import CycloidalGearSettings
+from .spline import SplineFit, fit_lobe
+
+# Headless geometry for every part of the gear. Nothing here touches adsk, so
+# the same outlines drive the Fusion features in logic.py and can be generated,
+# profiled or exported on machines without Fusion 360. All coordinates are in
+# Fusion's internal units (cm) and in each part's component frame.
+
+
+@dataclass(frozen=True)
+class Circle:
+    x: float
+    y: float
+    radius: float
+
+
+@dataclass(frozen=True)
+class Arc:
+    # Angles in radians; a negative sweep runs clockwise
+    x: float
+    y: float
+    radius: float
+    start: float
+    sweep: float
+
+    def point(self, t: float) -> Tuple[float, float]:
+        angle = self.start + self.sweep * t
+        return (
+            self.x + self.radius * math.cos(angle),
+            self.y + self.radius * math.sin(angle),
+        )
+
+    def points(self, segments: int) -> Tuple[List[float], List[float]]:
+        angles = [self.start + self.sweep * i / segments for i in range(segments + 1)]
+        return (
+            [self.x + self.radius * math.cos(a) for a in angles],
+            [self.y + self.radius * math.sin(a) for a in angles],
+        )
+
+
+@dataclass
+class Polyline:
+    xs: List[float]
+    ys: List[float]
+    closed: bool = False
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+
+@dataclass
+class RotorGeometry:
+    lobe: Polyline
+    # Control points of one lobe, or None to draw through the lobe's points
+    lobe_spline: Optional[SplineFit]
+    outline: Polyline
+    bearing_hole: Circle
+    output_holes: List[Circle]
+    offset_angle: float
+    eccentric_offset: float
+    z_offset: float
+
+
+@dataclass
+class CamGeometry:
+    circle: Circle
+    z_offset: float
+
+
+@dataclass
+class GearGeometry:
+    rotors: List[RotorGeometry] = field(default_factory=list)
+    cams: List[CamGeometry] = field(default_factory=list)
+    ring_pins: List[Circle] = field(default_factory=list)
+    housing: Tuple[Circle, Circle] = None
+    output_pins: List[Circle] = field(default_factory=list)
+    output_plate: Circle = None
+    # Where each ring pin meets the housing bore; the vertical edges through
+    # these points are the ones the ring gear fillets.
+    fillet_points: List[Tuple[float, float]] = field(default_factory=list)
+
+
+# The settings each generated part is built from. A settings change rebuilds
+# only the parts whose inputs it touches; calculated values are followed back
+# to their fields, so output_pin_diameter reaches the rotor through
+# output_hole_diameter.
+PART_DEPENDENCIES: dict = {
+    "rotor": (
+        "rotor_thickness",
+        "rotor_spacing",
+        "rotor_radius",
+        "rotor_lobes",
+        "ring_gear_pin_radius",
+        "eccentric_offset",
+        "profile_tolerance",
+        "spline_fit_tolerance",
+        "rotor_bearing_hole_diameter",
+        "output_circle_diameter",
+        "output_hole_diameter",
+        "output_hole_count",
+    ),
+    "camshaft": (
+        "rotor_thickness",
+        "rotor_spacing",
+        "eccentric_offset",
+        "camshaft_diameter",
+    ),
+    "output": (
+        "ring_gear_thickness",
+        "output_circle_diameter",
+        "output_pin_diameter",
+        "output_hole_count",
+        "output_plate_thickness",
+    ),
+    "ring_gear": (
+        "ring_gear_thickness",
+        "rotor_radius",
+        "ring_gear_margin",
+        "ring_gear_pins",
+        "ring_gear_pin_radius",
+        "ring_gear_outer_diameter",
+    ),
+}
+
+
+def affected_parts(
+    previous: CycloidalGearSettings, settings: CycloidalGearSettings
+) -> List[str]:
+    changed = set(previous.changed_fields(settings))
+    return [
+        part
+        for (part, names) in PART_DEPENDENCIES.items()
+        if changed & CycloidalGearSettings.input_fields(names)
+    ]
+
+
+def circular_pattern(circle: Circle, count: int) -> List[Circle]:
+    radius = math.hypot(circle.x, circle.y)
+    start = math.atan2(circle.y, circle.x)
+    return [
+        Circle(
+            radius * math.cos(start + 2 * math.pi * i / count),
+            radius * math.sin(start + 2 * math.pi * i / count),
+            circle.radius,
+        )
+        for i in range(count)
+    ]
+
+
+def rotate(
+    xs: List[float], ys: List[float], angle: float
+) -> Tuple[List[float], List[float]]:
+    c = math.cos(angle)
+    s = math.sin(angle)
+    return (
+        [x * c - y * s for (x, y) in zip(xs, ys)],
+        [x * s + y * c for (x, y) in zip(xs, ys)],
+    )
+
+
+def circle_intersections(a: Circle, b: Circle) -> List[Tuple[float, float]]:
+    dx = b.x - a.x
+    dy = b.y - a.y
+    d = math.hypot(dx, dy)
+    if d == 0 or d > a.radius + b.radius or d < abs(a.radius - b.radius):
+        return []
+
+    # Distance from a's centre to the chord, and half the chord length
+    along = (d * d + a.radius * a.radius - b.radius * b.radius) / (2 * d)
+    half = math.sqrt(max(a.radius * a.radius - along * along, 0.0))
+    mx = a.x + dx * along / d
+    my = a.y + dy * along / d
+    return [
+        (mx - dy * half / d, my + dx * half / d),
+        (mx + dy * half / d, my - dx * half / d),
+    ]
+
+
+def ring_gear_bore(geometry: GearGeometry, fillet_radius: float = 0.0) -> List[Arc]:
+    # The inner boundary of the ring gear, counter-clockwise: for each pin the
+    # part of the pin inside the bore, then the bore up to the next pin. With a
+    # fillet radius, each pin meets the bore through a fillet arc tangent to
+    # both, as on the ring gear body.
+    bore = geometry.housing[0]
+    pins = geometry.ring_pins
+    # Centre of the fillet above the pin at angle 0, inside the bore and outside
+    # the pin; with no fillet this is where the pin crosses the bore
+    corners = circle_intersections(
+        Circle(0, 0, bore.radius - fillet_radius),
+        Circle(bore.radius, 0, pins[0].radius + fillet_radius),
+    )
+    if not corners:
+        raise ValueError("Ring gear pin fillets do not fit")
+    (fx, fy) = corners[0]
+    bore_half_angle = math.atan2(fy, fx)
+    pin_half_angle = math.atan2(fy, bore.radius - fx)
+    fillet_sweep = bore_half_angle + pin_half_angle
+
+    bore_sweep = 2 * math.pi / len(pins) - 2 * bore_half_angle
+    if bore_sweep <= 0:
+        overlapping = "pin fillets" if fillet_radius > 0 else "pins"
+        raise ValueError(f"Ring gear {overlapping} overlap")
+
+    arcs: List[Arc] = []
+    for pin in pins:
+        angle = math.atan2(pin.y, pin.x)
+        c = math.cos(angle)
+        s = math.sin(angle)
+        if fillet_radius > 0:
+            arcs.append(
+                Arc(
+                    fx * c + fy * s,
+                    fx * s - fy * c,
+                    fillet_radius,
+                    angle - bore_half_angle,
+                    fillet_sweep,
+                )
+            )
+        arcs.append(
+            Arc(
+                pin.x,
+                pin.y,
+                pin.radius,
+                angle + math.pi + pin_half_angle,
+                -2 * pin_half_angle,
+            )
+        )
+        if fillet_radius > 0:
+            arcs.append(
+                Arc(
+                    fx * c - fy * s,
+                    fx * s + fy * c,
+                    fillet_radius,
+                    angle - pin_half_angle,
+                    fillet_sweep,
+                )
+            )
+        arcs.append(Arc(0, 0, bore.radius, angle + bore_half_angle, bore_sweep))
+    return arcs
+
+
+def filleted_ring_gear_bore(
+    settings: CycloidalGearSettings, geometry: GearGeometry
+) -> Tuple[List[Arc], Optional[str]]:
+    # The bore with the pin fillets of the Fusion body, or, when the fillets
+    # would overlap, the bore without them and a warning to report
+    try:
+        return (ring_gear_bore(geometry, settings.ring_gear_pin_radius), None)
+    except ValueError as e:
+        return (ring_gear_bore(geometry), f"{e}; the bore is left without them")
+
+
+# Chord tolerance of the points a rotor spline is fitted to, as a fraction of
+# spline_fit_tolerance
+SPLINE_FIT_OVERSAMPLING = 16
+
+
+def rotor_lobe(
+    settings: CycloidalGearSettings, cache: Optional[ProfileCache] = None
+) -> ProfileSample:
+    trochoid = Epitrochoid.from_settings(settings)
+    compute = lambda: trochoid.sample_lobe_adaptive(settings.profile_tolerance)
+    if cache is None:
+        return compute()
+    return cache.get(settings, compute)
+
+
+def rotor_spline(
+    settings: CycloidalGearSettings, cache: Optional[ProfileCache] = None
+) -> Optional[SplineFit]:
+    tolerance = settings.spline_fit_tolerance
+    if tolerance <= 0:
+        return None
+
+    # Fitted to points sampled well inside the tolerance, so the spline follows
+    # the curve between them and not just the coarser profile points
+    def compute() -> SplineFit:
+        trochoid = Epitrochoid.from_settings(settings)
+        dense = trochoid.sample_lobe_adaptive(tolerance / SPLINE_FIT_OVERSAMPLING)
+        return fit_lobe(dense.xs, dense.ys, tolerance)
+
+    if cache is None:
+        return compute()
+    return cache.get_spline(settings, compute)
+
+
+def rotor_outline(settings: CycloidalGearSettings, lobe: ProfileSample) -> Polyline:
+    # Each lobe is the previous one turned by -lobe_angle; drop the last point
+    # of every lobe since it is the first point of the next.
+    lobe_angle = 2 * math.pi / settings.rotor_lobes
+    xs: List[float] = []
+    ys: List[float] = []
+    for i in range(settings.rotor_lobes):
+        (lxs, lys) = rotate(lobe.xs[:-1], lobe.ys[:-1], -lobe_angle * i)
+        xs.extend(lxs)
+        ys.extend(lys)
+    return Polyline(xs, ys, closed=True)
+
+
+def rotor(
+    settings: CycloidalGearSettings,
+    invert: bool,
+    z_offset: float,
+    lobe: ProfileSample,
+    lobe_spline: Optional[SplineFit] = None,
+) -> RotorGeometry:
+    eccentric_offset = settings.eccentric_offset
+    offset_angle = 0
+    if invert:
+        eccentric_offset *= -1
+        offset_angle = math.pi / settings.rotor_lobes
+
+    output_angle = -offset_angle + math.pi / 2
+    output_hole = Circle(
+        math.cos(output_angle) * settings.output_circle_diameter / 2,
+        math.sin(output_angle) * settings.output_circle_diameter / 2,
+        settings.output_hole_diameter / 2,
+    )
+
+    return RotorGeometry(
+        lobe=Polyline(list(lobe.xs), list(lobe.ys)),
+        lobe_spline=lobe_spline,
+        outline=rotor_outline(settings, lobe),
+        bearing_hole=Circle(0, 0, settings.rotor_bearing_hole_diameter / 2),
+        output_holes=circular_pattern(output_hole, settings.output_hole_count),
+        offset_angle=offset_angle,
+        eccentric_offset=eccentric_offset,
+        z_offset=z_offset,
+    )
+
+
+def build_gear(
+    settings: CycloidalGearSettings,
+    cache: Optional[ProfileCache] = None,
+    lobe_splines: bool = False,
+) -> GearGeometry:
+    # Only the Fusion build draws the rotors as splines, so only it asks for
+    # the spline fit
+    lobe = rotor_lobe(settings, cache)
+    lobe_spline = rotor_spline(settings, cache) if lobe_splines else None
+    z_offsets = (
+        settings.rotor_spacing,
+        settings.rotor_thickness + settings.rotor_spacing * 2,
+    )
+
+    geometry = GearGeometry()
+    for (invert, z_offset) in zip((False, True), z_offsets):
+        geometry.rotors.append(rotor(settings, invert, z_offset, lobe, lobe_spline))
+        geometry.cams.append(
+            CamGeometry(
+                circle=Circle(
+                    settings.eccentric_offset * (-1 if invert else 1),
+                    0,
+                    settings.camshaft_diameter / 2,
+                ),
+                z_offset=z_offset,
+            )
+        )
+
+    pin_circle_radius = settings.rotor_radius + settings.ring_gear_margin
+    geometry.ring_pins = circular_pattern(
+        Circle(pin_circle_radius, 0, settings.ring_gear_pin_radius),
+        settings.ring_gear_pins,
+    )
+    geometry.housing = (
+        Circle(0, 0, pin_circle_radius),
+        Circle(0, 0, settings.ring_gear_outer_diameter / 2),
+    )
+    geometry.fillet_points = [
+        point
+        for pin in geometry.ring_pins
+        for point in circle_intersections(geometry.housing[0], pin)
+    ]
+
+    geometry.output_pins = circular_pattern(
+        Circle(0, settings.output_circle_diameter / 2, settings.output_pin_diameter / 2),
+        settings.output_hole_count,
+    )
+    geometry.output_plate = Circle(
+        0, 0, settings.output_circle_diameter / 2 + settings.output_pin_diameter
+    )
+    return geometry
+
+
+def stage_profile(record: Tuple[dict, bool]) -> Tuple[dict, Optional[dict]]:
+    # Pool worker: the lobe and, when asked for, the lobe spline of one stage,
+    # as plain dicts in the form the profile cache stores on disk
+    (values, lobe_splines) = record
+    settings = CycloidalGearSettings.from_dict(values)
+    spline = rotor_spline(settings) if lobe_splines else None
+    return (asdict(rotor_lobe(settings)), None if spline is None else asdict(spline))
+
+
+def _profile_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    # Spawned workers import this module as cycloidalGearCreate.kernel from the
+    # commands directory, the way the tools do, since importing the add-in
+    # package needs Fusion. Inside Fusion sys.executable is Fusion itself, so
+    # the workers run the interpreter it bundles; without one there is no pool.
+    context = multiprocessing.get_context("spawn")
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        names = ("python.exe", os.path.join("bin", "python3"))
+        paths = [os.path.join(sys.exec_prefix, name) for name in names]
+        executables = [path for path in paths if os.path.exists(path)]
+        if not executables:
+            return None
+        context.set_executable(executables[0])
+
+    commands = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if commands not in sys.path:
+        sys.path.append(commands)
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+
+def build_stages(
+    stages: List[CycloidalGearSettings],
+    cache: Optional[ProfileCache] = None,
+    workers: Optional[int] = None,
+    lobe_splines: bool = False,
+) -> List[GearGeometry]:
+    # Geometry for every stage of a compound drive. The rotor profiles, and the
+    # lobe splines when asked for, that the cache does not hold yet are computed
+    # first across a process pool, then each stage picks them up from the
+    # cache; identical stages share one GearGeometry. workers=1 computes them
+    # in this process.
+    if cache is None:
+        cache = ProfileCache()
+    pending: dict = {}
+    for stage in stages:
+        keys = (ProfileCache.key(stage),)
+        if lobe_splines and stage.spline_fit_tolerance > 0:
+            keys += (ProfileCache.spline_key(stage),)
+        if any(key not in cache for key in keys):
+            pending[keys] = stage
+
+    processes = min(len(pending), workers or os.cpu_count() or 1)
+    pool = _profile_pool(processes) if processes > 1 else None
+    if pool is not None:
+        package = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+        worker = importlib.import_module(f"{package}.kernel").stage_profile
+        records = [(stage.to_dict(), lobe_splines) for stage in pending.values()]
+        try:
+            with pool:
+                results = list(pool.map(worker, records))
+        except (BrokenProcessPool, OSError):
+            # Workers that cannot start leave the profiles to this process
+            results = []
+        for (stage, (lobe, spline)) in zip(pending.values(), results):
+            cache.get(stage, lambda: ProfileSample(**lobe))
+            if spline is not None:
+                cache.get_spline(stage, lambda: SplineFit(**spline))
+
+    built: dict = {}
+    geometries: List[GearGeometry] = []
+    for stage in stages:
+        key = stage.dumps()
+        if key not in built:
+            built[key] = build_gear(stage, cache, lobe_splines)
+        geometries.append(built[key])
+    return geometries
@@ -0,0 +1,250 @@
+import argparse
+import json
+import math
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from . import kernel
+from .interference import OutlineIndex, period_samples, rotor_pose
+from .settings import CycloidalGearSettings
+
+# The drive over a full input rotation. The rotor centre and nominal rotation
+# follow from the crank angle exactly as _rotor places them; the actual rotation
+# is found by turning the rotor from its nominal pose until it touches a pin,
+# using the first-order gap of every pin (gap - rotation * lever arm). That
+# rotation is the transmission error, and the pins left touching are the
+# contacts. As in interference.py only one pin pitch is computed and the rest of
+# the rotation is the same data with the pins renumbered.
+
+
+@dataclass
+class Frame:
+    crank_angle: float
+    rotor_x: float
+    rotor_y: float
+    rotor_angle: float
+    output_angle: float
+    outline_xs: List[float]
+    outline_ys: List[float]
+
+
+@dataclass
+class KinematicsResult:
+    crank_angles: List[float] = field(default_factory=list)
+    rotor_x: List[float] = field(default_factory=list)
+    rotor_y: List[float] = field(default_factory=list)
+    rotor_angle: List[float] = field(default_factory=list)
+    output_angle: List[float] = field(default_factory=list)
+    # Loaded-flank rotation from the nominal pose, and the free play between
+    # the two flanks
+    transmission_error: List[float] = field(default_factory=list)
+    backlash: List[float] = field(default_factory=list)
+    # Pins touching the loaded flank, with their lever arms about the rotor
+    # centre
+    contact_pins: List[List[int]] = field(default_factory=list)
+    contact_levers: List[List[float]] = field(default_factory=list)
+    frames: List[Frame] = field(default_factory=list)
+    reduction_ratio: float = 0.0
+
+    @property
+    def peak_to_peak_error(self) -> float:
+        return max(self.transmission_error) - min(self.transmission_error)
+
+    @property
+    def rms_error(self) -> float:
+        mean = sum(self.transmission_error) / len(self.transmission_error)
+        return math.sqrt(
+            sum((e - mean) ** 2 for e in self.transmission_error)
+            / len(self.transmission_error)
+        )
+
+    @property
+    def mean_contacts(self) -> float:
+        return sum(len(pins) for pins in self.contact_pins) / len(self.contact_pins)
+
+    def summary(self) -> dict:
+        return {
+            "reduction_ratio": self.reduction_ratio,
+            "peak_to_peak_error": self.peak_to_peak_error,
+            "rms_error": self.rms_error,
+            "minimum_backlash": min(self.backlash),
+            "maximum_backlash": max(self.backlash),
+            "mean_contacts": self.mean_contacts,
+            "minimum_contacts": min(len(pins) for pins in self.contact_pins),
+        }
+
+
+def pin_contacts(
+    pins: List[kernel.Circle],
+    index: OutlineIndex,
+    half_window: float,
+    pose: Tuple[float, float, float],
+) -> List[Tuple[float, float, float, float]]:
+    # (gap, lever arm, normal x, normal y) per pin, the normal pointing from
+    # the rotor to the pin in the ring gear frame. Turning the rotor by a small
+    # angle a about its centre changes a pin's gap by -a * lever.
+    (cx, cy, w) = pose
+    c = math.cos(w)
+    s = math.sin(w)
+    contacts: List[Tuple[float, float, float, float]] = []
+    for pin in pins:
+        px = pin.x - cx
+        py = pin.y - cy
+        x = px * c + py * s
+        y = -px * s + py * c
+        (d, qx, qy) = index.nearest(x, y, half_window)
+        nx = x - qx
+        ny = y - qy
+        length = math.hypot(nx, ny)
+        if length == 0:
+            contacts.append((d - pin.radius, 0.0, 0.0, 0.0))
+            continue
+        if d < 0:
+            (nx, ny) = (-nx, -ny)
+        (nx, ny) = (nx / length, ny / length)
+        contacts.append(
+            (d - pin.radius, qx * ny - qy * nx, nx * c - ny * s, nx * s + ny * c)
+        )
+    return contacts
+
+
+def pin_gaps(
+    pins: List[kernel.Circle],
+    index: OutlineIndex,
+    half_window: float,
+    pose: Tuple[float, float, float],
+) -> List[Tuple[float, float]]:
+    # (gap, lever arm) per pin
+    return [
+        (gap, lever)
+        for (gap, lever, _, _) in pin_contacts(pins, index, half_window, pose)
+    ]
+
+
+def flank_rotation(gaps: List[Tuple[float, float]], direction: int) -> float:
+    # Rotation in the given direction until the first pin is touched
+    best = math.inf
+    for (gap, lever) in gaps:
+        if lever * direction > 0:
+            best = min(best, gap / (lever * direction))
+    return direction * best if best < math.inf else 0.0
+
+
+def simulate(
+    settings: CycloidalGearSettings,
+    samples: int = 36000,
+    invert: bool = False,
+    geometry: Optional[kernel.GearGeometry] = None,
+    frames: int = 0,
+) -> KinematicsResult:
+    if geometry is None:
+        geometry = kernel.build_gear(settings)
+    rotor = geometry.rotors[1 if invert else 0]
+    pins = geometry.ring_pins
+    pin_count = len(pins)
+    lobes = settings.rotor_lobes
+    tolerance = settings.profile_tolerance
+
+    index = OutlineIndex(rotor.outline, 4 * pin_count)
+    half_window = 1.5 * math.pi / pin_count
+    per_period = period_samples(settings, samples)
+    total = per_period * pin_count
+
+    # The output resists the rotor, so the loaded flank is the one the rotor
+    # turns towards: clockwise while the crank turns counter-clockwise.
+    loaded = -1
+    period_error: List[float] = []
+    period_backlash: List[float] = []
+    period_pins: List[List[int]] = []
+    period_levers: List[List[float]] = []
+    for k in range(per_period):
+        pose = rotor_pose(settings, rotor, 2 * math.pi * k / total)
+        gaps = pin_gaps(pins, index, half_window, pose)
+        error = flank_rotation(gaps, loaded)
+        period_error.append(error)
+        period_backlash.append(abs(flank_rotation(gaps, -loaded) - error))
+
+        touching: List[int] = []
+        levers: List[float] = []
+        for (j, (gap, lever)) in enumerate(gaps):
+            if lever * loaded > 0 and gap - error * lever <= tolerance:
+                touching.append(j)
+                levers.append(abs(lever))
+        period_pins.append(touching)
+        period_levers.append(levers)
+
+    result = KinematicsResult(reduction_ratio=-1 / lobes)
+    result.crank_angles = [2 * math.pi * i / total for i in range(total)]
+    for phi in result.crank_angles:
+        (cx, cy, w) = rotor_pose(settings, rotor, phi)
+        result.rotor_x.append(cx)
+        result.rotor_y.append(cy)
+        result.rotor_angle.append(w)
+    for repeat in range(pin_count):
+        result.transmission_error.extend(period_error)
+        result.backlash.extend(period_backlash)
+        result.contact_pins.extend(
+            [(j + repeat) % pin_count for j in touching] for touching in period_pins
+        )
+        result.contact_levers.extend(period_levers)
+    result.output_angle = [
+        w - rotor.offset_angle + error
+        for (w, error) in zip(result.rotor_angle, result.transmission_error)
+    ]
+
+    for i in range(0, total, max(1, total // frames) if frames else total + 1):
+        (cx, cy, w) = (result.rotor_x[i], result.rotor_y[i], result.rotor_angle[i])
+        (xs, ys) = kernel.rotate(rotor.outline.xs, rotor.outline.ys, w)
+        result.frames.append(
+            Frame(
+                crank_angle=result.crank_angles[i],
+                rotor_x=cx,
+                rotor_y=cy,
+                rotor_angle=w,
+                output_angle=result.output_angle[i],
+                outline_xs=[x + cx for x in xs],
+                outline_ys=[y + cy for y in ys],
+            )
+        )
+    return result
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Simulate the cycloidal drive over one input rotation."
+    )
+    parser.add_argument(
+        "settings", nargs="?", help="JSON settings file (default: default settings)"
+    )
+    parser.add_argument(
+        "-o", "--output", help="JSON output with every time series (default: summary)"
+    )
+    parser.add_argument(
+        "-n", "--samples", type=int, default=36000, help="crank angles per rotation"
+    )
+    parser.add_argument(
+        "--frames", type=int, default=0, help="rotor outlines to include for animation"
+    )
+    parser.add_argument(
+        "--invert", action="store_true", help="simulate the second rotor"
+    )
+    args = parser.parse_args(argv)
+
+    settings = CycloidalGearSettings()
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = CycloidalGearSettings.loads(f.read())
+
+    start = time.perf_counter()
+    result = simulate(settings, args.samples, args.invert, frames=args.frames)
+    seconds = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(asdict(result), summary=result.summary()), f)
+    else:
+        print(json.dumps(result.summary(), indent=2))
+    print(f"{len(result.crank_angles)} crank angles, {seconds:.2f}s", file=sys.stderr)
+    return 0
@@ -0,0 +1,233 @@
+import argparse
+import json
+import math
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from . import kernel
+from .interference import OutlineIndex, period_samples, rotor_pose
+from .kinematics import pin_contacts
+from .settings import CycloidalGearSettings
+
+# Ring pin loads against output torque and crank angle. Each rotor carries half
+# the output torque, reacted by the ring pins about the rotor centre; the cam
+# force passes through the centre and adds no moment. Loaded by torque T the
+# rotor turns by a small angle d onto the pins, and pin j, with gap g_j and
+# lever arm l_j (see kinematics.pin_contacts), is pressed in by d * l_j - g_j
+# and carries F_j = k * max(0, d * l_j - g_j) for contact stiffness k. d follows
+# from sum(F_j * l_j) = T, which is piecewise linear in d. With ideal=True the
+# gaps are ignored and every loaded pin's share is proportional to its lever
+# arm, the usual textbook distribution.
+#
+# As in interference.py only one pin pitch of crank angles is solved; the rest
+# of the rotation is the same loads with the pins renumbered.
+
+# Contact stiffness per pin (N/cm), about a hardened steel pin on a steel rotor
+# over a few millimetres of face width
+DEFAULT_STIFFNESS = 1e6
+
+
+@dataclass
+class LoadResult:
+    crank_angles: List[float]
+    pin_count: int
+    torque: float
+    # Row per crank angle, column per pin: load (N), lever arm (cm) and the
+    # unit contact normal from rotor to pin in the ring gear frame
+    forces: array = field(default_factory=lambda: array("d"))
+    lever_arms: array = field(default_factory=lambda: array("d"))
+    normals_x: array = field(default_factory=lambda: array("d"))
+    normals_y: array = field(default_factory=lambda: array("d"))
+    # Magnitude of the pin forces' sum per crank angle, which the eccentric
+    # bearing and output pins react
+    bearing_force: List[float] = field(default_factory=list)
+
+    def pin_forces(self, pin: int) -> array:
+        return self.forces[pin :: self.pin_count]
+
+    @property
+    def peak(self) -> List[float]:
+        return [max(self.pin_forces(j)) for j in range(self.pin_count)]
+
+    @property
+    def rms(self) -> List[float]:
+        return [
+            math.sqrt(sum(f * f for f in self.pin_forces(j)) / len(self.crank_angles))
+            for j in range(self.pin_count)
+        ]
+
+    @property
+    def mean_loaded_pins(self) -> float:
+        return sum(1 for f in self.forces if f > 0) / len(self.crank_angles)
+
+
+def share_load(
+    gaps: List[Tuple[float, float]], torque: float, stiffness: float
+) -> Tuple[float, List[float]]:
+    # Rotation onto the pins and each pin's load, for (gap, loaded lever arm)
+    # pairs; only pins with a positive lever arm can take load.
+    order = sorted(
+        (gap / lever, j) for (j, (gap, lever)) in enumerate(gaps) if lever > 0
+    )
+    forces = [0.0] * len(gaps)
+    if not order:
+        return (0.0, forces)
+
+    # Add pins in the order the rotation reaches them until the moment of the
+    # pins already touching balances the torque before the next one is reached
+    a = 0.0
+    b = 0.0
+    rotation = 0.0
+    for (i, (_, j)) in enumerate(order):
+        (gap, lever) = gaps[j]
+        a += lever * lever
+        b += lever * gap
+        rotation = (torque / stiffness + b) / a
+        if i + 1 == len(order) or rotation <= order[i + 1][0]:
+            break
+
+    for (j, (gap, lever)) in enumerate(gaps):
+        if lever > 0:
+            forces[j] = stiffness * max(0.0, rotation * lever - gap)
+    return (rotation, forces)
+
+
+def pin_loads(
+    settings: CycloidalGearSettings,
+    output_torque: float,
+    samples: int = 3600,
+    stiffness: float = DEFAULT_STIFFNESS,
+    ideal: bool = False,
+    invert: bool = False,
+    geometry: Optional[kernel.GearGeometry] = None,
+) -> LoadResult:
+    # output_torque in N cm, shared by the two rotors
+    if geometry is None:
+        geometry = kernel.build_gear(settings)
+    rotor = geometry.rotors[1 if invert else 0]
+    pins = geometry.ring_pins
+    pin_count = len(pins)
+    torque = output_torque / len(geometry.rotors)
+
+    index = OutlineIndex(rotor.outline, 4 * pin_count)
+    half_window = 1.5 * math.pi / pin_count
+    per_period = period_samples(settings, samples)
+    total = per_period * pin_count
+
+    # The rotor turns clockwise onto the pins it drives against, so the loaded
+    # lever arm is the negated one
+    period_rows: List[List[Tuple[float, float, float, float]]] = []
+    period_bearing: List[float] = []
+    for k in range(per_period):
+        pose = rotor_pose(settings, rotor, 2 * math.pi * k / total)
+        contacts = pin_contacts(pins, index, half_window, pose)
+        gaps = [(0.0 if ideal else gap, -lever) for (gap, lever, _, _) in contacts]
+        (_, forces) = share_load(gaps, torque, stiffness)
+        period_rows.append(
+            [
+                (force, -lever, nx, ny)
+                for (force, (_, lever, nx, ny)) in zip(forces, contacts)
+            ]
+        )
+        period_bearing.append(
+            math.hypot(
+                sum(f * nx for (f, (_, _, nx, _)) in zip(forces, contacts)),
+                sum(f * ny for (f, (_, _, _, ny)) in zip(forces, contacts)),
+            )
+        )
+
+    result = LoadResult(
+        crank_angles=[2 * math.pi * i / total for i in range(total)],
+        pin_count=pin_count,
+        torque=output_torque,
+    )
+    # Turning the drive by one pin pitch moves every pin's loads to the next
+    # pin, with the normals turned by the same pitch
+    for repeat in range(pin_count):
+        c = math.cos(2 * math.pi * repeat / pin_count)
+        s = math.sin(2 * math.pi * repeat / pin_count)
+        for row in period_rows:
+            shifted = row[-repeat:] + row[:-repeat] if repeat else row
+            for (force, lever, nx, ny) in shifted:
+                result.forces.append(force)
+                result.lever_arms.append(lever)
+                result.normals_x.append(nx * c - ny * s)
+                result.normals_y.append(nx * s + ny * c)
+        result.bearing_force.extend(period_bearing)
+    return result
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Ring pin loads of a cycloidal drive against crank angle."
+    )
+    parser.add_argument("torque", type=float, help="output torque (N m)")
+    parser.add_argument(
+        "settings", nargs="?", help="JSON settings file (default: default settings)"
+    )
+    parser.add_argument(
+        "-o", "--output", help="JSON output with every load series (default: summary)"
+    )
+    parser.add_argument(
+        "-n", "--samples", type=int, default=3600, help="crank angles per rotation"
+    )
+    parser.add_argument(
+        "--stiffness",
+        type=float,
+        default=DEFAULT_STIFFNESS,
+        help="contact stiffness per pin (N/cm)",
+    )
+    parser.add_argument(
+        "--ideal",
+        action="store_true",
+        help="ignore gaps and share the load by lever arm alone",
+    )
+    args = parser.parse_args(argv)
+
+    settings = CycloidalGearSettings()
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = CycloidalGearSettings.loads(f.read())
+
+    start = time.perf_counter()
+    # N m to N cm, the add-in's length unit
+    result = pin_loads(
+        settings, args.torque * 100, args.samples, args.stiffness, args.ideal
+    )
+    seconds = time.perf_counter() - start
+
+    summary = {
+        "peak": result.peak,
+        "rms": result.rms,
+        "peak_bearing": max(result.bearing_force),
+        "mean_loaded_pins": result.mean_loaded_pins,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                dict(
+                    summary,
+                    crank_angles=result.crank_angles,
+                    forces=result.forces.tolist(),
+                    lever_arms=result.lever_arms.tolist(),
+                    bearing_force=result.bearing_force,
+                ),
+                f,
+            )
+    else:
+        print(
+            json.dumps(
+                {
+                    "peak": max(summary["peak"]),
+                    "rms": max(summary["rms"]),
+                    "peak_bearing": summary["peak_bearing"],
+                    "mean_loaded_pins": summary["mean_loaded_pins"],
+                },
+                indent=2,
+            )
+        )
+    print(f"{len(result.crank_angles)} crank angles, {seconds:.2f}s", file=sys.stderr)
+    return 0
@@ -1,21 +1,55 @@
-import json
 import math
+import os
+import tempfile
+import time
 import traceback
 
 import adsk.core
 import adsk.fusion
 
+from ... import config
 from ...lib import fusion360utils as futil
+from . import kernel
+from .cache import ProfileCache
+from .profile_check import PROFILE_FIELDS, ProfileCheck, check_profile
 from .settings import CycloidalGearSettings
+from .spline import SplineFit
+from .timing import timer
 
 app = adsk.core.Application.get()
 ui = app.userInterface
 skip_validate: bool = False
 
+timer.enabled = config.TIMING
+
+# Shared across command invocations so repeated generations in a design session
+# reuse the rotor profile, and spilled to disk so it survives restarts.
+profile_cache = ProfileCache(
+    directory=os.path.join(
+        tempfile.gettempdir(), f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_profiles"
+    )
+)
+
 
 class CycloidalGearLogic:
     ATTRIBUTE_GROUP: str = "CycloidalGear"
     SETTINGS_ATTRIBUTE: str = "settings"
+    TIMINGS_ATTRIBUTE: str = "timings"
+    # Set on every generated occurrence, so a later run can find and update it
+    PART_ATTRIBUTE: str = "part"
+    STAGE_ATTRIBUTE: str = "stage"
+
+    # Preview redraws are kept within one frame by thinning the rotor outlines
+    PREVIEW_FRAME_BUDGET: float = 1 / 30
+    PREVIEW_MAX_POINTS: int = 20000
+    PREVIEW_MIN_POINTS: int = 500
+    PREVIEW_CIRCLE_SEGMENTS: int = 32
+
+    # Fit points per spline when the whole rotor outline is drawn in one sketch
+    ROTOR_SPLINE_SEGMENT_POINTS: int = 256
+
+    # Search radius around each computed ring gear fillet edge point (cm)
+    FILLET_EDGE_TOLERANCE: float = 0.001
 
     def __init__(self, des: adsk.fusion.Design):
         setting_attribute = des.attributes.itemByName(
@@ -26,10 +60,8 @@ class CycloidalGearLogic:
         self._design: adsk.fusion.Design = adsk.fusion.Design.cast(app.activeProduct)
         self._root: adsk.fusion.Component = self._design.rootComponent
 
-        self._settings: CycloidalGearSettings
-        if setting_attribute is not None:
-            json_settings: dict = json.loads(setting_attribute.value)
-            self._settings = CycloidalGearSettings(**json_settings)
+        self._settings: CycloidalGearSettings = self._load_settings(setting_attribute)
+        if self._settings is not None:
             futil.log(f"Settings loaded from attribute")
         else:
             self._settings = CycloidalGearSettings()
@@ -37,6 +69,11 @@ class CycloidalGearLogic:
 
         self._attributes: dict = {}
         self._properties: dict = {}
+        self._property_metadata: dict = {}
+        self._profile_check: ProfileCheck = None
+        self._showing_errors: bool = False
+        self._profile_check_input: adsk.core.TextBoxCommandInput = None
+        self._preview_points: int = CycloidalGearLogic.PREVIEW_MAX_POINTS
 
     def CreateCommandInputs(self, inputs: adsk.core.CommandInputs):
         global skip_validate
@@ -82,7 +119,8 @@ class CycloidalGearLogic:
             "calculated_values_tab", "Calculated Values"
         )
 
-        properties: list = self._settings.get_properties()
+        properties: dict = self._settings.get_properties()
+        self._property_metadata = properties
         property_name: str
         for property_name in properties:
             canonical_name: str = properties[property_name]["canonical_name"]
@@ -96,6 +134,15 @@ class CycloidalGearLogic:
 
             self._properties[property_name] = input
 
+        self._profile_check_input = (
+            calculated_values_tab.children.addTextBoxCommandInput(
+                "profile_check", "Profile Check", "", 2, True
+            )
+        )
+
+        self._update_properties(list(properties))
+        self._check_profile()
+
         skip_validate = False
 
     def HandleInputsChanged(self, args: adsk.core.InputChangedEventArgs):
@@ -103,15 +150,32 @@ class CycloidalGearLogic:
             return
 
         changed_input = args.input
+        if changed_input.id not in self._attributes:
+            return
+        if not changed_input.isValidExpression:
+            return
 
-        # Save the attribute values
-        self._save_attributes()
+        start = time.perf_counter()
+
+        # Save only the changed attribute value
+        self._save_attribute_value(attribute_name=changed_input.id)
+
+        # Update the calculated values that depend on it
+        affected: list = CycloidalGearSettings.affected_properties(changed_input.id)
+        self._update_properties(affected)
+        if changed_input.id in PROFILE_FIELDS:
+            self._check_profile()
 
-        # Update the calculated values
-        properties: list = self._settings.get_properties()
+        if config.DEBUG:
+            futil.log(
+                f"Input {changed_input.id} updated {len(affected)} calculated values "
+                f"in {(time.perf_counter() - start) * 1000:.2f} ms"
+            )
+
+    def _update_properties(self, property_names: list):
         property_name: str
-        for property_name in properties:
-            units: str = properties[property_name].get("units", "")
+        for property_name in property_names:
+            units: str = self._property_metadata[property_name].get("units", "")
             value = self._settings.__getattribute__(property_name)
 
             text: str
@@ -123,9 +187,26 @@ class CycloidalGearLogic:
                 )
             self._properties[property_name].text = text
 
+    def _check_profile(self):
+        # Undercuts and self-intersections would break the rotor spline, so
+        # they are caught here rather than by a failed build.
+        self._profile_check = check_profile(self._settings)
+        self._profile_check_input.text = self._profile_check.describe()
+
     def HandleValidateInputs(self, args: adsk.core.ValidateInputsEventArgs):
-        if not skip_validate:
-            pass
+        if skip_validate:
+            return
+        # Values no geometry can be built from, e.g. a zero profile tolerance,
+        # are shown in place of the profile check until they are fixed
+        errors = self._settings.errors()
+        if errors:
+            self._profile_check_input.text = "\n".join(errors)
+            args.areInputsValid = False
+        elif self._profile_check is not None:
+            if self._showing_errors:
+                self._profile_check_input.text = self._profile_check.describe()
+            args.areInputsValid = self._profile_check.ok
+        self._showing_errors = bool(errors)
 
         # inputs = args.inputs
 
@@ -136,6 +217,82 @@ class CycloidalGearLogic:
         # else:
         #     args.areInputsValid = False
 
+    def HandlePreview(self, args: adsk.core.CommandEventArgs):
+        if skip_validate:
+            return
+
+        # Skip redraws while an expression is still being typed, or while a
+        # value is one no geometry can be built from
+        for value_input in self._attributes.values():
+            if not value_input.isValidExpression:
+                return
+        if self._settings.errors():
+            return
+
+        start = time.perf_counter()
+        geometry = kernel.build_gear(self._settings, profile_cache)
+
+        coordinates: list = []
+        strip_lengths: list = []
+
+        def add_strip(xs, ys, z, transform=(0.0, 0.0, 0.0)):
+            (angle, dx, dy) = transform
+            c = math.cos(angle)
+            s = math.sin(angle)
+            for (x, y) in zip(xs, ys):
+                coordinates.extend((x * c - y * s + dx, x * s + y * c + dy, z))
+            strip_lengths.append(len(xs))
+
+        def add_circle(circle: kernel.Circle, z, transform=(0.0, 0.0, 0.0)):
+            segments = CycloidalGearLogic.PREVIEW_CIRCLE_SEGMENTS
+            angles = [2 * math.pi * i / segments for i in range(segments + 1)]
+            add_strip(
+                [circle.x + circle.radius * math.cos(a) for a in angles],
+                [circle.y + circle.radius * math.sin(a) for a in angles],
+                z,
+                transform,
+            )
+
+        outline_points = sum(len(rotor.outline) for rotor in geometry.rotors)
+        step = max(1, math.ceil(outline_points / self._preview_points))
+        for rotor in geometry.rotors:
+            transform = (rotor.offset_angle, rotor.eccentric_offset, 0.0)
+            xs = rotor.outline.xs[::step] + rotor.outline.xs[:1]
+            ys = rotor.outline.ys[::step] + rotor.outline.ys[:1]
+            add_strip(xs, ys, rotor.z_offset, transform)
+            add_circle(rotor.bearing_hole, rotor.z_offset, transform)
+            for hole in rotor.output_holes:
+                add_circle(hole, rotor.z_offset, transform)
+
+        for cam in geometry.cams:
+            add_circle(cam.circle, cam.z_offset)
+        for pin in geometry.ring_pins:
+            add_circle(pin, 0)
+        for circle in geometry.housing:
+            add_circle(circle, 0)
+        for pin in geometry.output_pins:
+            add_circle(pin, 0)
+        add_circle(geometry.output_plate, self._settings.ring_gear_thickness)
+
+        group = self._root.customGraphicsGroups.add()
+        group.addLines(
+            adsk.fusion.CustomGraphicsCoordinates.create(coordinates),
+            [],
+            True,
+            strip_lengths,
+        )
+
+        # Adapt the outline resolution so the next redraw fits the frame budget
+        elapsed = time.perf_counter() - start
+        if elapsed > CycloidalGearLogic.PREVIEW_FRAME_BUDGET:
+            self._preview_points = max(
+                CycloidalGearLogic.PREVIEW_MIN_POINTS, self._preview_points // 2
+            )
+        elif elapsed < CycloidalGearLogic.PREVIEW_FRAME_BUDGET / 2:
+            self._preview_points = min(
+                CycloidalGearLogic.PREVIEW_MAX_POINTS, self._preview_points * 2
+            )
+
     def HandleExecute(self, args: adsk.core.CommandEventArgs):
         if skip_validate:
             return
@@ -143,6 +300,12 @@ class CycloidalGearLogic:
         self._save_attributes()
 
         des: adsk.fusion.Design = adsk.fusion.Design.cast(app.activeProduct)
+        previous_attribute = des.attributes.itemByName(
+            CycloidalGearLogic.ATTRIBUTE_GROUP, CycloidalGearLogic.SETTINGS_ATTRIBUTE
+        )
+        # Read before the attribute is overwritten below, which updates it in
+        # place
+        previous = self._load_settings(previous_attribute)
         settings_jsons = self._settings.dumps()
         des.attributes.add(
             CycloidalGearLogic.ATTRIBUTE_GROUP,
@@ -150,7 +313,29 @@ class CycloidalGearLogic:
             settings_jsons,
         )
 
-        self._draw_gear()
+        with timer.stage("draw_gear"):
+            if previous is None or not self._regenerate(previous):
+                self._draw_gear()
+
+        if timer.enabled:
+            futil.log(f"Stage timings:\n{timer.summary()}")
+            des.attributes.add(
+                CycloidalGearLogic.ATTRIBUTE_GROUP,
+                CycloidalGearLogic.TIMINGS_ATTRIBUTE,
+                timer.dumps(),
+            )
+
+    def _load_settings(self, attribute) -> CycloidalGearSettings:
+        # None when there is no attribute, it was saved by a newer add-in or it
+        # cannot be read
+        if attribute is None:
+            return None
+        try:
+            return CycloidalGearSettings.loads(attribute.value)
+        except ValueError as e:
+            if ui:
+                ui.messageBox(f"Saved gear settings were not loaded:\n{e}")
+            return None
 
     def _save_attributes(self):
         attribute_name: str
@@ -175,6 +360,8 @@ class CycloidalGearLogic:
 
         self._settings.__setattr__(attribute_name, value)
 
+    # The original scalar profile point. Gears are built from profile.py; this
+    # is kept as the reference tools/profile_equivalence.py checks it against.
     def _getPoint(self, theta, rMajor, rMinor, e, n):
         psi = math.atan2(
             math.sin((1 - n) * theta), ((rMajor / (e * n)) - math.cos((1 - n) * theta))
@@ -191,321 +378,347 @@ class CycloidalGearLogic:
         )
         return (x, y)
 
-    def _distance(self, xa, ya, xb, yb):
-        return math.hypot((xa - xb), (ya - yb))
-
     def _rotor(
         self,
-        invert: bool,
-        zOffset: float,
+        settings: CycloidalGearSettings,
+        geometry: kernel.RotorGeometry,
         name: str,
-    ):
-        newEccentricOffset = self._settings.eccentric_offset
-        offsetAngle = 0
-        if invert:
-            newEccentricOffset *= -1
-            offsetAngle = math.pi / self._settings.rotor_lobes
-
-        rotorOcc = self._root.occurrences.addNewComponent(adsk.core.Matrix3D.create())
-        rotor = rotorOcc.component
-        rotor.name = name
-
-        planes = rotor.constructionPlanes
-        planeInput = planes.createInput()
-        offsetValue = adsk.core.ValueInput.createByReal(zOffset)
-        planeInput.setByOffset(self._root.xYConstructionPlane, offsetValue)
-        constructionPlane = planes.add(planeInput)
-
-        sk = rotor.sketches.add(constructionPlane)
-        points = adsk.core.ObjectCollection.create()
-
-        (xs, ys) = self._getPoint(
-            0,
-            self._settings.rotor_radius,
-            self._settings.ring_gear_pin_radius,
-            self._settings.eccentric_offset,
-            self._settings.ring_gear_pins,
-        )
-        points.add(adsk.core.Point3D.create(xs, ys, 0))
-
-        et = 2 * math.pi / self._settings.rotor_lobes
-        (xe, ye) = self._getPoint(
-            et,
-            self._settings.rotor_radius,
-            self._settings.ring_gear_pin_radius,
-            self._settings.eccentric_offset,
-            self._settings.ring_gear_pins,
-        )
-        x = xs
-        y = ys
-        dist = 0
-        ct = 0
-        dt = math.pi / self._settings.ring_gear_pins
-        numPoints = 0
-
-        while (
-            self._distance(x, y, xe, ye) > self._settings.maximum_distance
-            or ct < et / 2
-        ) and ct < et:
-            (xt, yt) = self._getPoint(
-                ct + dt,
-                self._settings.rotor_radius,
-                self._settings.ring_gear_pin_radius,
-                self._settings.eccentric_offset,
-                self._settings.ring_gear_pins,
-            )
-            dist = self._distance(x, y, xt, yt)
-
-            ddt = dt / 2
-            lastTooBig = False
-            lastTooSmall = False
-
-            while (
-                dist > self._settings.maximum_distance
-                or dist < self._settings.minimum_distance
-            ):
-                if dist > self._settings.maximum_distance:
-                    if lastTooSmall:
-                        ddt /= 2
-
-                    lastTooSmall = False
-                    lastTooBig = True
-
-                    if ddt > dt / 2:
-                        ddt = dt / 2
-
-                    dt -= ddt
-
-                elif dist < self._settings.minimum_distance:
-                    if lastTooBig:
-                        ddt /= 2
-
-                    lastTooSmall = True
-                    lastTooBig = False
-                    dt += ddt
-
-                (xt, yt) = self._getPoint(
-                    ct + dt,
-                    self._settings.rotor_radius,
-                    self._settings.ring_gear_pin_radius,
-                    self._settings.eccentric_offset,
-                    self._settings.ring_gear_pins,
+    ) -> adsk.fusion.Occurrence:
+        with timer.stage("component"):
+            rotorOcc = self._root.occurrences.addNewComponent(
+                adsk.core.Matrix3D.create()
+            )
+            rotor = rotorOcc.component
+            rotor.name = name
+
+            planes = rotor.constructionPlanes
+            planeInput = planes.createInput()
+            offsetValue = adsk.core.ValueInput.createByReal(geometry.z_offset)
+            planeInput.setByOffset(self._root.xYConstructionPlane, offsetValue)
+            constructionPlane = planes.add(planeInput)
+
+        if config.ROTOR_SINGLE_SKETCH:
+            with timer.stage("outline"):
+                self._rotor_outline(
+                    settings, rotor, constructionPlane, geometry, name
+                )
+        else:
+            with timer.stage("lobe_pattern"):
+                self._rotor_lobe_pattern(
+                    settings, rotor, constructionPlane, geometry, name
                 )
-                dist = self._distance(x, y, xt, yt)
-
-            x = xt
-            y = yt
-            points.add(adsk.core.Point3D.create(x, y, 0))
-            numPoints += 1
-            ct += dt
 
-        points.add(adsk.core.Point3D.create(xe, ye, 0))
-        curve = sk.sketchCurves.sketchFittedSplines.add(points)
+        zAxis = rotor.zConstructionAxis
 
-        lines = sk.sketchCurves.sketchLines
-        line1 = lines.addByTwoPoints(
-            adsk.core.Point3D.create(0, 0, 0), curve.startSketchPoint
-        )
-        line2 = lines.addByTwoPoints(line1.startSketchPoint, curve.endSketchPoint)
+        # Center bearing hole
+        with timer.stage("bearing_hole"):
+            sk = rotor.sketches.add(constructionPlane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            self._add_circle(sketchCircles, geometry.bearing_hole)
+
+            prof = sk.profiles.item(0)
+            # dist = adsk.core.ValueInput.createByReal(rotorThickness)
+            dist = adsk.core.ValueInput.createByReal(settings.rotor_thickness)
+            extrudes = rotor.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.CutFeatureOperation
+            )
 
-        # Extrude
-        prof = sk.profiles.item(0)
-        # dist = adsk.core.ValueInput.createByReal(rotorThickness)
-        dist = adsk.core.ValueInput.createByReal(self._settings.rotor_thickness)
-        extrudes = rotor.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
-        )
+        # Output holes
+        with timer.stage("output_hole"):
+            sk = rotor.sketches.add(constructionPlane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            self._add_circle(sketchCircles, geometry.output_holes[0])
+
+            prof = sk.profiles.item(0)
+            # dist = adsk.core.ValueInput.createByReal(rotorThickness)
+            dist = adsk.core.ValueInput.createByReal(settings.rotor_thickness)
+            extrudes = rotor.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.CutFeatureOperation
+            )
 
-        # Create component
-        body1 = extrude.bodies.item(0)
-        body1.name = name
         inputEntities = adsk.core.ObjectCollection.create()
-        inputEntities.add(body1)
+        inputEntities.add(extrude)
 
         # Circular pattern
-        zAxis = rotor.zConstructionAxis
-        circularFeats = rotor.features.circularPatternFeatures
-        circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
-        circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
-            self._settings.rotor_lobes
-        )
-        circularFeatInput.totalAngle = adsk.core.ValueInput.createByString("360 deg")
-        circularFeatInput.isSymmetric = True
-        circularFeat = circularFeats.add(circularFeatInput)
-
-        # Combine pattern features
-        ToolBodies = adsk.core.ObjectCollection.create()
-        for b in circularFeat.bodies:
-            if b != body1:
-                ToolBodies.add(b)
+        with timer.stage("output_hole_pattern"):
+            circularFeats = rotor.features.circularPatternFeatures
+            circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
+            circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
+                len(geometry.output_holes)
+            )
+            circularFeatInput.totalAngle = adsk.core.ValueInput.createByString(
+                "360 deg"
+            )
+            circularFeatInput.isSymmetric = True
+            circularFeat = circularFeats.add(circularFeatInput)
 
-        combineInput = rotor.features.combineFeatures.createInput(body1, ToolBodies)
-        combineInput.operation = adsk.fusion.FeatureOperations.JoinFeatureOperation
-        combineInput.isNewComponent = False
-        rotor.features.combineFeatures.add(combineInput)
+        # Offset the rotor to make the ring gear concentric with origin
+        with timer.stage("transform"):
+            transform = rotorOcc.transform
+            transform.setToRotation(
+                geometry.offset_angle,
+                adsk.core.Vector3D.create(0, 0, 1),
+                adsk.core.Point3D.create(0, 0, 0),
+            )
+            transform.translation = adsk.core.Vector3D.create(
+                geometry.eccentric_offset, 0, 0
+            )
+            rotorOcc.transform = transform
+            self._design.snapshots.add()
 
-        # Center bearing hole
-        sk = rotor.sketches.add(constructionPlane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(0, 0, 0),
-            self._settings.rotor_bearing_hole_diameter / 2,
-        )
+        return rotorOcc
 
-        prof = sk.profiles.item(0)
-        # dist = adsk.core.ValueInput.createByReal(rotorThickness)
-        dist = adsk.core.ValueInput.createByReal(self._settings.rotor_thickness)
-        extrudes = rotor.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.CutFeatureOperation
-        )
+    def _rotor_outline(
+        self,
+        settings: CycloidalGearSettings,
+        rotor: adsk.fusion.Component,
+        constructionPlane: adsk.fusion.ConstructionPlane,
+        geometry: kernel.RotorGeometry,
+        name: str,
+    ):
+        # All lobes in one sketch, either as one control-point spline per lobe
+        # or split into a few chained fitted splines so no single spline gets
+        # too many fit points.
+        with timer.stage("spline"):
+            sk = rotor.sketches.add(constructionPlane)
+            splines = sk.sketchCurves.sketchFittedSplines
+            outline = geometry.outline
+            count = len(outline)
+            segment = CycloidalGearLogic.ROTOR_SPLINE_SEGMENT_POINTS
+
+            if geometry.lobe_spline is not None:
+                lobe_angle = 2 * math.pi / settings.rotor_lobes
+                first = None
+                last = None
+                for i in range(settings.rotor_lobes):
+                    curve = self._add_control_point_spline(
+                        sk, geometry.lobe_spline, -lobe_angle * i
+                    )
+                    if last is not None:
+                        last.endSketchPoint.merge(curve.startSketchPoint)
+                    last = curve
+                    if first is None:
+                        first = curve
+                last.endSketchPoint.merge(first.startSketchPoint)
+            elif count <= segment:
+                points = adsk.core.ObjectCollection.create()
+                for x, y in zip(outline.xs, outline.ys):
+                    points.add(adsk.core.Point3D.create(x, y, 0))
+                splines.add(points).isClosed = True
+            else:
+                segments = math.ceil(count / segment)
+                bounds = [count * i // segments for i in range(segments + 1)]
+                first = None
+                last = None
+                for i in range(segments):
+                    points = adsk.core.ObjectCollection.create()
+                    points.add(
+                        last.endSketchPoint
+                        if last is not None
+                        else adsk.core.Point3D.create(
+                            outline.xs[bounds[i]], outline.ys[bounds[i]], 0
+                        )
+                    )
+                    for j in range(bounds[i] + 1, bounds[i + 1]):
+                        points.add(
+                            adsk.core.Point3D.create(outline.xs[j], outline.ys[j], 0)
+                        )
+                    if i == segments - 1:
+                        points.add(first.startSketchPoint)
+                    else:
+                        j = bounds[i + 1]
+                        points.add(
+                            adsk.core.Point3D.create(outline.xs[j], outline.ys[j], 0)
+                        )
+                    last = splines.add(points)
+                    if first is None:
+                        first = last
+
+        with timer.stage("extrude"):
+            prof = sk.profiles.item(0)
+            dist = adsk.core.ValueInput.createByReal(settings.rotor_thickness)
+            extrudes = rotor.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+            )
+            extrude.bodies.item(0).name = name
 
-        # Output holes
-        sk = rotor.sketches.add(constructionPlane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(
-                math.cos(-offsetAngle + math.pi / 2)
-                * self._settings.output_circle_diameter
-                / 2,
-                math.sin(-offsetAngle + math.pi / 2)
-                * self._settings.output_circle_diameter
-                / 2,
-                0,
-            ),
-            self._settings.output_hole_diameter / 2,
-        )
+    def _rotor_lobe_pattern(
+        self,
+        settings: CycloidalGearSettings,
+        rotor: adsk.fusion.Component,
+        constructionPlane: adsk.fusion.ConstructionPlane,
+        geometry: kernel.RotorGeometry,
+        name: str,
+    ):
+        with timer.stage("spline"):
+            sk = rotor.sketches.add(constructionPlane)
+            if geometry.lobe_spline is not None:
+                curve = self._add_control_point_spline(sk, geometry.lobe_spline, 0)
+            else:
+                points = adsk.core.ObjectCollection.create()
+                for x, y in zip(geometry.lobe.xs, geometry.lobe.ys):
+                    points.add(adsk.core.Point3D.create(x, y, 0))
+                curve = sk.sketchCurves.sketchFittedSplines.add(points)
+
+            lines = sk.sketchCurves.sketchLines
+            line1 = lines.addByTwoPoints(
+                adsk.core.Point3D.create(0, 0, 0), curve.startSketchPoint
+            )
+            line2 = lines.addByTwoPoints(line1.startSketchPoint, curve.endSketchPoint)
 
-        prof = sk.profiles.item(0)
-        # dist = adsk.core.ValueInput.createByReal(rotorThickness)
-        dist = adsk.core.ValueInput.createByReal(self._settings.rotor_thickness)
-        extrudes = rotor.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.CutFeatureOperation
-        )
+        # Extrude
+        with timer.stage("extrude"):
+            prof = sk.profiles.item(0)
+            # dist = adsk.core.ValueInput.createByReal(rotorThickness)
+            dist = adsk.core.ValueInput.createByReal(settings.rotor_thickness)
+            extrudes = rotor.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+            )
 
+        # Create component
+        body1 = extrude.bodies.item(0)
+        body1.name = name
         inputEntities = adsk.core.ObjectCollection.create()
-        inputEntities.add(extrude)
+        inputEntities.add(body1)
 
         # Circular pattern
-        circularFeats = rotor.features.circularPatternFeatures
-        circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
-        circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
-            self._settings.output_hole_count
-        )
-        circularFeatInput.totalAngle = adsk.core.ValueInput.createByString("360 deg")
-        circularFeatInput.isSymmetric = True
-        circularFeat = circularFeats.add(circularFeatInput)
+        with timer.stage("pattern"):
+            zAxis = rotor.zConstructionAxis
+            circularFeats = rotor.features.circularPatternFeatures
+            circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
+            circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
+                settings.rotor_lobes
+            )
+            circularFeatInput.totalAngle = adsk.core.ValueInput.createByString(
+                "360 deg"
+            )
+            circularFeatInput.isSymmetric = True
+            circularFeat = circularFeats.add(circularFeatInput)
 
-        # Offset the rotor to make the ring gear concentric with origin
-        transform = rotorOcc.transform
-        transform.setToRotation(
-            offsetAngle,
-            adsk.core.Vector3D.create(0, 0, 1),
-            adsk.core.Point3D.create(0, 0, 0),
-        )
-        transform.translation = adsk.core.Vector3D.create(newEccentricOffset, 0, 0)
-        rotorOcc.transform = transform
-        self._design.snapshots.add()
+        # Combine pattern features
+        with timer.stage("combine"):
+            ToolBodies = adsk.core.ObjectCollection.create()
+            for b in circularFeat.bodies:
+                if b != body1:
+                    ToolBodies.add(b)
+
+            combineInput = rotor.features.combineFeatures.createInput(
+                body1, ToolBodies
+            )
+            combineInput.operation = adsk.fusion.FeatureOperations.JoinFeatureOperation
+            combineInput.isNewComponent = False
+            rotor.features.combineFeatures.add(combineInput)
 
     def _cam(
         self,
-        invert: bool,
-        zOffset: float,
+        settings: CycloidalGearSettings,
+        geometry: kernel.CamGeometry,
         name: str,
-    ):
-        eccentric_offset: float = self._settings.eccentric_offset * (
-            1 if not invert else -1
-        )
-
-        camshaftOcc = self._root.occurrences.addNewComponent(
-            adsk.core.Matrix3D.create()
-        )
-        camshaft = camshaftOcc.component
-        camshaft.name = name
-
-        planes = camshaft.constructionPlanes
-        plane_input = planes.createInput()
-        offset_value = adsk.core.ValueInput.createByReal(zOffset)
-        plane_input.setByOffset(self._root.xYConstructionPlane, offset_value)
-        construction_plane = planes.add(plane_input)
-
-        sk = camshaft.sketches.add(construction_plane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(eccentric_offset, 0, 0),
-            self._settings.camshaft_diameter / 2,
-        )
+    ) -> adsk.fusion.Occurrence:
+        with timer.stage("component"):
+            camshaftOcc = self._root.occurrences.addNewComponent(
+                adsk.core.Matrix3D.create()
+            )
+            camshaft = camshaftOcc.component
+            camshaft.name = name
+
+            planes = camshaft.constructionPlanes
+            plane_input = planes.createInput()
+            offset_value = adsk.core.ValueInput.createByReal(geometry.z_offset)
+            plane_input.setByOffset(self._root.xYConstructionPlane, offset_value)
+            construction_plane = planes.add(plane_input)
+
+        with timer.stage("extrude"):
+            sk = camshaft.sketches.add(construction_plane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            self._add_circle(sketchCircles, geometry.circle)
+
+            prof = sk.profiles.item(0)
+            dist = adsk.core.ValueInput.createByReal(settings.rotor_thickness)
+            extrudes = camshaft.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+            )
+            extrude.bodies.item(0).name = name
 
-        prof = sk.profiles.item(0)
-        dist = adsk.core.ValueInput.createByReal(self._settings.rotor_thickness)
-        extrudes = camshaft.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
-        )
-        extrude.bodies.item(0).name = name
+        return camshaftOcc
 
-    def _output_assembly(self, name: str):
+    def _output_assembly(
+        self,
+        settings: CycloidalGearSettings,
+        geometry: kernel.GearGeometry,
+        name: str,
+    ) -> adsk.fusion.Occurrence:
         outputOcc = self._root.occurrences.addNewComponent(adsk.core.Matrix3D.create())
         output = outputOcc.component
         output.name = name
 
         # Output pins
-        sk = output.sketches.add(self._root.xYConstructionPlane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(0, self._settings.output_circle_diameter / 2, 0),
-            self._settings.output_pin_diameter / 2,
-        )
-
-        prof = sk.profiles.item(0)
-        dist = adsk.core.ValueInput.createByReal(self._settings.ring_gear_thickness)
-        extrudes = output.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
-        )
+        with timer.stage("pin"):
+            sk = output.sketches.add(self._root.xYConstructionPlane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            self._add_circle(sketchCircles, geometry.output_pins[0])
+
+            prof = sk.profiles.item(0)
+            dist = adsk.core.ValueInput.createByReal(settings.ring_gear_thickness)
+            extrudes = output.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+            )
 
         inputEntities = adsk.core.ObjectCollection.create()
         inputEntities.add(extrude)
 
         # Circular pattern
-        zAxis = output.zConstructionAxis
-        circularFeats = output.features.circularPatternFeatures
-        circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
-        circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
-            self._settings.output_hole_count
-        )
-        circularFeatInput.totalAngle = adsk.core.ValueInput.createByString("360 deg")
-        circularFeatInput.isSymmetric = True
-        circularFeat = circularFeats.add(circularFeatInput)
+        with timer.stage("pin_pattern"):
+            zAxis = output.zConstructionAxis
+            circularFeats = output.features.circularPatternFeatures
+            circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
+            circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
+                len(geometry.output_pins)
+            )
+            circularFeatInput.totalAngle = adsk.core.ValueInput.createByString(
+                "360 deg"
+            )
+            circularFeatInput.isSymmetric = True
+            circularFeat = circularFeats.add(circularFeatInput)
 
         # Output body
-        planes = output.constructionPlanes
-        planeInput = planes.createInput()
-        offsetValue = adsk.core.ValueInput.createByReal(
-            self._settings.ring_gear_thickness
-        )
-        planeInput.setByOffset(self._root.xYConstructionPlane, offsetValue)
-        constructionPlane = planes.add(planeInput)
-
-        sk = output.sketches.add(constructionPlane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(0, 0, 0),
-            self._settings.output_circle_diameter / 2
-            + self._settings.output_pin_diameter,
-        )
+        with timer.stage("plate"):
+            planes = output.constructionPlanes
+            planeInput = planes.createInput()
+            offsetValue = adsk.core.ValueInput.createByReal(
+                settings.ring_gear_thickness
+            )
+            planeInput.setByOffset(self._root.xYConstructionPlane, offsetValue)
+            constructionPlane = planes.add(planeInput)
 
-        prof = sk.profiles.item(0)
-        dist = adsk.core.ValueInput.createByReal(self._settings.output_plate_thickness)
-        extrudes = output.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.JoinFeatureOperation
-        )
-        extrude.bodies.item(0).name = name
+            sk = output.sketches.add(constructionPlane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            self._add_circle(sketchCircles, geometry.output_plate)
+
+            prof = sk.profiles.item(0)
+            dist = adsk.core.ValueInput.createByReal(
+                settings.output_plate_thickness
+            )
+            extrudes = output.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.JoinFeatureOperation
+            )
+            extrude.bodies.item(0).name = name
+
+        return outputOcc
 
-    def _ring_gear(self, name: str):
+    def _ring_gear(
+        self,
+        settings: CycloidalGearSettings,
+        geometry: kernel.GearGeometry,
+        name: str,
+    ) -> adsk.fusion.Occurrence:
         ringGearOcc = self._root.occurrences.addNewComponent(
             adsk.core.Matrix3D.create()
         )
@@ -513,21 +726,17 @@ class CycloidalGearLogic:
         ringGear.name = name
 
         # Pins
-        sk = ringGear.sketches.add(self._root.xYConstructionPlane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        centerPoint = adsk.core.Point3D.create(
-            self._settings.rotor_radius + self._settings.ring_gear_margin, 0, 0
-        )
-        sketchCircles.addByCenterRadius(
-            centerPoint, self._settings.ring_gear_pin_radius
-        )
-
-        prof = sk.profiles.item(0)
-        dist = adsk.core.ValueInput.createByReal(self._settings.ring_gear_thickness)
-        extrudes = ringGear.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
-        )
+        with timer.stage("pin"):
+            sk = ringGear.sketches.add(self._root.xYConstructionPlane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            self._add_circle(sketchCircles, geometry.ring_pins[0])
+
+            prof = sk.profiles.item(0)
+            dist = adsk.core.ValueInput.createByReal(settings.ring_gear_thickness)
+            extrudes = ringGear.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+            )
 
         pin = extrude.bodies.item(0)
         pin.name = name
@@ -535,81 +744,314 @@ class CycloidalGearLogic:
         inputEntities.add(pin)
 
         # Circular pattern
-        zAxis = ringGear.zConstructionAxis
-        circularFeats = ringGear.features.circularPatternFeatures
-        circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
-        circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
-            self._settings.ring_gear_pins
-        )
-        circularFeatInput.totalAngle = adsk.core.ValueInput.createByString("360 deg")
-        circularFeatInput.isSymmetric = True
-        circularFeats.add(circularFeatInput)
+        with timer.stage("pin_pattern"):
+            zAxis = ringGear.zConstructionAxis
+            circularFeats = ringGear.features.circularPatternFeatures
+            circularFeatInput = circularFeats.createInput(inputEntities, zAxis)
+            circularFeatInput.quantity = adsk.core.ValueInput.createByReal(
+                len(geometry.ring_pins)
+            )
+            circularFeatInput.totalAngle = adsk.core.ValueInput.createByString(
+                "360 deg"
+            )
+            circularFeatInput.isSymmetric = True
+            circularFeats.add(circularFeatInput)
 
         # Housing
-        sk = ringGear.sketches.add(self._root.xYConstructionPlane)
-        sketchCircles = sk.sketchCurves.sketchCircles
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(0, 0, 0),
-            self._settings.rotor_radius + self._settings.ring_gear_margin,
-        )
-        sketchCircles.addByCenterRadius(
-            adsk.core.Point3D.create(0, 0, 0),
-            self._settings.ring_gear_outer_diameter / 2,
+        with timer.stage("housing"):
+            sk = ringGear.sketches.add(self._root.xYConstructionPlane)
+            sketchCircles = sk.sketchCurves.sketchCircles
+            for circle in geometry.housing:
+                self._add_circle(sketchCircles, circle)
+
+            prof = sk.profiles.item(1)
+            dist = adsk.core.ValueInput.createByReal(settings.ring_gear_thickness)
+            extrudes = ringGear.features.extrudeFeatures
+            extrude = extrudes.addSimple(
+                prof, dist, adsk.fusion.FeatureOperations.JoinFeatureOperation
+            )
+
+        # Fillets - the vertical edges where each pin meets the housing bore,
+        # looked up at their known positions halfway up the gear
+        fillets = ringGear.features.filletFeatures
+
+        with timer.stage("fillet_search"):
+            edgeCollection1 = adsk.core.ObjectCollection.create()
+            edgeType = adsk.fusion.BRepEntityTypes.BRepEdgeEntityType
+            z = settings.ring_gear_thickness / 2
+            for x, y in geometry.fillet_points:
+                found = ringGear.findBRepUsingPoint(
+                    adsk.core.Point3D.create(x, y, z),
+                    edgeType,
+                    CycloidalGearLogic.FILLET_EDGE_TOLERANCE,
+                    True,
+                )
+                if found.count > 0:
+                    edgeCollection1.add(found.item(0))
+
+        with timer.stage("fillet"):
+            radius1 = adsk.core.ValueInput.createByReal(
+                settings.ring_gear_pin_radius
+            )
+            input1 = fillets.createInput()
+            input1.addConstantRadiusEdgeSet(edgeCollection1, radius1, True)
+            input1.isG2 = False
+            input1.isRollingBallCorner = True
+            fillets.add(input1)
+
+        return ringGearOcc
+
+    def _add_circle(
+        self, sketchCircles: adsk.fusion.SketchCircles, circle: kernel.Circle
+    ) -> adsk.fusion.SketchCircle:
+        return sketchCircles.addByCenterRadius(
+            adsk.core.Point3D.create(circle.x, circle.y, 0), circle.radius
         )
 
-        prof = sk.profiles.item(1)
-        dist = adsk.core.ValueInput.createByReal(self._settings.ring_gear_thickness)
-        extrudes = ringGear.features.extrudeFeatures
-        extrude = extrudes.addSimple(
-            prof, dist, adsk.fusion.FeatureOperations.JoinFeatureOperation
+    def _add_control_point_spline(
+        self, sk: adsk.fusion.Sketch, lobe_spline: SplineFit, angle: float
+    ) -> adsk.fusion.SketchControlPointSpline:
+        # The lobe spline turned by angle; turning the control points turns the
+        # curve
+        (xs, ys) = kernel.rotate(lobe_spline.xs, lobe_spline.ys, angle)
+        points = [adsk.core.Point3D.create(x, y, 0) for (x, y) in zip(xs, ys)]
+        return sk.sketchCurves.sketchControlPointSplines.add(
+            points, adsk.fusion.SplineDegrees.SplineDegreeThree
         )
 
-        # Fillets - conditional fillet on edges with length matching gear thickness
-        fillets = ringGear.features.filletFeatures
+    def _draw_gear(self):
+        self.DrawCompound(self._settings.stages())
 
-        edgeCollection1 = adsk.core.ObjectCollection.create()
-        faces = ringGear.bRepBodies.item(0).faces
-        for face in faces:
-            for edge in face.edges:
-                if abs(edge.length - self._settings.ring_gear_thickness) < 0.005:
-                    edgeCollection1.add(edge)
+    def DrawCompound(self, stages: list):
+        # Stages are stacked upwards from the origin. A stage identical to an
+        # earlier one adds occurrences of that stage's components instead of
+        # building them again.
+        try:
+            with timer.stage("profile"):
+                geometries = kernel.build_stages(
+                    stages, profile_cache, lobe_splines=True
+                )
+            if config.DEBUG:
+                distinct = {
+                    (ProfileCache.key(stage), stage.spline_fit_tolerance): (
+                        stage,
+                        geometry,
+                    )
+                    for (stage, geometry) in zip(stages, geometries)
+                }
+                for (settings, geometry) in distinct.values():
+                    lobe = kernel.rotor_lobe(settings, profile_cache)
+                    futil.log(
+                        f"Rotor profile: {len(lobe.xs)} points per lobe from "
+                        f"{lobe.evaluations} evaluations, max deviation "
+                        f"{lobe.max_deviation:.2e} (tolerance "
+                        f"{settings.profile_tolerance:.2e}), "
+                        f"cache {profile_cache.stats}"
+                    )
+                    lobe_spline = geometry.rotors[0].lobe_spline
+                    if lobe_spline is not None:
+                        futil.log(
+                            f"Rotor spline: {len(lobe_spline)} control points per "
+                            f"lobe, max error {lobe_spline.max_error:.2e} "
+                            f"(tolerance {settings.spline_fit_tolerance:.2e})"
+                        )
+
+            drawn: dict = {}
+            z = 0.0
+            for (i, (settings, geometry)) in enumerate(zip(stages, geometries)):
+                key = settings.dumps()
+                if key in drawn:
+                    with timer.stage("stage_copy"):
+                        (parts, drawn_z) = drawn[key]
+                        for (part, occurrence) in parts:
+                            self._copy_part(part, i, occurrence, z - drawn_z)
+                else:
+                    prefix = f"Stage {i + 1} " if len(stages) > 1 else ""
+                    parts = [
+                        (part, occurrence)
+                        for part in kernel.PART_DEPENDENCIES
+                        for occurrence in self._draw_part(
+                            part, settings, geometry, prefix
+                        )
+                    ]
+                    for (part, occurrence) in parts:
+                        self._tag_part(occurrence, part, i)
+                        if z != 0:
+                            occurrence.transform = self._stage_transform(occurrence, z)
+                    drawn[key] = (parts, z)
+                z += settings.stage_height
+
+            if len(stages) > 1:
+                self._design.snapshots.add()
+            return
 
-        radius1 = adsk.core.ValueInput.createByReal(self._settings.ring_gear_pin_radius)
-        input1 = fillets.createInput()
-        input1.addConstantRadiusEdgeSet(edgeCollection1, radius1, True)
-        input1.isG2 = False
-        input1.isRollingBallCorner = True
-        fillets.add(input1)
+        except:
+            if ui:
+                ui.messageBox(f"Failed:\n{format(traceback.format_exc())}")
+
+    def _regenerate(self, previous: CycloidalGearSettings) -> bool:
+        # Updates the gear generated with the previous settings in place,
+        # rebuilding only the parts whose inputs changed. The new geometry is
+        # built before anything is removed, so settings it fails for leave the
+        # previous gear as it was. Returns False when the whole gear has to be
+        # drawn afresh, with everything generated before removed: nothing was
+        # found, the stages no longer line up or differ from each other, or a
+        # rebuilt part failed to draw.
+        generated = self._generated_parts()
+        if not generated:
+            return False
+        settings = self._settings
+        redraw = (
+            previous.stage_count != settings.stage_count
+            or previous.stage_pin_step != settings.stage_pin_step
+            or (settings.stage_pin_step and settings.stage_count > 1)
+        )
+        parts = kernel.affected_parts(previous, settings)
 
-    def _draw_gear(self):
         try:
-            self._rotor(
-                invert=False, zOffset=self._settings.rotor_spacing, name="Rotor 1"
-            )
-            self._rotor(
-                invert=True,
-                zOffset=self._settings.rotor_thickness
-                + (self._settings.rotor_spacing * 2),
-                name="Rotor 2",
+            with timer.stage("profile"):
+                if redraw:
+                    kernel.build_stages(
+                        settings.stages(), profile_cache, lobe_splines=True
+                    )
+                elif parts:
+                    geometry = kernel.build_gear(
+                        settings, profile_cache, lobe_splines=True
+                    )
+        except:
+            # Keep the saved settings describing the gear that is still there
+            self._design.attributes.add(
+                CycloidalGearLogic.ATTRIBUTE_GROUP,
+                CycloidalGearLogic.SETTINGS_ATTRIBUTE,
+                previous.dumps(),
             )
+            if ui:
+                ui.messageBox(
+                    "The gear was left unchanged, its new geometry failed:\n"
+                    f"{format(traceback.format_exc())}"
+                )
+            return True
 
-            self._cam(
-                invert=False,
-                zOffset=self._settings.rotor_spacing,
-                name="Camshaft 1",
+        try:
+            if redraw:
+                for (_, _, occurrence) in generated:
+                    occurrence.deleteMe()
+                return False
+
+            lift = settings.stage_height - previous.stage_height
+            for (part, stage, occurrence) in generated:
+                if part in parts:
+                    occurrence.deleteMe()
+                elif lift != 0 and stage > 0:
+                    occurrence.transform = self._stage_transform(
+                        occurrence, lift * stage
+                    )
+            if not parts:
+                return True
+
+            prefix = "Stage 1 " if settings.stage_count > 1 else ""
+            for part in parts:
+                for occurrence in self._draw_part(part, settings, geometry, prefix):
+                    self._tag_part(occurrence, part, 0)
+                    for stage in range(1, settings.stage_count):
+                        with timer.stage("stage_copy"):
+                            self._copy_part(
+                                part,
+                                stage,
+                                occurrence,
+                                settings.stage_height * stage,
+                            )
+            if settings.stage_count > 1:
+                self._design.snapshots.add()
+            futil.log(f"Rebuilt {', '.join(parts)}")
+            return True
+
+        except:
+            # Some parts may already be gone; clear the rest for a full redraw
+            futil.log(f"Rebuild failed, redrawing:\n{traceback.format_exc()}")
+            for (_, _, occurrence) in self._generated_parts():
+                occurrence.deleteMe()
+            return False
+
+    def _generated_parts(self) -> list:
+        # (part, stage, occurrence) for every occurrence an earlier run tagged
+        generated: list = []
+        for occurrence in self._root.occurrences:
+            part = occurrence.attributes.itemByName(
+                CycloidalGearLogic.ATTRIBUTE_GROUP, CycloidalGearLogic.PART_ATTRIBUTE
             )
-            self._cam(
-                invert=True,
-                zOffset=self._settings.rotor_thickness
-                + (self._settings.rotor_spacing * 2),
-                name="Camshaft 2",
+            if part is None:
+                continue
+            stage = occurrence.attributes.itemByName(
+                CycloidalGearLogic.ATTRIBUTE_GROUP, CycloidalGearLogic.STAGE_ATTRIBUTE
             )
+            generated.append((part.value, int(stage.value), occurrence))
+        return generated
 
-            self._output_assembly(name="Output")
-            self._ring_gear(name="Ring Gear")
+    def _tag_part(self, occurrence: adsk.fusion.Occurrence, part: str, stage: int):
+        occurrence.attributes.add(
+            CycloidalGearLogic.ATTRIBUTE_GROUP, CycloidalGearLogic.PART_ATTRIBUTE, part
+        )
+        occurrence.attributes.add(
+            CycloidalGearLogic.ATTRIBUTE_GROUP,
+            CycloidalGearLogic.STAGE_ATTRIBUTE,
+            str(stage),
+        )
 
-            return
+    def _copy_part(
+        self,
+        part: str,
+        stage: int,
+        occurrence: adsk.fusion.Occurrence,
+        z: float,
+    ) -> adsk.fusion.Occurrence:
+        # Another occurrence of an already built part's component, z higher
+        copy = self._root.occurrences.addExistingComponent(
+            occurrence.component, self._stage_transform(occurrence, z)
+        )
+        self._tag_part(copy, part, stage)
+        return copy
 
-        except:
-            if ui:
-                ui.messageBox(f"Failed:\n{format(traceback.format_exc())}")
+    def _draw_part(
+        self,
+        part: str,
+        settings: CycloidalGearSettings,
+        geometry: kernel.GearGeometry,
+        prefix: str,
+    ) -> list:
+        # The occurrences of one part of kernel.PART_DEPENDENCIES
+        occurrences: list = []
+        if part == "rotor":
+            for (i, rotor) in enumerate(geometry.rotors):
+                with timer.stage("rotor"):
+                    occurrences.append(
+                        self._rotor(settings, rotor, name=f"{prefix}Rotor {i + 1}")
+                    )
+        elif part == "camshaft":
+            for (i, cam) in enumerate(geometry.cams):
+                with timer.stage("cam"):
+                    occurrences.append(
+                        self._cam(settings, cam, name=f"{prefix}Camshaft {i + 1}")
+                    )
+        elif part == "output":
+            with timer.stage("output_assembly"):
+                occurrences.append(
+                    self._output_assembly(settings, geometry, name=f"{prefix}Output")
+                )
+        elif part == "ring_gear":
+            with timer.stage("ring_gear"):
+                occurrences.append(
+                    self._ring_gear(settings, geometry, name=f"{prefix}Ring Gear")
+                )
+        return occurrences
+
+    def _stage_transform(
+        self, occurrence: adsk.fusion.Occurrence, z: float
+    ) -> adsk.core.Matrix3D:
+        # The occurrence's transform moved up by z
+        transform = occurrence.transform
+        translation = transform.translation
+        transform.translation = adsk.core.Vector3D.create(
+            translation.x, translation.y, translation.z + z
+        )
+        return transform
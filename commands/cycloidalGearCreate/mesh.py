@@ -0,0 +1,528 @@
+import argparse
+import bisect
+import heapq
+import math
+import operator
+import os
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from . import kernel
+from .cache import ProfileCache
+from .settings import CycloidalGearSettings
+
+# Triangle meshes of the gear parts for 3D printing, without going through
+# Fusion B-reps. Fusion's Python has no NumPy, so the bulk work is done the way
+# NumPy would do it: flat typed arrays, strided slice assignment and map() over
+# index arrays, with Python-level loops only over outline vertices.
+#
+# Each part's 2D region is cut along radii into simple polygons that share
+# their cut vertices, and each polygon is triangulated by ear clipping; the
+# triangulation is then extruded into caps and walls.
+
+PARTS = ("rotor", "ring_gear", "camshaft", "output")
+
+
+@dataclass
+class Mesh:
+    # xyz per vertex, and three vertex indices per counter-clockwise triangle
+    vertices: array
+    triangles: array
+    # Anything about the part that the mesh leaves out, to pass on to the user
+    warnings: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.triangles) // 3
+
+    def normals(self) -> array:
+        # Unit normal xyz per triangle from its winding, worked out a
+        # coordinate at a time with map() over the corners gathered by index
+        coordinates = [self.vertices[axis::3] for axis in range(3)]
+        (a, b, c) = (
+            [list(map(axis.__getitem__, self.triangles[k::3])) for axis in coordinates]
+            for k in range(3)
+        )
+        u = [list(map(operator.sub, b[axis], a[axis])) for axis in range(3)]
+        v = [list(map(operator.sub, c[axis], a[axis])) for axis in range(3)]
+        cross = [
+            list(
+                map(
+                    operator.sub,
+                    map(operator.mul, u[(axis + 1) % 3], v[(axis + 2) % 3]),
+                    map(operator.mul, u[(axis + 2) % 3], v[(axis + 1) % 3]),
+                )
+            )
+            for axis in range(3)
+        ]
+        lengths = [length or 1.0 for length in map(math.hypot, *cross)]
+        normals = array("f", bytes(4 * 3 * len(self)))
+        for axis in range(3):
+            normals[axis::3] = array("f", map(operator.truediv, cross[axis], lengths))
+        return normals
+
+    def stl_bytes(self) -> bytearray:
+        count = len(self)
+        vertices = array("f", self.vertices)
+        normals = self.normals()
+        if sys.byteorder == "big":
+            vertices.byteswap()
+            normals.byteswap()
+        raw = vertices.tobytes()
+        corners = [raw[i : i + 12] for i in range(0, len(raw), 12)]
+        facets = b"".join(map(corners.__getitem__, self.triangles))
+        normal_bytes = normals.tobytes()
+
+        # 80 byte header, facet count, then 50 bytes per facet: a normal,
+        # three corners and a zero attribute word. Each is scattered into
+        # place with one strided copy per byte position.
+        out = bytearray(84 + 50 * count)
+        out[:80] = b"cycloidal gear".ljust(80, b" ")
+        out[80:84] = struct.pack("<I", count)
+        for k in range(12):
+            out[84 + k :: 50] = normal_bytes[k::12]
+        for k in range(36):
+            out[96 + k :: 50] = facets[k::36]
+        return out
+
+    def write_stl(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.stl_bytes())
+
+
+def combine(meshes: Sequence[Mesh]) -> Mesh:
+    vertices = array("d")
+    triangles = array("I")
+    for mesh in meshes:
+        offset = len(vertices) // 3
+        vertices.extend(mesh.vertices)
+        triangles.extend(array("I", [i + offset for i in mesh.triangles]))
+    return Mesh(vertices, triangles)
+
+
+class Region:
+    # A planar region under construction: shared 2D vertices, counter-clockwise
+    # triangles and the boundary loops (region on the left) that become walls.
+    def __init__(self):
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+        self.triangles: List[int] = []
+        self.loops: List[List[int]] = []
+
+    def add_points(self, xs: Iterable[float], ys: Iterable[float]) -> List[int]:
+        start = len(self.xs)
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        return list(range(start, len(self.xs)))
+
+    def add_circle(self, circle: kernel.Circle, segments: int, start: float = 0.0) -> List[int]:
+        angles = [start + 2 * math.pi * i / segments for i in range(segments)]
+        return self.add_points(
+            [circle.x + circle.radius * math.cos(a) for a in angles],
+            [circle.y + circle.radius * math.sin(a) for a in angles],
+        )
+
+    def add_ring(
+        self, circle: kernel.Circle, angles: Sequence[float], segments: int
+    ) -> Tuple[List[int], List[int]]:
+        # A closed counter-clockwise ring on the circle with a vertex at each of
+        # the given angles and no gap wider than one of segments; returns the
+        # ring and the position in it of the vertex at each angle
+        base = angles[0]
+        full = 2 * math.pi
+        offsets = [(angle - base) % full for angle in angles]
+        keys: List[float] = []
+        for offset in sorted(offsets):
+            if not keys or offset - keys[-1] > 1e-12:
+                keys.append(offset)
+        if len(keys) > 1 and full - keys[-1] <= 1e-12:
+            keys.pop()
+
+        ring_angles: List[float] = []
+        starts: List[int] = []
+        for (a, b) in zip(keys, keys[1:] + [full]):
+            starts.append(len(ring_angles))
+            steps = max(1, math.ceil((b - a) * segments / full - 1e-9))
+            ring_angles.extend(a + (b - a) * k / steps for k in range(steps))
+        ring = self.add_points(
+            [circle.x + circle.radius * math.cos(base + a) for a in ring_angles],
+            [circle.y + circle.radius * math.sin(base + a) for a in ring_angles],
+        )
+        positions = [
+            starts[bisect.bisect_left(keys, offset - 1e-12) % len(keys)]
+            for offset in offsets
+        ]
+        return (ring, positions)
+
+    def clip_ears(self, ring: List[int]):
+        # Triangulates a simple counter-clockwise polygon by cutting off convex
+        # corners that hold no reflex corner of what is left, shortest cut
+        # first so the triangles stay small. Makes len(ring) - 2 triangles.
+        n = len(ring)
+        xs = [self.xs[v] for v in ring]
+        ys = [self.ys[v] for v in ring]
+        before = [n - 1] + list(range(n - 1))
+        after = list(range(1, n)) + [0]
+
+        def turn(a: int, b: int, c: int) -> float:
+            return (xs[b] - xs[a]) * (ys[c] - ys[a]) - (ys[b] - ys[a]) * (xs[c] - xs[a])
+
+        def cut(i: int) -> float:
+            (a, c) = (before[i], after[i])
+            return (xs[c] - xs[a]) ** 2 + (ys[c] - ys[a]) ** 2
+
+        def is_ear(a: int, b: int, c: int) -> bool:
+            left = min(xs[a], xs[b], xs[c])
+            right = max(xs[a], xs[b], xs[c])
+            bottom = min(ys[a], ys[b], ys[c])
+            top = max(ys[a], ys[b], ys[c])
+            rows = range(int((bottom - y0) / size), int((top - y0) / size) + 1)
+            for column in range(int((left - x0) / size), int((right - x0) / size) + 1):
+                for row in rows:
+                    for r in cells.get((column, row), ()):
+                        if (
+                            reflex[r]
+                            and r != a
+                            and r != c
+                            and turn(a, b, r) >= 0
+                            and turn(b, c, r) >= 0
+                            and turn(c, a, r) >= 0
+                        ):
+                            return False
+            return True
+
+        # Reflex corners in a grid of square cells, about as many cells across
+        # as a side has corners. Corners only ever turn from reflex to convex
+        # as ears are cut off.
+        reflex = [turn(before[i], i, after[i]) <= 0 for i in range(n)]
+        (x0, y0) = (min(xs), min(ys))
+        size = max(max(xs) - x0, max(ys) - y0) / math.sqrt(n) or 1.0
+        cells: dict = {}
+        for r in range(n):
+            if reflex[r]:
+                key = (int((xs[r] - x0) / size), int((ys[r] - y0) / size))
+                cells.setdefault(key, []).append(r)
+
+        triangles = self.triangles
+        first = len(triangles)
+        clipped = [False] * n
+        queue = [(cut(i), i) for i in range(n) if not reflex[i]]
+        heapq.heapify(queue)
+        # Corners that were not ears when last tried; a reflex corner turning
+        # convex can free them without their neighbours changing
+        blocked: List[int] = []
+        (remaining, progress) = (n, False)
+        while remaining > 3:
+            if not queue:
+                if not progress:
+                    raise ValueError(
+                        "Outline pieces overlap; the part cannot be meshed"
+                    )
+                queue = [(cut(i), i) for i in blocked if not clipped[i]]
+                heapq.heapify(queue)
+                (blocked, progress) = ([], False)
+                continue
+            (length, i) = heapq.heappop(queue)
+            if clipped[i] or reflex[i] or length != cut(i):
+                continue
+            (a, c) = (before[i], after[i])
+            if not is_ear(a, i, c):
+                blocked.append(i)
+                continue
+            triangles.extend((ring[a], ring[i], ring[c]))
+            clipped[i] = True
+            after[a] = c
+            before[c] = a
+            remaining -= 1
+            progress = True
+            for k in (a, c):
+                if reflex[k] and turn(before[k], k, after[k]) > 0:
+                    reflex[k] = False
+                if not reflex[k]:
+                    heapq.heappush(queue, (cut(k), k))
+        i = next(k for k in range(n) if not clipped[k])
+        triangles.extend((ring[before[i]], ring[i], ring[after[i]]))
+        self._check(first)
+
+    def fan(self, ring: List[int]):
+        # Convex ring, counter-clockwise
+        triangles = self.triangles
+        first = len(triangles)
+        for k in range(1, len(ring) - 1):
+            triangles.extend((ring[0], ring[k], ring[k + 1]))
+        self._check(first)
+
+    def check_visible(self, ring: List[int], cx: float, cy: float):
+        # Every radius from (cx, cy) must cross the ring once, in order
+        (xs, ys) = (self.xs, self.ys)
+        base = math.atan2(ys[ring[0]] - cy, xs[ring[0]] - cx)
+        angles = [
+            (math.atan2(ys[v] - cy, xs[v] - cx) - base) % (2 * math.pi) + base
+            for v in ring
+        ]
+        angles.append(base + 2 * math.pi)
+        for k in range(1, len(angles)):
+            if angles[k] <= angles[k - 1]:
+                raise ValueError(
+                    f"Outline is not visible from ({cx:.4f}, {cy:.4f}); it cannot be "
+                    f"meshed at this size"
+                )
+
+    def _check(self, first: int):
+        # Every new triangle must keep the counter-clockwise winding
+        (xs, ys, t) = (self.xs, self.ys, self.triangles)
+        for k in range(first, len(t), 3):
+            (a, b, c) = (t[k], t[k + 1], t[k + 2])
+            area = (xs[b] - xs[a]) * (ys[c] - ys[a]) - (ys[b] - ys[a]) * (xs[c] - xs[a])
+            if area <= 0:
+                raise ValueError("Outline pieces overlap; the part cannot be meshed")
+
+    def extrude(self, z0: float, z1: float) -> Mesh:
+        n = len(self.xs)
+        vertices = array("d", bytes(8 * 6 * n))
+        vertices[0::3] = array("d", self.xs + self.xs)
+        vertices[1::3] = array("d", self.ys + self.ys)
+        vertices[2::3] = array("d", [z0] * n + [z1] * n)
+
+        cap = array("I", self.triangles)
+        bottom = array("I", cap)
+        bottom[1::3] = cap[2::3]
+        bottom[2::3] = cap[1::3]
+        top = array("I", [v + n for v in cap])
+
+        triangles = bottom + top
+        for loop in self.loops:
+            here = array("I", loop)
+            after = array("I", loop[1:] + loop[:1])
+            wall = array("I", bytes(4 * 6 * len(loop)))
+            wall[0::6] = here
+            wall[1::6] = after
+            wall[2::6] = array("I", [v + n for v in after])
+            wall[3::6] = here
+            wall[4::6] = wall[2::6]
+            wall[5::6] = array("I", [v + n for v in here])
+            triangles.extend(wall)
+        return Mesh(vertices, triangles)
+
+
+def circle_segments(radius: float, tolerance: float, multiple: int = 1) -> int:
+    # Fewest segments whose chords stay within tolerance of the circle,
+    # rounded up to a multiple so rings can be split evenly
+    ratio = min(tolerance / radius, 1.0)
+    segments = max(8, math.ceil(math.pi / math.acos(1 - ratio)))
+    return -(-segments // multiple) * multiple
+
+
+def span(ring: List[int], start: int, stop: int) -> List[int]:
+    # ring[start] to ring[stop] inclusive, counter-clockwise; all the way round
+    # when they are the same position
+    n = len(ring)
+    return [ring[(start + k) % n] for k in range((stop - start - 1) % n + 2)]
+
+
+def arc_segments(arc: kernel.Arc, tolerance: float) -> int:
+    turns = abs(arc.sweep) / (2 * math.pi)
+    return max(1, math.ceil(circle_segments(arc.radius, tolerance) * turns))
+
+
+def rotor_mesh(settings: CycloidalGearSettings, rotor: kernel.RotorGeometry) -> Mesh:
+    tolerance = settings.profile_tolerance
+    outline = rotor.outline
+    holes = rotor.output_holes
+    bearing = rotor.bearing_hole
+    count = len(holes)
+    hole_circle = math.hypot(holes[0].x, holes[0].y)
+    hole_radius = holes[0].radius
+
+    # A circle between the output holes and the lobes splits the rotor into a
+    # ring under the lobes, cut along the radius through the start of every
+    # lobe, and a ring around the output holes, cut along the radii through
+    # and between the hole centres.
+    inside = min(math.hypot(x, y) for (x, y) in zip(outline.xs, outline.ys))
+    if hole_circle + hole_radius >= inside:
+        raise ValueError("Output holes cut into the rotor lobes")
+    if bearing.radius >= hole_circle - hole_radius:
+        raise ValueError("Output holes cut into the bearing hole")
+    if count > 1 and hole_radius >= hole_circle * math.sin(math.pi / count):
+        raise ValueError("Output holes overlap")
+    middle = (hole_circle + hole_radius + inside) / 2
+
+    region = Region()
+    # The outline runs clockwise; walls and pieces want counter-clockwise
+    lobes = region.add_points(reversed(outline.xs), reversed(outline.ys))
+    region.check_visible(lobes, 0, 0)
+    region.loops.append(lobes)
+    per_lobe = len(lobes) // settings.rotor_lobes
+    cuts = list(range(0, per_lobe * settings.rotor_lobes, per_lobe))
+    cut_angles = [math.atan2(region.ys[lobes[c]], region.xs[lobes[c]]) for c in cuts]
+
+    # Radii through every hole centre and half way between the holes
+    ray_angles: List[float] = []
+    ray_holes: List[Optional[kernel.Circle]] = []
+    for hole in holes:
+        angle = math.atan2(hole.y, hole.x)
+        ray_angles.extend((angle, angle + math.pi / count))
+        ray_holes.extend((hole, None))
+
+    (middle_ring, middle_at) = region.add_ring(
+        kernel.Circle(0, 0, middle),
+        ray_angles + cut_angles,
+        circle_segments(middle, tolerance),
+    )
+    (bearing_ring, bearing_at) = region.add_ring(
+        bearing, ray_angles, circle_segments(bearing.radius, tolerance)
+    )
+    region.loops.append(bearing_ring[::-1])
+
+    lobe_at = middle_at[len(ray_angles) :]
+    for j in range(len(cuts)):
+        after = (j + 1) % len(cuts)
+        region.clip_ears(
+            span(lobes, cuts[j], cuts[after])
+            + span(middle_ring, lobe_at[j], lobe_at[after])[::-1]
+        )
+
+    # Each hole ring starts at its outermost point, so half way round is the
+    # innermost, and the pieces either side go round opposite halves of it
+    hole_segments = circle_segments(hole_radius, tolerance, 2)
+    half = hole_segments // 2
+    outward: List[List[int]] = []
+    inward: List[List[int]] = []
+    for (angle, hole) in zip(ray_angles, ray_holes):
+        if hole is None:
+            outward.append([])
+            inward.append([])
+            continue
+        hole_ring = region.add_circle(hole, hole_segments, angle)
+        region.loops.append(hole_ring[::-1])
+        outward.append(hole_ring[half::-1])
+        inward.append(hole_ring[:1] + hole_ring[: half - 1 : -1])
+
+    for k in range(len(ray_angles)):
+        after = (k + 1) % len(ray_angles)
+        region.clip_ears(
+            outward[k]
+            + span(middle_ring, middle_at[k], middle_at[after])
+            + inward[after]
+            + span(bearing_ring, bearing_at[k], bearing_at[after])[::-1]
+        )
+
+    return region.extrude(0, settings.rotor_thickness)
+
+
+def ring_gear_mesh(settings: CycloidalGearSettings, geometry: kernel.GearGeometry) -> Mesh:
+    # Cut along the radius half way between each pair of pins into one piece
+    # per pin, from the housing circle in to the bore outline round the pin.
+    tolerance = settings.profile_tolerance
+    housing = geometry.housing[1]
+    (arcs, warning) = kernel.filleted_ring_gear_bore(settings, geometry)
+    pins = len(geometry.ring_pins)
+    per_pin = len(arcs) // pins
+
+    region = Region()
+    contour: List[int] = []
+    mids: List[int] = []
+    mid_angles: List[float] = []
+    for (k, arc) in enumerate(arcs):
+        segments = arc_segments(arc, tolerance)
+        if k % per_pin == per_pin - 1:
+            # The bore up to the next pin, with a vertex half way along
+            segments += segments % 2
+            mids.append(len(contour) + segments // 2)
+            mid_angles.append(arc.start + arc.sweep / 2)
+        (xs, ys) = arc.points(segments)
+        contour.extend(region.add_points(xs[:-1], ys[:-1]))
+
+    (housing_ring, housing_at) = region.add_ring(
+        housing, mid_angles, circle_segments(housing.radius, tolerance)
+    )
+    for k in range(pins):
+        region.clip_ears(
+            span(housing_ring, housing_at[k - 1], housing_at[k])
+            + span(contour, mids[k - 1], mids[k])[::-1]
+        )
+    region.loops.append(housing_ring)
+    region.loops.append(contour[::-1])
+    mesh = region.extrude(0, settings.ring_gear_thickness)
+    if warning:
+        mesh.warnings.append(warning)
+    return mesh
+
+
+def cylinder(circle: kernel.Circle, tolerance: float, z0: float, z1: float) -> Mesh:
+    region = Region()
+    ring = region.add_circle(circle, circle_segments(circle.radius, tolerance))
+    region.fan(ring)
+    region.loops.append(ring)
+    return region.extrude(z0, z1)
+
+
+def gear_meshes(
+    settings: CycloidalGearSettings,
+    parts: Sequence[str] = PARTS,
+    cache: Optional[ProfileCache] = None,
+) -> List[Tuple[str, Mesh]]:
+    geometry = kernel.build_gear(settings, cache)
+    tolerance = settings.profile_tolerance
+    meshes: List[Tuple[str, Mesh]] = []
+    if "rotor" in parts:
+        meshes.append(("rotor", rotor_mesh(settings, geometry.rotors[0])))
+    if "ring_gear" in parts:
+        meshes.append(("ring_gear", ring_gear_mesh(settings, geometry)))
+    if "camshaft" in parts:
+        meshes.append(
+            (
+                "camshaft",
+                cylinder(geometry.cams[0].circle, tolerance, 0, settings.rotor_thickness),
+            )
+        )
+    if "output" in parts:
+        pins = [
+            cylinder(pin, tolerance, 0, settings.ring_gear_thickness)
+            for pin in geometry.output_pins
+        ]
+        plate = cylinder(
+            geometry.output_plate,
+            tolerance,
+            settings.ring_gear_thickness,
+            settings.ring_gear_thickness + settings.output_plate_thickness,
+        )
+        meshes.append(("output", combine(pins + [plate])))
+    return meshes
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Write binary STL meshes of the cycloidal gear parts."
+    )
+    parser.add_argument(
+        "settings", nargs="?", help="JSON settings file (default: default settings)"
+    )
+    parser.add_argument("-o", "--output", default=".", help="output directory")
+    parser.add_argument("-p", "--parts", nargs="+", choices=PARTS, default=list(PARTS))
+    parser.add_argument(
+        "--tolerance", type=float, help="chord tolerance for profiles and circles (cm)"
+    )
+    args = parser.parse_args(argv)
+
+    settings = CycloidalGearSettings()
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = CycloidalGearSettings.loads(f.read())
+    if args.tolerance is not None:
+        settings.profile_tolerance = args.tolerance
+
+    os.makedirs(args.output, exist_ok=True)
+    for (name, mesh) in gear_meshes(settings, args.parts):
+        start = time.perf_counter()
+        mesh.write_stl(os.path.join(args.output, f"{name}.stl"))
+        for warning in mesh.warnings:
+            print(f"{name}: {warning}", file=sys.stderr)
+        print(
+            f"{name}: {len(mesh)} triangles, {time.perf_counter() - start:.2f}s",
+            file=sys.stderr,
+        )
+    return 0
@@ -0,0 +1,263 @@
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .profile import Epitrochoid
+from .settings import CycloidalGearSettings
+
+# Searches ring_gear_pins, rotor_diameter, output_hole_count and
+# output_pin_diameter for designs that meet a reduction ratio inside an
+# envelope diameter with every wall at least min_wall thick, and returns the
+# Pareto front of ratio error, outer diameter and output pin capacity. The ring
+# gear wall is sized to leave exactly min_wall behind the pins.
+#
+# Candidates are evaluated in batches, one batch per (ring_gear_pins,
+# rotor_diameter) pair, across a process pool. Within a batch the checks run
+# from cheapest to most expensive and each failure drops everything behind it:
+# the ring gear wall needs only derived values, the rotor root radius needs one
+# lobe of profile points, and every wall around the output holes only gets
+# thinner as the output pins grow, so the pin diameter scan stops at the first
+# one that does not fit.
+
+SAMPLES_PER_LOBE = 256
+
+
+@dataclass
+class OptimizeTarget:
+    ratio: float
+    envelope_diameter: float
+    min_wall: float
+    ratio_tolerance: float = 0.0
+
+
+@dataclass
+class Design:
+    ring_gear_pins: int
+    rotor_diameter: float
+    output_hole_count: int
+    output_pin_diameter: float
+    ring_gear_wall_thickness: float
+    # Objectives
+    ratio_error: float
+    outer_diameter: float
+    # Output hole count times output pin diameter squared, proportional to the
+    # shear area the output pins share the torque over
+    output_capacity: float
+    # Thinnest wall in the design
+    min_wall: float
+
+    @property
+    def overrides(self) -> dict:
+        return {
+            "ring_gear_pins": self.ring_gear_pins,
+            "rotor_diameter": self.rotor_diameter,
+            "output_hole_count": self.output_hole_count,
+            "output_pin_diameter": self.output_pin_diameter,
+            "ring_gear_wall_thickness": self.ring_gear_wall_thickness,
+        }
+
+    def dominates(self, other: "Design") -> bool:
+        mine = (self.ratio_error, self.outer_diameter, -self.output_capacity)
+        theirs = (other.ratio_error, other.outer_diameter, -other.output_capacity)
+        return mine != theirs and all(a <= b for (a, b) in zip(mine, theirs))
+
+
+def frange(start: float, stop: float, step: float) -> List[float]:
+    # Rounded so the values match what a user would type in the dialog
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + step * i, 6) for i in range(max(count, 0))]
+
+
+def root_radius(settings: CycloidalGearSettings) -> float:
+    # Smallest radius of the rotor outline, from one lobe of profile points
+    trochoid = Epitrochoid.from_settings(settings)
+    step = trochoid.lobe_angle / SAMPLES_PER_LOBE
+    (xs, ys) = trochoid.points([step * i for i in range(SAMPLES_PER_LOBE + 1)])
+    return min(math.hypot(x, y) for (x, y) in zip(xs, ys))
+
+
+def evaluate_batch(record: tuple) -> Tuple[List[Design], int]:
+    # All designs of one (ring_gear_pins, rotor_diameter) pair; returns the
+    # feasible ones and how many candidates were evaluated.
+    (base, target, pins, rotor_diameter, hole_counts, pin_diameters) = record
+    settings = CycloidalGearSettings.from_dict(
+        dict(base, ring_gear_pins=pins, rotor_diameter=rotor_diameter)
+    )
+    evaluated = 1
+
+    # ring_gear_outer_diameter adds the wall thickness to the rotor diameter,
+    # and the pins and margin take their share of it
+    behind_pins = (
+        target.min_wall + settings.ring_gear_margin + settings.ring_gear_pin_radius
+    )
+    wall_thickness = math.ceil(2000 * behind_pins) / 1000
+    settings.ring_gear_wall_thickness = wall_thickness
+    outer_diameter = settings.ring_gear_outer_diameter
+    if outer_diameter > target.envelope_diameter:
+        return ([], evaluated)
+    ring_wall = (
+        outer_diameter / 2
+        - settings.rotor_radius
+        - settings.ring_gear_margin
+        - settings.ring_gear_pin_radius
+    )
+
+    root = root_radius(settings)
+    ratio_error = abs(settings.rotor_lobes - target.ratio) / target.ratio
+    bearing_radius = settings.rotor_bearing_hole_diameter / 2
+    output_radius = settings.output_circle_diameter / 2
+
+    designs: List[Design] = []
+    for holes in hole_counts:
+        best: Optional[Design] = None
+        for pin_diameter in pin_diameters:
+            evaluated += 1
+            settings.output_hole_count = holes
+            settings.output_pin_diameter = pin_diameter
+            hole_radius = settings.output_hole_diameter / 2
+            wall = min(
+                # Bearing hole to output holes
+                output_radius - hole_radius - bearing_radius,
+                # Output holes to the rotor root
+                root - output_radius - hole_radius,
+                # Between neighbouring output holes
+                2 * output_radius * math.sin(math.pi / holes) - 2 * hole_radius,
+                ring_wall,
+            )
+            if wall < target.min_wall:
+                break
+            best = Design(
+                ring_gear_pins=pins,
+                rotor_diameter=rotor_diameter,
+                output_hole_count=holes,
+                output_pin_diameter=pin_diameter,
+                ring_gear_wall_thickness=wall_thickness,
+                ratio_error=ratio_error,
+                outer_diameter=outer_diameter,
+                output_capacity=holes * pin_diameter**2,
+                min_wall=wall,
+            )
+        # Smaller pins with the same holes are dominated by the largest that fits
+        if best is not None:
+            designs.append(best)
+    return (designs, evaluated)
+
+
+def pareto_front(designs: Iterable[Design]) -> List[Design]:
+    # Sorted so no design can be dominated by one after it
+    ordered = sorted(
+        designs, key=lambda d: (d.ratio_error, d.outer_diameter, -d.output_capacity)
+    )
+    front: List[Design] = []
+    for design in ordered:
+        if not any(kept.dominates(design) for kept in front):
+            front.append(design)
+    return front
+
+
+def optimize(
+    target: OptimizeTarget,
+    base: Optional[CycloidalGearSettings] = None,
+    rotor_diameters: Optional[Sequence[float]] = None,
+    hole_counts: Sequence[int] = range(3, 13),
+    pin_diameters: Optional[Sequence[float]] = None,
+    workers: Optional[int] = None,
+) -> Tuple[List[Design], int]:
+    # Returns the Pareto front and the number of candidates evaluated
+    if base is None:
+        base = CycloidalGearSettings()
+    if rotor_diameters is None:
+        rotor_diameters = frange(1.0, target.envelope_diameter, 0.05)
+    if pin_diameters is None:
+        pin_diameters = frange(0.1, 1.0, 0.01)
+
+    # Ratio first: only pin counts within the tolerance are searched at all
+    lowest = max(2, math.ceil(target.ratio * (1 - target.ratio_tolerance) - 1e-9))
+    highest = math.floor(target.ratio * (1 + target.ratio_tolerance) + 1e-9)
+    base_values = base.to_dict()
+    records = [
+        (base_values, target, lobes + 1, diameter, list(hole_counts), pin_diameters)
+        for lobes in range(lowest, highest + 1)
+        for diameter in rotor_diameters
+        # The ring gear wall comes on top, so the rotor alone must fit
+        if diameter + 2 * target.min_wall < target.envelope_diameter
+    ]
+
+    feasible: List[Design] = []
+    evaluated = 0
+    if len(records) > 1 and workers != 1:
+        with multiprocessing.Pool(workers) as pool:
+            for (designs, count) in pool.imap_unordered(
+                evaluate_batch, records, chunksize=4
+            ):
+                feasible.extend(designs)
+                evaluated += count
+    else:
+        for (designs, count) in map(evaluate_batch, records):
+            feasible.extend(designs)
+            evaluated += count
+    return (pareto_front(feasible), evaluated)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Find cycloidal gear settings for a ratio and envelope."
+    )
+    parser.add_argument(
+        "ratio", type=float, help="target reduction ratio (rotor lobes)"
+    )
+    parser.add_argument(
+        "envelope", type=float, help="largest ring gear outer diameter (cm)"
+    )
+    parser.add_argument("min_wall", type=float, help="thinnest allowed wall (cm)")
+    parser.add_argument(
+        "--ratio-tolerance",
+        type=float,
+        default=0.0,
+        help="accepted relative ratio error (default: exact)",
+    )
+    parser.add_argument(
+        "--settings", help="JSON settings file for the fixed values (default: defaults)"
+    )
+    parser.add_argument(
+        "-o", "--output", help="JSON lines output file (default: stdout)"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, help="worker processes (default: all cores)"
+    )
+    args = parser.parse_args(argv)
+
+    base = CycloidalGearSettings()
+    if args.settings:
+        with open(args.settings, "r") as f:
+            base = CycloidalGearSettings.loads(f.read())
+    target = OptimizeTarget(
+        ratio=args.ratio,
+        envelope_diameter=args.envelope,
+        min_wall=args.min_wall,
+        ratio_tolerance=args.ratio_tolerance,
+    )
+
+    start = time.perf_counter()
+    (front, evaluated) = optimize(target, base, workers=args.workers)
+    lines = [
+        json.dumps(dict(asdict(design), overrides=design.overrides)) + "\n"
+        for design in front
+    ]
+    if args.output:
+        with open(args.output, "w") as output:
+            output.writelines(lines)
+    else:
+        sys.stdout.writelines(lines)
+
+    print(
+        f"{evaluated} candidates, {len(front)} on the Pareto front, "
+        f"{time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+    return 0 if front else 1
@@ -0,0 +1,349 @@
+import math
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+# Rotor profile math kept free of adsk so it can run (and be profiled) outside
+# Fusion 360. Fusion's bundled interpreter has no NumPy, so the batched calls
+# below are plain Python loops with every per-point constant hoisted out.
+
+
+@dataclass
+class ProfileSample:
+    xs: List[float]
+    ys: List[float]
+    evaluations: int
+    max_deviation: float = 0.0
+
+
+@dataclass(frozen=True)
+class Epitrochoid:
+    r_major: float
+    r_minor: float
+    eccentricity: float
+    n: int
+
+    @classmethod
+    def from_settings(cls, settings) -> "Epitrochoid":
+        return cls(
+            r_major=settings.rotor_radius,
+            r_minor=settings.ring_gear_pin_radius,
+            eccentricity=settings.eccentric_offset,
+            n=settings.ring_gear_pins,
+        )
+
+    @property
+    def lobe_angle(self) -> float:
+        return 2 * math.pi / (self.n - 1)
+
+    def point(self, theta: float) -> Tuple[float, float]:
+        (xs, ys) = self.points((theta,))
+        return (xs[0], ys[0])
+
+    def points(self, thetas: Sequence[float]) -> Tuple[List[float], List[float]]:
+        r_major = self.r_major
+        r_minor = self.r_minor
+        e = self.eccentricity
+        n = self.n
+        m = 1 - n
+        k = r_major / (e * n)
+        sin = math.sin
+        cos = math.cos
+        atan2 = math.atan2
+
+        xs: List[float] = []
+        ys: List[float] = []
+        for theta in thetas:
+            psi = atan2(sin(m * theta), k - cos(m * theta))
+            xs.append(
+                r_major * cos(theta)
+                - r_minor * cos(theta + psi)
+                - e * cos(n * theta)
+            )
+            ys.append(
+                -r_major * sin(theta)
+                + r_minor * sin(theta + psi)
+                + e * sin(n * theta)
+            )
+        return (xs, ys)
+
+    def mirror(
+        self, xs: Sequence[float], ys: Sequence[float]
+    ) -> Tuple[List[float], List[float]]:
+        # The lobe is symmetric about its axis, so the point at
+        # (lobe_angle - theta) is the reflection of the point at theta.
+        c = math.cos(-self.lobe_angle)
+        s = math.sin(-self.lobe_angle)
+        return (
+            [x * c + y * s for (x, y) in zip(xs, ys)],
+            [x * s - y * c for (x, y) in zip(xs, ys)],
+        )
+
+    def lobe(
+        self, half_xs: Sequence[float], half_ys: Sequence[float]
+    ) -> Tuple[List[float], List[float]]:
+        # Expects points from theta = 0 up to and including lobe_angle / 2 and
+        # returns the whole lobe from 0 to lobe_angle.
+        (mirror_xs, mirror_ys) = self.mirror(half_xs[-2::-1], half_ys[-2::-1])
+        return (list(half_xs) + mirror_xs, list(half_ys) + mirror_ys)
+
+    def lobe_points(self, half_thetas: Sequence[float]) -> Tuple[List[float], List[float]]:
+        (xs, ys) = self.points(half_thetas)
+        return self.lobe(xs, ys)
+
+    def speeds(self, thetas: Sequence[float]) -> List[float]:
+        # |dP/dtheta| from the analytic derivative, with
+        # dpsi/dtheta = m (k cos(m theta) - 1) / (1 + k^2 - 2 k cos(m theta)).
+        r_major = self.r_major
+        r_minor = self.r_minor
+        e = self.eccentricity
+        n = self.n
+        m = 1 - n
+        k = r_major / (e * n)
+        sin = math.sin
+        cos = math.cos
+        atan2 = math.atan2
+        hypot = math.hypot
+
+        speeds: List[float] = []
+        for theta in thetas:
+            cm = cos(m * theta)
+            psi = atan2(sin(m * theta), k - cm)
+            a = r_minor * (1 + m * (k * cm - 1) / (1 + k * k - 2 * k * cm))
+            speeds.append(
+                hypot(
+                    -r_major * sin(theta) + a * sin(theta + psi) + e * n * sin(n * theta),
+                    -r_major * cos(theta) + a * cos(theta + psi) + e * n * cos(n * theta),
+                )
+            )
+        return speeds
+
+    def curvatures(
+        self, thetas: Sequence[float]
+    ) -> Tuple[List[float], List[float]]:
+        # Speed and signed curvature of the profile. The profile is the offset
+        # by r_minor of the trochoid T = (R cos t - e cos nt, -R sin t + e sin nt),
+        # so with kT the curvature of T: k = kT / (1 + r kT), |P'| = |T'| |1 + r kT|.
+        r_major = self.r_major
+        r_minor = self.r_minor
+        e = self.eccentricity
+        n = self.n
+        sin = math.sin
+        cos = math.cos
+
+        speeds: List[float] = []
+        curvatures: List[float] = []
+        for theta in thetas:
+            st = sin(theta)
+            ct = cos(theta)
+            snt = sin(n * theta)
+            cnt = cos(n * theta)
+            dx = -r_major * st + e * n * snt
+            dy = -r_major * ct + e * n * cnt
+            ddx = -r_major * ct + e * n * n * cnt
+            ddy = r_major * st - e * n * n * snt
+            speed_t = math.hypot(dx, dy)
+            kappa_t = (dx * ddy - dy * ddx) / speed_t**3
+            scale = 1 + r_minor * kappa_t
+            speeds.append(speed_t * abs(scale))
+            curvatures.append(kappa_t / scale if scale != 0 else math.inf)
+        return (speeds, curvatures)
+
+    def chord_deviation(
+        self, thetas: Sequence[float], xs: Sequence[float], ys: Sequence[float]
+    ) -> float:
+        # Largest distance between the curve and the chords of a sampled
+        # polyline, checked at the quarter points of every segment.
+        probes = [
+            thetas[i] + (thetas[i + 1] - thetas[i]) * f
+            for i in range(len(thetas) - 1)
+            for f in (0.25, 0.5, 0.75)
+        ]
+        (pxs, pys) = self.points(probes)
+        worst = 0.0
+        for (k, (px, py)) in enumerate(zip(pxs, pys)):
+            i = k // 3
+            dx = xs[i + 1] - xs[i]
+            dy = ys[i + 1] - ys[i]
+            length = math.hypot(dx, dy)
+            if length > 0:
+                worst = max(worst, abs((px - xs[i]) * dy - (py - ys[i]) * dx) / length)
+        return worst
+
+    def sample_lobe_adaptive(
+        self, tolerance: float, table_size: int = 256
+    ) -> ProfileSample:
+        # Place points so every chord stays within tolerance of the curve. A
+        # chord of length c on a curve of curvature k deviates by about
+        # c^2 k / 8, so sqrt(|k| / (8 tolerance)) |P'| dtheta is the number of
+        # chords a stretch of curve needs. Integrate that density over half a
+        # lobe, split it into equal shares and refine until the measured
+        # deviation is within tolerance.
+        if not tolerance > 0:
+            raise ValueError("Profile tolerance must be greater than zero")
+        ht = self.lobe_angle / 2
+        h = ht / table_size
+        (speeds, curvatures) = self.curvatures(
+            [h * i / 2 for i in range(2 * table_size + 1)]
+        )
+        evaluations = 2 * table_size + 1
+        density = [
+            math.sqrt(min(abs(k), 1 / tolerance) / (8 * tolerance)) * v
+            for (v, k) in zip(speeds, curvatures)
+        ]
+        cumulative: List[float] = [0.0]
+        for i in range(table_size):
+            cumulative.append(
+                cumulative[-1]
+                + h / 6 * (density[2 * i] + 4 * density[2 * i + 1] + density[2 * i + 2])
+            )
+
+        segments = max(1, math.ceil(cumulative[-1]))
+        while True:
+            share = cumulative[-1] / segments
+            thetas: List[float] = [0.0]
+            j = 0
+            for i in range(1, segments):
+                target = share * i
+                while j < table_size - 1 and cumulative[j + 1] < target:
+                    j += 1
+                t = (target - cumulative[j]) / (cumulative[j + 1] - cumulative[j])
+                thetas.append(h * (j + t))
+            thetas.append(ht)
+
+            (xs, ys) = self.points(thetas)
+            deviation = self.chord_deviation(thetas, xs, ys)
+            evaluations += len(thetas) + 3 * (len(thetas) - 1)
+            if deviation <= tolerance:
+                break
+            segments = math.ceil(segments * 1.25)
+
+        (lobe_xs, lobe_ys) = self.lobe(xs, ys)
+        return ProfileSample(
+            xs=lobe_xs,
+            ys=lobe_ys,
+            evaluations=evaluations,
+            max_deviation=deviation,
+        )
+
+    def sample_lobe(self, maximum_distance: float) -> ProfileSample:
+        # Integrate the analytic speed over half a lobe into a cumulative
+        # arc-length table (Simpson per interval), then place points at equal
+        # arc-length spacing no longer than maximum_distance: interpolate theta
+        # in the table and refine every target with one batched Newton step.
+        # Every stage is a fixed number of batched evaluations per output point.
+        ht = self.lobe_angle / 2
+        evaluations = 0
+
+        def table(size: int) -> Tuple[List[float], List[float]]:
+            nonlocal evaluations
+            h = ht / size
+            v = self.speeds([h * i / 2 for i in range(2 * size + 1)])
+            evaluations += 2 * size + 1
+            lengths: List[float] = [0.0]
+            for i in range(size):
+                lengths.append(
+                    lengths[-1] + h / 6 * (v[2 * i] + 4 * v[2 * i + 1] + v[2 * i + 2])
+                )
+            return (lengths, v[::2])
+
+        table_size = 16
+        (lengths, node_speeds) = table(table_size)
+        segments = max(1, math.ceil(lengths[-1] / maximum_distance))
+        if 2 * segments > table_size:
+            table_size = 2 * segments
+            (lengths, node_speeds) = table(table_size)
+            segments = max(1, math.ceil(lengths[-1] / maximum_distance))
+        h = ht / table_size
+        spacing = lengths[-1] / segments
+
+        targets: List[float] = []
+        starts: List[int] = []
+        guesses: List[float] = []
+        j = 0
+        for i in range(1, segments):
+            target = spacing * i
+            while j < table_size - 1 and lengths[j + 1] < target:
+                j += 1
+            t = (target - lengths[j]) / (lengths[j + 1] - lengths[j])
+            targets.append(target)
+            starts.append(j)
+            guesses.append(h * (j + t))
+
+        # Newton step on s(theta) - target, with s(theta) from Simpson's rule
+        # over [theta_j, theta] and s'(theta) the speed at theta.
+        mids = self.speeds([(h * j + g) / 2 for (j, g) in zip(starts, guesses)])
+        ends = self.speeds(guesses)
+        evaluations += 2 * len(guesses)
+        refined: List[float] = []
+        for (target, j, g, vm, ve) in zip(targets, starts, guesses, mids, ends):
+            s = lengths[j] + (g - h * j) / 6 * (node_speeds[j] + 4 * vm + ve)
+            refined.append(g - (s - target) / ve)
+
+        thetas = [0.0] + refined + [ht]
+        (xs, ys) = self.points(thetas)
+        evaluations += len(thetas)
+        (lobe_xs, lobe_ys) = self.lobe(xs, ys)
+        return ProfileSample(xs=lobe_xs, ys=lobe_ys, evaluations=evaluations)
+
+    def sample_lobe_bisection(
+        self, maximum_distance: float, minimum_distance: float
+    ) -> ProfileSample:
+        # The original sampler: step along half a lobe adjusting dt until each
+        # chord lands between the minimum and maximum distance. Kept to compare
+        # evaluation counts against sample_lobe.
+        ht = self.lobe_angle / 2
+        (xm, ym) = self.point(ht)
+        (x, y) = self.point(0)
+        evaluations = 2
+        xs: List[float] = [x]
+        ys: List[float] = [y]
+
+        ct = 0
+        dt = math.pi / self.n
+        while math.hypot(x - xm, y - ym) > maximum_distance and ct < ht:
+            (xt, yt) = self.point(ct + dt)
+            dist = math.hypot(x - xt, y - yt)
+            evaluations += 1
+
+            ddt = dt / 2
+            last_too_big = False
+            last_too_small = False
+
+            while dist > maximum_distance or dist < minimum_distance:
+                if dist > maximum_distance:
+                    if last_too_small:
+                        ddt /= 2
+
+                    last_too_small = False
+                    last_too_big = True
+
+                    if ddt > dt / 2:
+                        ddt = dt / 2
+
+                    dt -= ddt
+
+                elif dist < minimum_distance:
+                    if last_too_big:
+                        ddt /= 2
+
+                    last_too_small = True
+                    last_too_big = False
+                    dt += ddt
+
+                (xt, yt) = self.point(ct + dt)
+                dist = math.hypot(x - xt, y - yt)
+                evaluations += 1
+
+            if ct + dt >= ht:
+                break
+
+            x = xt
+            y = yt
+            xs.append(x)
+            ys.append(y)
+            ct += dt
+
+        xs.append(xm)
+        ys.append(ym)
+        (lobe_xs, lobe_ys) = self.lobe(xs, ys)
+        return ProfileSample(xs=lobe_xs, ys=lobe_ys, evaluations=evaluations)
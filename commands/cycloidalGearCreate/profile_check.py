@@ -0,0 +1,198 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .profile import Epitrochoid
+from .settings import CycloidalGearSettings
+
+# Checks the rotor profile for the two ways a large eccentric_offset breaks it,
+# cheaply enough to run on every input change:
+#
+# - Undercut: the profile is the trochoid T offset by the pin radius r. Where
+#   the offset side's radius of curvature is smaller than r, 1 + r * kappa <= 0
+#   (kappa the curvature of T signed towards the offset) and the profile turns
+#   back on itself in a cusp or swallowtail.
+# - Self-intersection: the sampled profile crosses itself. The curve repeats
+#   every lobe, so a loop can only involve a lobe and its neighbours; three
+#   lobes are sampled and their segments are bucketed on a grid so each one is
+#   only tested against segments in the same cells. A two-lobe rotor has only
+#   one neighbour, so one revolution centred on the lobe is sampled instead of
+#   running on over curve already sampled.
+#
+# Both report theta ranges within one lobe, in _getPoint's parameter.
+
+SAMPLES_PER_LOBE = 128
+
+# Only these settings change the profile, so other inputs skip the check
+PROFILE_FIELDS = CycloidalGearSettings.input_fields(
+    ("rotor_radius", "ring_gear_pin_radius", "eccentric_offset", "ring_gear_pins")
+)
+
+
+@dataclass
+class ProfileCheck:
+    lobe_angle: float
+    undercuts: List[Tuple[float, float]] = field(default_factory=list)
+    self_intersections: List[Tuple[float, float]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.undercuts and not self.self_intersections
+
+    def describe(self) -> str:
+        if self.ok:
+            return "OK"
+
+        def ranges(spans: List[Tuple[float, float]]) -> str:
+            return ", ".join(
+                f"{math.degrees(a):.2f}-{math.degrees(b):.2f} deg" for (a, b) in spans
+            )
+
+        parts: List[str] = []
+        if self.undercuts:
+            parts.append(f"undercut at {ranges(self.undercuts)}")
+        if self.self_intersections:
+            parts.append(f"self-intersecting at {ranges(self.self_intersections)}")
+        return "; ".join(parts)
+
+
+def merge_ranges(
+    spans: List[Tuple[float, float]], period: float
+) -> List[Tuple[float, float]]:
+    # Moves each range to start within [0, period) and joins overlapping ones,
+    # including a range running over the end of the lobe into the next
+    shifted = sorted(
+        (a - period * math.floor(a / period), b - period * math.floor(a / period))
+        for (a, b) in spans
+    )
+    merged: List[Tuple[float, float]] = []
+    for (a, b) in shifted:
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    if len(merged) > 1 and merged[0][0] <= 0 and merged[-1][1] >= period - 1e-12:
+        merged = merged[1:-1] + [(merged[-1][0], merged[0][1] + period)]
+    # A range covering a whole lobe is the whole lobe
+    if any(b - a >= period for (a, b) in merged):
+        return [(0.0, period)]
+    return merged
+
+
+def undercut_ranges(
+    trochoid: Epitrochoid, thetas: List[float]
+) -> List[Tuple[float, float]]:
+    r_major = trochoid.r_major
+    r_minor = trochoid.r_minor
+    e = trochoid.eccentricity
+    n = trochoid.n
+    (xs, ys) = trochoid.points(thetas)
+    sin = math.sin
+    cos = math.cos
+
+    flagged: List[bool] = []
+    for (theta, x, y) in zip(thetas, xs, ys):
+        s = sin(theta)
+        c = cos(theta)
+        sn = sin(n * theta)
+        cn = cos(n * theta)
+        # The trochoid without the pin offset, and its first two derivatives
+        tx = r_major * c - e * cn
+        ty = -r_major * s + e * sn
+        dx = -r_major * s + e * n * sn
+        dy = -r_major * c + e * n * cn
+        ddx = -r_major * c + e * n * n * cn
+        ddy = r_major * s - e * n * n * sn
+        speed = math.hypot(dx, dy)
+        if speed == 0:
+            flagged.append(True)
+            continue
+        kappa = (dx * ddy - dy * ddx) / speed**3
+        # Which side of T the pin offset lies on, +1 for the left normal
+        side = ((x - tx) * -dy + (y - ty) * dx) / (speed * r_minor)
+        flagged.append(1 - side * r_minor * kappa <= 0)
+
+    spans: List[Tuple[float, float]] = []
+    start = None
+    for (i, bad) in enumerate(flagged):
+        if bad and start is None:
+            start = i
+        elif not bad and start is not None:
+            spans.append((thetas[start], thetas[i - 1]))
+            start = None
+    if start is not None:
+        spans.append((thetas[start], thetas[-1]))
+    return spans
+
+
+def _orientation(ax, ay, bx, by, cx, cy) -> float:
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def _segments_cross(xs, ys, i: int, j: int) -> bool:
+    (ax, ay, bx, by) = (xs[i], ys[i], xs[i + 1], ys[i + 1])
+    (cx, cy, dx, dy) = (xs[j], ys[j], xs[j + 1], ys[j + 1])
+    d1 = _orientation(ax, ay, bx, by, cx, cy)
+    d2 = _orientation(ax, ay, bx, by, dx, dy)
+    d3 = _orientation(cx, cy, dx, dy, ax, ay)
+    d4 = _orientation(cx, cy, dx, dy, bx, by)
+    return d1 * d2 < 0 and d3 * d4 < 0
+
+
+def self_intersection_ranges(
+    xs: List[float], ys: List[float], thetas: List[float]
+) -> List[Tuple[float, float]]:
+    # Theta spans of the loops closed by crossing segments of an open polyline
+    count = len(xs) - 1
+    if count < 3:
+        return []
+    length = sum(
+        math.hypot(xs[i + 1] - xs[i], ys[i + 1] - ys[i]) for i in range(count)
+    )
+    cell = 2 * length / count
+
+    grid: Dict[Tuple[int, int], List[int]] = {}
+    spans: List[Tuple[float, float]] = []
+    for i in range(count):
+        x0 = math.floor(min(xs[i], xs[i + 1]) / cell)
+        x1 = math.floor(max(xs[i], xs[i + 1]) / cell)
+        y0 = math.floor(min(ys[i], ys[i + 1]) / cell)
+        y1 = math.floor(max(ys[i], ys[i + 1]) / cell)
+        tested = set()
+        for gx in range(x0, x1 + 1):
+            for gy in range(y0, y1 + 1):
+                bucket = grid.setdefault((gx, gy), [])
+                for j in bucket:
+                    # Neighbouring segments share an end point
+                    if j < i - 1 and j not in tested:
+                        tested.add(j)
+                        if _segments_cross(xs, ys, j, i):
+                            spans.append((thetas[j], thetas[i + 1]))
+                bucket.append(i)
+    return spans
+
+
+def check_profile(
+    settings: CycloidalGearSettings, samples: int = SAMPLES_PER_LOBE
+) -> ProfileCheck:
+    trochoid = Epitrochoid.from_settings(settings)
+    lobe_angle = trochoid.lobe_angle
+    step = lobe_angle / samples
+    result = ProfileCheck(lobe_angle=lobe_angle)
+
+    lobe = [step * i for i in range(samples + 1)]
+    result.undercuts = merge_ranges(undercut_ranges(trochoid, lobe), lobe_angle)
+
+    # The lobe with one neighbour on each side, or with half of its only
+    # neighbour on each side on a two-lobe rotor
+    lobes = min(3, settings.rotor_lobes)
+    lead = samples * (lobes - 1) // 2
+    thetas = [step * i for i in range(-lead, samples * lobes - lead + 1)]
+    (xs, ys) = trochoid.points(thetas)
+    loops = [
+        (a, b)
+        for (a, b) in self_intersection_ranges(xs, ys, thetas)
+        if b > 0 and a < lobe_angle
+    ]
+    result.self_intersections = merge_ranges(loops, lobe_angle)
+    return result
@@ -1,10 +1,49 @@
-import inspect
 import json
 import math
-from dataclasses import asdict, dataclass, field
+import struct
+from dataclasses import dataclass, field, fields, replace
+from typing import Iterable, List
 
+# Bumped whenever fields are renamed or change meaning. Records from other
+# versions still load: unknown keys are dropped and missing ones take defaults.
+SCHEMA_VERSION: int = 1
 
-@dataclass
+# Upgrades the values of a record of version v to version v + 1, keyed by v.
+# Records are migrated step by step up to SCHEMA_VERSION when loaded.
+MIGRATIONS: dict = {}
+
+BINARY_MAGIC: bytes = b"CGSB"
+BINARY_TYPE_CODES: dict = {float: "d", int: "q"}
+
+
+def migrate(values: dict, version: int) -> dict:
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"Settings schema version {version} is newer than this add-in's "
+            f"version {SCHEMA_VERSION}; update the add-in to load them"
+        )
+    for step in range(version, SCHEMA_VERSION):
+        if step in MIGRATIONS:
+            values = MIGRATIONS[step](dict(values))
+    return values
+
+
+class DerivedProperty(property):
+    # A calculated value. depends_on lists the fields and other calculated
+    # values it reads, so a change to one input only recomputes what it affects.
+    depends_on: tuple = ()
+
+
+def derived(*depends_on: str):
+    def decorator(fget) -> DerivedProperty:
+        prop = DerivedProperty(fget)
+        prop.depends_on = depends_on
+        return prop
+
+    return decorator
+
+
+@dataclass(slots=True)
 class CycloidalGearSettings:
     rotor_thickness: float = field(
         default=0.4, metadata={"canonical_name": "Rotor Thickness", "units": "mm"}
@@ -50,96 +89,311 @@ class CycloidalGearSettings:
         metadata={"canonical_name": "Output Plate Thickness", "units": "mm"},
     )
 
-    @property
+    # Must be greater than zero: the profile sampler divides by it
+    profile_tolerance: float = field(
+        default=0.001,
+        metadata={
+            "canonical_name": "Profile Tolerance",
+            "units": "mm",
+            "positive": True,
+        },
+    )
+
+    # Largest deviation of the rotor's control-point splines from the profile;
+    # zero draws fitted splines through every profile point instead
+    spline_fit_tolerance: float = field(
+        default=0.001,
+        metadata={"canonical_name": "Spline Fit Tolerance", "units": "mm"},
+    )
+
+    # Stages stacked into a compound drive
+    stage_count: int = field(default=1, metadata={"canonical_name": "Stage Count"})
+
+    # Ring gear pins each stage adds to the one below it; zero stacks identical
+    # stages
+    stage_pin_step: int = field(
+        default=0, metadata={"canonical_name": "Stage Pin Step"}
+    )
+
+    @derived("rotor_thickness", "rotor_spacing")
     def ring_gear_thickness(self):
         """{"canonical_name": "Ring Gear Thickness", "units": "mm"}"""
         return self.rotor_thickness * 2 + self.rotor_spacing * 3
 
-    @property
+    @derived("rotor_diameter", "ring_gear_wall_thickness")
     def ring_gear_outer_diameter(self):
         """{"canonical_name": "Ring Gear Outer Diamter", "units": "mm"}"""
         return self.rotor_diameter + self.ring_gear_wall_thickness
 
-    @property
+    @derived("rotor_diameter")
     def rotor_radius(self):
         """{"canonical_name": "Rotor Radius", "units": "mm"}"""
         return self.rotor_diameter / 2
 
-    @property
+    @derived("ring_gear_pins")
     def rotor_lobes(self):
         """{"canonical_name": "Rotor Lobes"}"""
         return self.ring_gear_pins - 1
 
-    @property
+    @derived("rotor_diameter", "ring_gear_pins")
     def ring_gear_pin_radius(self):
         """{"canonical_name": "Ring Gear Pin Radius", "units": "mm"}"""
         return self.rotor_diameter * math.pi / self.ring_gear_pins / 4
 
-    @property
+    @derived("ring_gear_pin_radius")
     def eccentric_offset(self):
         """{"canonical_name": "Eccentric Offset", "units": "mm"}"""
         return 0.5 * self.ring_gear_pin_radius
 
-    @property
+    @derived(
+        "rotor_diameter", "rotor_bearing_hole_diameter", "ring_gear_pin_radius"
+    )
     def output_circle_diameter(self):
         """{"canonical_name": "Output Circle Diameter", "units": "mm"}"""
         return (
             self.rotor_diameter + self.rotor_bearing_hole_diameter
         ) / 2 - self.ring_gear_pin_radius * 1.5
 
-    @property
+    @derived("output_pin_diameter", "ring_gear_pin_radius")
     def output_hole_diameter(self) -> float:
         """{"canonical_name": "Output Hole Diameter", "units": "mm"}"""
         return self.output_pin_diameter + self.ring_gear_pin_radius
 
-    @property
-    def maximum_distance(self):
-        """{"canonical_name": "Maximum Distance", "units": "mm"}"""
-        return 0.25 * self.ring_gear_pin_radius
-
-    @property
-    def minimum_distance(self):
-        """{"canonical_name": "Minimum Distance"}"""
-        return 0.5 * self.maximum_distance
-    
-    @property
+    @derived("rotor_lobes")
     def reduction_rate(self) -> str:
         """{"canonical_name": "Reduction Rate"}"""
         return f"1:{self.rotor_lobes}"
 
-    def get_fields(self) -> dict:
-        members = inspect.getmembers(self)
-        fields: dict = dict(
-            [
-                (field.name, field)
-                for field in list(
-                    list(filter(lambda x: x[0] == "__dataclass_fields__", members))[0][
-                        1
-                    ].values()
-                )
-            ]
+    @derived("rotor_lobes", "stage_count", "stage_pin_step")
+    def compound_reduction_rate(self) -> str:
+        """{"canonical_name": "Compound Reduction Rate"}"""
+        lobes = (stage.rotor_lobes for stage in self.stages())
+        return f"1:{math.prod(lobes)}"
+
+    @derived("ring_gear_thickness", "output_plate_thickness")
+    def stage_height(self):
+        """{"canonical_name": "Stage Height", "units": "mm"}"""
+        return self.ring_gear_thickness + self.output_plate_thickness
+
+    @classmethod
+    def get_fields(cls) -> dict:
+        return cls._schema.fields
+
+    @classmethod
+    def get_properties(cls) -> dict:
+        return cls._schema.properties
+
+    @classmethod
+    def affected_properties(cls, field_name: str) -> list:
+        # Calculated values that (directly or through other calculated values)
+        # depend on field_name.
+        return cls._schema.dependents.get(field_name, [])
+
+    @classmethod
+    def input_fields(cls, names: Iterable[str]) -> set:
+        # The fields that the given fields and calculated values are computed
+        # from, following calculated values through to the fields.
+        inputs: dict = cls._schema.inputs
+        return set().union(*(inputs.get(name, {name}) for name in names))
+
+    def stages(self) -> List["CycloidalGearSettings"]:
+        # The settings of each stage of the compound drive, from the bottom up
+        return [
+            replace(self, ring_gear_pins=self.ring_gear_pins + self.stage_pin_step * i)
+            for i in range(self.stage_count)
+        ]
+
+    def errors(self) -> List[str]:
+        # Values no gear can be built from
+        schema: SettingsSchema = self._schema
+        return [
+            error
+            for name in schema.positive
+            if (error := schema.check(name, getattr(self, name)))
+        ]
+
+    def changed_fields(self, other: "CycloidalGearSettings") -> list:
+        return [
+            name
+            for name in self._schema.fields
+            if getattr(self, name) != getattr(other, name)
+        ]
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self._schema.fields}
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "CycloidalGearSettings":
+        # Plain overrides without a version are taken as current
+        schema: SettingsSchema = cls._schema
+        values = migrate(values, values.get("version", SCHEMA_VERSION))
+        return cls(
+            **{
+                name: schema.coerce(name, values[name])
+                for name in schema.fields
+                if name in values
+            }
         )
-        return fields
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {"version": SCHEMA_VERSION, **self.to_dict()}, separators=(",", ":")
+        )
+
+    @classmethod
+    def loads(cls, text: str) -> "CycloidalGearSettings":
+        # Every malformed record, such as a value of the wrong type or a record
+        # that is not an object, is reported as a ValueError
+        try:
+            return cls.from_dict(json.loads(text))
+        except (TypeError, KeyError, AttributeError) as e:
+            raise ValueError(f"Malformed gear settings: {e}") from e
+
+    @classmethod
+    def dumps_many(cls, records: Iterable["CycloidalGearSettings"]) -> str:
+        # Column names once, then one value list per record
+        names: list = list(cls._schema.fields)
+        return json.dumps(
+            {
+                "version": SCHEMA_VERSION,
+                "fields": names,
+                "rows": [[getattr(r, name) for name in names] for r in records],
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads_many(cls, text: str) -> List["CycloidalGearSettings"]:
+        data: dict = json.loads(text)
+        version: int = data.get("version", SCHEMA_VERSION)
+        names: list = data["fields"]
+        return [
+            cls.from_dict(dict(zip(names, row), version=version))
+            for row in data["rows"]
+        ]
+
+    @classmethod
+    def pack_many(cls, records: Iterable["CycloidalGearSettings"]) -> bytes:
+        # Header: magic, version, field count, then per field its name and
+        # struct type code. Rows follow as fixed-size little-endian records.
+        schema: SettingsSchema = cls._schema
+        names: list = list(schema.fields)
+        header = bytearray(BINARY_MAGIC)
+        header += struct.pack("<HH", SCHEMA_VERSION, len(names))
+        for name in names:
+            encoded = name.encode("utf-8")
+            header += struct.pack("<B", len(encoded)) + encoded
+            header += BINARY_TYPE_CODES[schema.types[name]].encode("ascii")
+
+        rows = bytearray()
+        pack = schema.row.pack
+        count = 0
+        for record in records:
+            rows += pack(*[getattr(record, name) for name in names])
+            count += 1
+        return bytes(header) + struct.pack("<I", count) + bytes(rows)
+
+    @classmethod
+    def unpack_many(cls, data: bytes) -> List["CycloidalGearSettings"]:
+        if data[: len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError("Not a packed CycloidalGearSettings file")
+
+        offset = len(BINARY_MAGIC)
+        (version, field_count) = struct.unpack_from("<HH", data, offset)
+        offset += 4
+        # Fails before decoding rows a newer add-in may have laid out differently
+        migrate({}, version)
+        names: list = []
+        codes: str = "<"
+        for _ in range(field_count):
+            length = data[offset]
+            names.append(data[offset + 1 : offset + 1 + length].decode("utf-8"))
+            codes += chr(data[offset + 1 + length])
+            offset += length + 2
+
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        row = struct.Struct(codes)
+        end = offset + row.size * count
+        return [
+            cls.from_dict(dict(zip(names, values), version=version))
+            for values in row.iter_unpack(data[offset:end])
+        ]
+
+
+@dataclass(frozen=True)
+class SettingsSchema:
+    # Everything derived from the class definition, built once at import
+    # instead of on every call.
+    fields: dict
+    types: dict
+    properties: dict
+    dependents: dict
+    inputs: dict
+    row: struct.Struct
+    positive: tuple
 
     @classmethod
-    def _get_property_list(cls) -> list:
-        return [x for x in dir(cls) if isinstance(getattr(cls, x), property)]
-
-    def get_properties(self) -> dict:
-        property_names: list = CycloidalGearSettings._get_property_list()
-        property_name: str
-        properties: dict = dict(
-            [
-                (
-                    property_name,
-                    json.loads(getattr(CycloidalGearSettings, property_name).__doc__),
+    def build(cls, settings_cls) -> "SettingsSchema":
+        settings_fields: dict = {f.name: f for f in fields(settings_cls)}
+        property_names: list = [
+            x for x in dir(settings_cls) if isinstance(getattr(settings_cls, x), property)
+        ]
+        properties: dict = {
+            name: json.loads(getattr(settings_cls, name).__doc__)
+            for name in property_names
+        }
+
+        resolved: dict = {}
+
+        def resolve(name: str) -> set:
+            prop = getattr(settings_cls, name, None)
+            if not isinstance(prop, DerivedProperty):
+                return {name}
+            if name not in resolved:
+                resolved[name] = set().union(
+                    *(resolve(dependency) for dependency in prop.depends_on)
                 )
-                for property_name in property_names
-            ]
+            return resolved[name]
+
+        dependents: dict = {name: [] for name in settings_fields}
+        for property_name in property_names:
+            for dependency in resolve(property_name):
+                dependents[dependency].append(property_name)
+
+        types: dict = {name: f.type for (name, f) in settings_fields.items()}
+        return cls(
+            fields=settings_fields,
+            types=types,
+            properties=properties,
+            dependents=dependents,
+            inputs={name: resolve(name) for name in property_names},
+            row=struct.Struct(
+                "<" + "".join(BINARY_TYPE_CODES[t] for t in types.values())
+            ),
+            positive=tuple(
+                name
+                for (name, f) in settings_fields.items()
+                if f.metadata.get("positive")
+            ),
         )
 
-        return properties
+    def check(self, name: str, value) -> str:
+        if name in self.positive and not value > 0:
+            canonical_name = self.fields[name].metadata["canonical_name"]
+            return f"{canonical_name} must be greater than zero"
+        return ""
 
-    def dumps(self) -> str:
-        settings: dict = asdict(self)
-        return json.dumps(settings)
+    def coerce(self, name: str, value):
+        field_type = self.types[name]
+        if field_type is int:
+            value = int(float(value))
+        else:
+            value = field_type(value)
+        error = self.check(name, value)
+        if error:
+            raise ValueError(error)
+        return value
+
+
+CycloidalGearSettings._schema = SettingsSchema.build(CycloidalGearSettings)
@@ -0,0 +1,254 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+# Least-squares B-spline fitting of the sampled rotor profile, so each lobe can
+# be drawn as a control-point spline with a handful of control points instead of
+# a fitted spline through every sample. Fusion builds a control-point spline on
+# a clamped knot vector with uniform interior knots, so the fit uses the same
+# knots and the control points can be passed to it unchanged.
+#
+# The end points are kept and, when given, the end tangents too: the second and
+# second to last control points are only free to move along them. Neighbouring
+# lobes then meet with a common tangent. The fewest control points that keep
+# every sample within tolerance are found by doubling and then bisecting the
+# count. The error is the distance from each point, and from the middle of each
+# chord, to the spline at its chord-length parameter, which bounds the distance
+# to the curve from above.
+
+DEGREE = 3
+
+
+@dataclass
+class SplineFit:
+    xs: List[float]
+    ys: List[float]
+    degree: int = DEGREE
+    max_error: float = 0.0
+    # Least-squares solves run to find the control point count
+    fits: int = 0
+    knots: List[float] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def points(self, ts: Sequence[float]) -> Tuple[List[float], List[float]]:
+        xs: List[float] = []
+        ys: List[float] = []
+        for t in ts:
+            (span, basis) = basis_functions(self.knots, self.degree, len(self.xs), t)
+            first = span - self.degree
+            xs.append(sum(b * self.xs[first + i] for (i, b) in enumerate(basis)))
+            ys.append(sum(b * self.ys[first + i] for (i, b) in enumerate(basis)))
+        return (xs, ys)
+
+
+def clamped_knots(count: int, degree: int = DEGREE) -> List[float]:
+    spans = count - degree
+    return (
+        [0.0] * (degree + 1)
+        + [i / spans for i in range(1, spans)]
+        + [1.0] * (degree + 1)
+    )
+
+
+def basis_functions(
+    knots: List[float], degree: int, count: int, t: float
+) -> Tuple[int, List[float]]:
+    # The knot span holding t and the degree + 1 basis functions that are not
+    # zero on it (Cox-de Boor, as in The NURBS Book A2.2)
+    span = min(degree + int(t * (count - degree)), count - 1)
+    while span > degree and t < knots[span]:
+        span -= 1
+    while span < count - 1 and t >= knots[span + 1]:
+        span += 1
+    basis = [1.0] + [0.0] * degree
+    left = [0.0] * (degree + 1)
+    right = [0.0] * (degree + 1)
+    for j in range(1, degree + 1):
+        left[j] = t - knots[span + 1 - j]
+        right[j] = knots[span + j] - t
+        saved = 0.0
+        for r in range(j):
+            temp = basis[r] / (right[r + 1] + left[j - r])
+            basis[r] = saved + right[r + 1] * temp
+            saved = left[j - r] * temp
+        basis[j] = saved
+    return (span, basis)
+
+
+def chord_parameters(xs: Sequence[float], ys: Sequence[float]) -> List[float]:
+    lengths = [0.0]
+    for i in range(1, len(xs)):
+        step = math.hypot(xs[i] - xs[i - 1], ys[i] - ys[i - 1])
+        lengths.append(lengths[-1] + step)
+    total = lengths[-1]
+    return [length / total for length in lengths]
+
+
+def solve(matrix: List[List[float]], rhs: List[float]) -> List[float]:
+    # Gaussian elimination with partial pivoting; the normal equations are
+    # small, a few dozen unknowns per lobe
+    size = len(rhs)
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda row: abs(matrix[row][col]))
+        if matrix[pivot][col] == 0:
+            raise ValueError("Spline fit is singular")
+        if pivot != col:
+            (matrix[col], matrix[pivot]) = (matrix[pivot], matrix[col])
+            (rhs[col], rhs[pivot]) = (rhs[pivot], rhs[col])
+        row_col = matrix[col]
+        for row in range(col + 1, size):
+            factor = matrix[row][col] / row_col[col]
+            if factor:
+                row_values = matrix[row]
+                for k in range(col, size):
+                    row_values[k] -= factor * row_col[k]
+                rhs[row] -= factor * rhs[col]
+    values = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        total = rhs[row] - sum(
+            matrix[row][k] * values[k] for k in range(row + 1, size)
+        )
+        values[row] = total / matrix[row][row]
+    return values
+
+
+def fit_count(
+    xs: Sequence[float],
+    ys: Sequence[float],
+    ts: Sequence[float],
+    count: int,
+    start_tangent: Optional[Tuple[float, float]] = None,
+    end_tangent: Optional[Tuple[float, float]] = None,
+    degree: int = DEGREE,
+) -> SplineFit:
+    # Least-squares fit with a fixed number of control points. Each control
+    # point is a fixed base point plus a combination of the unknowns; every
+    # unknown moves one control point along a direction: x or y for the free
+    # ones, the end tangent for the second and second to last.
+    last = count - 1
+    base = [(0.0, 0.0)] * count
+    base[0] = (xs[0], ys[0])
+    base[last] = (xs[-1], ys[-1])
+    unknowns: List[Tuple[int, float, float]] = []
+    first_free = 1
+    last_free = last - 1
+    if start_tangent is not None:
+        base[1] = base[0]
+        unknowns.append((1, start_tangent[0], start_tangent[1]))
+        first_free = 2
+    if end_tangent is not None:
+        base[last - 1] = base[last]
+        unknowns.append((last - 1, -end_tangent[0], -end_tangent[1]))
+        last_free = last - 2
+    for i in range(first_free, last_free + 1):
+        unknowns.append((i, 1.0, 0.0))
+        unknowns.append((i, 0.0, 1.0))
+
+    # The unknowns acting on each control point, as (unknown, dx, dy)
+    acting: List[List[Tuple[int, float, float]]] = [[] for _ in range(count)]
+    for (u, (i, dx, dy)) in enumerate(unknowns):
+        acting[i].append((u, dx, dy))
+
+    knots = clamped_knots(count, degree)
+    size = len(unknowns)
+    matrix = [[0.0] * size for _ in range(size)]
+    rhs = [0.0] * size
+    for (x, y, t) in zip(xs, ys, ts):
+        (span, basis) = basis_functions(knots, degree, count, t)
+        first = span - degree
+        target_x = x
+        target_y = y
+        row_x: dict = {}
+        row_y: dict = {}
+        for (i, b) in enumerate(basis):
+            (bx, by) = base[first + i]
+            target_x -= b * bx
+            target_y -= b * by
+            for (u, dx, dy) in acting[first + i]:
+                if dx:
+                    row_x[u] = row_x.get(u, 0.0) + b * dx
+                if dy:
+                    row_y[u] = row_y.get(u, 0.0) + b * dy
+        for (row, target) in ((row_x, target_x), (row_y, target_y)):
+            for (u, a) in row.items():
+                rhs[u] += a * target
+                matrix_u = matrix[u]
+                for (v, c) in row.items():
+                    matrix_u[v] += a * c
+
+    values = solve(matrix, rhs) if size else []
+    control_xs = [bx for (bx, _) in base]
+    control_ys = [by for (_, by) in base]
+    for ((i, dx, dy), value) in zip(unknowns, values):
+        control_xs[i] += value * dx
+        control_ys[i] += value * dy
+
+    # Checked at the points and halfway along every chord, where a spline with
+    # nearly as many control points as points can swing between them
+    spline = SplineFit(control_xs, control_ys, degree, knots=knots)
+    mid_ts = [(a + b) / 2 for (a, b) in zip(ts, ts[1:])]
+    mid_xs = [(a + b) / 2 for (a, b) in zip(xs, xs[1:])]
+    mid_ys = [(a + b) / 2 for (a, b) in zip(ys, ys[1:])]
+    (fxs, fys) = spline.points(list(ts) + mid_ts)
+    spline.max_error = max(
+        math.hypot(fx - x, fy - y)
+        for (fx, fy, x, y) in zip(fxs, fys, list(xs) + mid_xs, list(ys) + mid_ys)
+    )
+    return spline
+
+
+def fit_spline(
+    xs: Sequence[float],
+    ys: Sequence[float],
+    tolerance: float,
+    start_tangent: Optional[Tuple[float, float]] = None,
+    end_tangent: Optional[Tuple[float, float]] = None,
+    degree: int = DEGREE,
+) -> SplineFit:
+    # Fewest control points within tolerance of every point; with as many
+    # control points as points the fit interpolates, so that is the limit
+    ts = chord_parameters(xs, ys)
+    fit = lambda count: fit_count(xs, ys, ts, count, start_tangent, end_tangent, degree)
+    lowest = degree + 1
+    highest = max(lowest, len(xs))
+    fits = 0
+
+    best: Optional[SplineFit] = None
+    failed = lowest - 1
+    count = lowest
+    while True:
+        spline = fit(count)
+        fits += 1
+        if spline.max_error <= tolerance or count == highest:
+            best = spline
+            break
+        failed = count
+        count = min(2 * count, highest)
+
+    while len(best) - failed > 1:
+        count = (failed + len(best)) // 2
+        spline = fit(count)
+        fits += 1
+        if spline.max_error <= tolerance:
+            best = spline
+        else:
+            failed = count
+    best.fits = fits
+    return best
+
+
+def fit_lobe(xs: Sequence[float], ys: Sequence[float], tolerance: float) -> SplineFit:
+    # Both ends of a lobe lie on the rotor's symmetry axes, so the profile
+    # crosses them at right angles to the radius there
+    def tangent(x: float, y: float, toward_x: float, toward_y: float):
+        length = math.hypot(x, y)
+        (tx, ty) = (-y / length, x / length)
+        if tx * (toward_x - x) + ty * (toward_y - y) < 0:
+            (tx, ty) = (-tx, -ty)
+        return (tx, ty)
+
+    start = tangent(xs[0], ys[0], xs[1], ys[1])
+    (ex, ey) = tangent(xs[-1], ys[-1], xs[-2], ys[-2])
+    return fit_spline(xs, ys, tolerance, start, (-ex, -ey))
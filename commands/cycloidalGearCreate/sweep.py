@@ -0,0 +1,184 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Iterable, List, Optional
+
+from . import interference, kernel, kinematics, profile_check
+from .settings import CycloidalGearSettings
+
+# Batch generation of many gear variants on a build server. Each record of the
+# grid is a dict of CycloidalGearSettings overrides; every record is evaluated
+# in a worker process and written out as one JSON line as soon as it finishes.
+
+def load_grid(path: str) -> List[dict]:
+    # JSON may be a list of override dicts, or a dict of value lists that is
+    # expanded to every combination. CSV has one override record per row and
+    # .cgs files hold complete settings packed by CycloidalGearSettings.
+    if path.lower().endswith(".cgs"):
+        with open(path, "rb") as f:
+            return [r.to_dict() for r in CycloidalGearSettings.unpack_many(f.read())]
+
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            return [
+                {key: value for (key, value) in row.items() if value not in ("", None)}
+                for row in csv.DictReader(f)
+            ]
+
+    with open(path, "r") as f:
+        grid = json.load(f)
+
+    if isinstance(grid, dict):
+        names = list(grid)
+        values = [v if isinstance(v, list) else [v] for v in grid.values()]
+        return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+    return list(grid)
+
+
+def make_settings(overrides: dict) -> CycloidalGearSettings:
+    # Unlike CycloidalGearSettings.from_dict, unknown names are an error here
+    # since they are almost always a typo in the grid.
+    for name in overrides:
+        if name not in CycloidalGearSettings.get_fields():
+            raise ValueError(f"Unknown setting '{name}'")
+    return CycloidalGearSettings.from_dict(overrides)
+
+
+def evaluate(record: tuple) -> dict:
+    (
+        index,
+        overrides,
+        include_points,
+        clearance_samples,
+        kinematic_samples,
+    ) = record
+    result: dict = {"index": index, "overrides": overrides}
+    try:
+        start = time.perf_counter()
+        settings = make_settings(overrides)
+        lobe = kernel.rotor_lobe(settings)
+
+        result["settings"] = settings.to_dict()
+        result["derived"] = {
+            name: getattr(settings, name) for name in settings.get_properties()
+        }
+        result["profile"] = {
+            "points": len(lobe.xs),
+            "evaluations": lobe.evaluations,
+            "max_deviation": lobe.max_deviation,
+        }
+        check = profile_check.check_profile(settings)
+        result["profile"]["undercuts"] = check.undercuts
+        result["profile"]["self_intersections"] = check.self_intersections
+        lobe_spline = kernel.rotor_spline(settings)
+        if lobe_spline is not None:
+            result["profile"]["control_points"] = len(lobe_spline)
+            result["profile"]["spline_error"] = lobe_spline.max_error
+        if include_points:
+            result["profile"]["xs"] = lobe.xs
+            result["profile"]["ys"] = lobe.ys
+        if clearance_samples:
+            clearance = interference.check_clearance(settings, clearance_samples)
+            result["clearance"] = {
+                "minimum": clearance.minimum_clearance,
+                "worst_angle": clearance.worst_angle,
+                "worst_pin": clearance.worst_pin,
+                "housing": clearance.minimum_housing_clearance,
+                "output": clearance.minimum_output_clearance,
+            }
+        if kinematic_samples:
+            motion = kinematics.simulate(settings, kinematic_samples)
+            result["kinematics"] = motion.summary()
+        result["seconds"] = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def run_sweep(
+    grid: List[dict],
+    output,
+    workers: Optional[int] = None,
+    include_points: bool = False,
+    clearance_samples: int = 0,
+    kinematic_samples: int = 0,
+) -> int:
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(grid) // (workers * 8))
+    records = [
+        (i, overrides, include_points, clearance_samples, kinematic_samples)
+        for (i, overrides) in enumerate(grid)
+    ]
+
+    failures = 0
+    with multiprocessing.Pool(processes=workers) as pool:
+        for result in pool.imap_unordered(evaluate, records, chunksize=chunksize):
+            failures += "error" in result
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    return failures
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Evaluate a grid of cycloidal gear settings in parallel."
+    )
+    parser.add_argument("grid", help="JSON or CSV file of settings overrides")
+    parser.add_argument(
+        "-o", "--output", help="JSON lines output file (default: stdout)"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, help="worker processes (default: all cores)"
+    )
+    parser.add_argument(
+        "--points", action="store_true", help="include the rotor lobe points"
+    )
+    parser.add_argument(
+        "--clearance",
+        type=int,
+        default=0,
+        metavar="SAMPLES",
+        help="also check rotor clearance over this many crank angles",
+    )
+    parser.add_argument(
+        "--kinematics",
+        type=int,
+        default=0,
+        metavar="SAMPLES",
+        help="also simulate transmission error over this many crank angles",
+    )
+    args = parser.parse_args(argv)
+
+    grid = load_grid(args.grid)
+    start = time.perf_counter()
+    if args.output:
+        with open(args.output, "w") as output:
+            failures = run_sweep(
+                grid,
+                output,
+                args.workers,
+                args.points,
+                args.clearance,
+                args.kinematics,
+            )
+    else:
+        failures = run_sweep(
+            grid,
+            sys.stdout,
+            args.workers,
+            args.points,
+            args.clearance,
+            args.kinematics,
+        )
+
+    print(
+        f"{len(grid)} variants, {failures} failed, "
+        f"{time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if failures else 0
@@ -0,0 +1,107 @@
+import bisect
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List
+
+# Per-stage wall time histograms. Stages nest, and each one is recorded under its
+# full path (e.g. "command_execute/draw_gear/rotor/outline") so the same stage
+# reached from different handlers is kept apart. When disabled, stage() and
+# timed() only add a flag check. entry.py imports this at add-in startup, so it
+# stays clear of dataclasses and json.
+
+# Upper bucket edges in milliseconds; the last bucket is everything above
+BUCKET_EDGES_MS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000)
+
+
+class StageHistogram:
+    __slots__ = ("count", "total_ms", "min_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count: int = 0
+        self.total_ms: float = 0.0
+        self.min_ms: float = float("inf")
+        self.max_ms: float = 0.0
+        self.buckets: List[int] = [0] * (len(BUCKET_EDGES_MS) + 1)
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect.bisect_left(BUCKET_EDGES_MS, ms)] += 1
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ + ("mean_ms",)}
+
+
+class StageTimer:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[str, StageHistogram] = {}
+        self._stack: List[str] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self._stack.pop()
+            histogram = self.histograms.get(path)
+            if histogram is None:
+                histogram = self.histograms[path] = StageHistogram()
+            histogram.add(elapsed)
+
+    def timed(self, name: str) -> Callable:
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        self.histograms.clear()
+
+    def summary(self) -> str:
+        lines = [
+            f"{path}: {h.count} x {h.mean_ms:.2f} ms (max {h.max_ms:.2f} ms)"
+            for (path, h) in sorted(self.histograms.items())
+        ]
+        return "\n".join(lines)
+
+    def record(self, name: str, ms: float):
+        # A duration measured outside stage(), e.g. before this module loaded
+        if not self.enabled:
+            return
+        path = "/".join(self._stack + [name])
+        self.histograms.setdefault(path, StageHistogram()).add(ms)
+
+    def dumps(self) -> str:
+        import json
+
+        stages = {
+            path: histogram.to_dict() for (path, histogram) in self.histograms.items()
+        }
+        return json.dumps(
+            {"bucket_edges_ms": list(BUCKET_EDGES_MS), "stages": stages},
+            separators=(",", ":"),
+        )
+
+
+timer = StageTimer()
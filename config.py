@@ -10,6 +10,19 @@ import os
 # are ready to distribute it.
 DEBUG = True
 
+# Time every stage of the gear build and the dialog handlers, and store the
+# per-stage histograms as JSON in a design attribute after each generation.
+TIMING = DEBUG
+
+# Importing the add-in and running every command's start() should take less
+# than this; slower startups are logged to the Text Command window.
+STARTUP_BUDGET_MS = 100
+
+# Build each rotor from one sketch holding the closed outline of every lobe and
+# a single extrude. When False, one lobe is extruded, circular patterned and
+# combined, which adds features in proportion to the pin count.
+ROTOR_SINGLE_SKETCH = True
+
 # Gets the name of the add-in from the name of the folder the py file is in.
 # This is used when defining unique internal names for various UI elements
 # that need a unique name. It's also recommended to use a company name as
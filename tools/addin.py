@@ -0,0 +1,49 @@
+import importlib
+import os
+import sys
+import types
+
+import adsk_stub
+
+# Imports the add-in as a package outside Fusion 360, with adsk replaced by
+# adsk_stub. The template's lib/fusion360utils is not part of this repository;
+# when it is missing a small stand-in with the functions the add-in uses is
+# registered instead.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "cycloidal_gear_maker"
+
+
+def _stub_futil() -> types.ModuleType:
+    futil = types.ModuleType(f"{PACKAGE}.lib.fusion360utils")
+    futil.log = lambda *args, **kwargs: None
+    futil.handle_error = lambda *args, **kwargs: None
+    futil.add_handler = lambda *args, **kwargs: None
+    futil.clear_handlers = lambda *args, **kwargs: None
+    return futil
+
+
+def register(recorder: adsk_stub.Recorder = None) -> adsk_stub.Recorder:
+    # Installs adsk_stub and makes the add-in importable as PACKAGE, without
+    # importing any of its modules.
+    recorder = adsk_stub.install(recorder)
+
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT]
+        sys.modules[PACKAGE] = package
+
+        if not os.path.isdir(os.path.join(ROOT, "lib", "fusion360utils")):
+            lib = types.ModuleType(f"{PACKAGE}.lib")
+            lib.__path__ = []
+            lib.fusion360utils = _stub_futil()
+            sys.modules[f"{PACKAGE}.lib"] = lib
+            sys.modules[f"{PACKAGE}.lib.fusion360utils"] = lib.fusion360utils
+    return recorder
+
+
+def load(recorder: adsk_stub.Recorder = None):
+    # Returns (logic module, recorder).
+    recorder = register(recorder)
+    logic = importlib.import_module(f"{PACKAGE}.commands.cycloidalGearCreate.logic")
+    return (logic, recorder)
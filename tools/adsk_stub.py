@@ -0,0 +1,1268 @@
+import math
+import re
+import sys
+import types
+from collections import Counter
+from typing import List, Optional
+
+# An in-memory stand-in for the subset of adsk.core / adsk.fusion the add-in
+# uses, so CycloidalGearLogic runs on plain Python. Objects keep enough state to
+# behave like the real API (sketch profiles, bodies created by extrudes and
+# patterns, joins and combines, attributes, command inputs) and fail the way
+# Fusion does on misuse, e.g. a missing profile or an empty fillet edge set.
+#
+# Every public attribute read or write on an API object, and every static
+# create/get/cast, is counted on the installed Recorder as one Fusion API
+# round trip, keyed by "Class.member".
+
+
+class Recorder:
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+
+recorder = Recorder()
+
+
+class ApiObject:
+    def __getattribute__(self, name: str):
+        if not name.startswith("_"):
+            recorder.counts[f"{type(self).__name__}.{name}"] += 1
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name: str, value):
+        if not name.startswith("_"):
+            recorder.counts[f"{type(self).__name__}.{name}"] += 1
+        object.__setattr__(self, name, value)
+
+
+def _set(api_object: ApiObject, **values):
+    # Initial state set by the stand-in itself is not an API call
+    for (name, value) in values.items():
+        object.__setattr__(api_object, name, value)
+
+
+def _static(cls, name: str):
+    recorder.counts[f"{cls.__name__}.{name}"] += 1
+
+
+class ApiCollection(ApiObject):
+    def __init__(self, items: Optional[list] = None):
+        self._items: list = items if items is not None else []
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+    def item(self, index: int):
+        if not 0 <= index < len(self._items):
+            raise RuntimeError(f"{type(self).__name__}.item: index {index} out of range")
+        return self._items[index]
+
+    def __iter__(self):
+        for item in list(self._items):
+            recorder.counts[f"{type(self).__name__}.item"] += 1
+            yield item
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# adsk.core
+
+
+class Coordinates(ApiObject):
+    def __init__(self, x: float, y: float, z: float):
+        self._xyz = [x, y, z]
+
+    @property
+    def x(self) -> float:
+        return self._xyz[0]
+
+    @property
+    def y(self) -> float:
+        return self._xyz[1]
+
+    @property
+    def z(self) -> float:
+        return self._xyz[2]
+
+
+class Point3D(Coordinates):
+    @staticmethod
+    def create(x: float = 0, y: float = 0, z: float = 0) -> "Point3D":
+        _static(Point3D, "create")
+        return Point3D(x, y, z)
+
+
+class Vector3D(Coordinates):
+    @staticmethod
+    def create(x: float = 0, y: float = 0, z: float = 0) -> "Vector3D":
+        _static(Vector3D, "create")
+        return Vector3D(x, y, z)
+
+
+class Matrix3D(ApiObject):
+    def __init__(self):
+        self._angle = 0.0
+        self._translation = (0.0, 0.0, 0.0)
+
+    @staticmethod
+    def create() -> "Matrix3D":
+        _static(Matrix3D, "create")
+        return Matrix3D()
+
+    def setToRotation(self, angle: float, axis: Vector3D, origin: Point3D) -> bool:
+        self._angle = angle
+        return True
+
+    @property
+    def translation(self) -> Vector3D:
+        return Vector3D(*self._translation)
+
+    @translation.setter
+    def translation(self, value: Vector3D):
+        self._translation = tuple(value._xyz)
+
+    def copy(self) -> "Matrix3D":
+        matrix = Matrix3D()
+        matrix._angle = self._angle
+        matrix._translation = self._translation
+        return matrix
+
+
+class ObjectCollection(ApiCollection):
+    @staticmethod
+    def create() -> "ObjectCollection":
+        _static(ObjectCollection, "create")
+        return ObjectCollection()
+
+    def add(self, item) -> bool:
+        self._items.append(item)
+        return True
+
+
+class ValueInput(ApiObject):
+    def __init__(self, real: Optional[float], string: Optional[str]):
+        self._real = real
+        self._string = string
+
+    @staticmethod
+    def createByReal(value: float) -> "ValueInput":
+        _static(ValueInput, "createByReal")
+        return ValueInput(float(value), None)
+
+    @staticmethod
+    def createByString(value: str) -> "ValueInput":
+        _static(ValueInput, "createByString")
+        return ValueInput(None, value)
+
+    @property
+    def realValue(self) -> float:
+        return self._value()
+
+    def _value(self) -> float:
+        return self._real if self._real is not None else _evaluate(self._string)
+
+
+# Internal units per unit: lengths in cm, angles in radians
+UNIT_SCALE = {
+    "": 1.0,
+    "cm": 1.0,
+    "mm": 0.1,
+    "m": 100.0,
+    "in": 2.54,
+    "deg": math.pi / 180,
+}
+
+
+def _evaluate(expression: str, units: str = "cm") -> float:
+    # Enough of Fusion's expression parser for "<number> [unit]"
+    match = re.fullmatch(r"\s*([-+0-9.eE]+)\s*([a-z]*)\s*", expression)
+    if match is None:
+        raise RuntimeError(f"Invalid expression: {expression}")
+    unit = match.group(2) or units
+    if unit not in UNIT_SCALE:
+        raise RuntimeError(f"Unknown unit: {unit}")
+    return float(match.group(1)) * UNIT_SCALE[unit]
+
+
+class CommandInput(ApiObject):
+    def __init__(self, id: str, name: str):
+        self._id = id
+        self._name = name
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+
+class ValueCommandInput(CommandInput):
+    def __init__(self, id: str, name: str, unitType: str, initialValue: ValueInput):
+        super().__init__(id, name)
+        self._unit_type = unitType
+        # A real value is in internal units and shown in the input's units
+        self._expression = (
+            initialValue._string
+            if initialValue._string is not None
+            else f"{initialValue._real / UNIT_SCALE[unitType]!r} {unitType}".strip()
+        )
+
+    @property
+    def expression(self) -> str:
+        return self._expression
+
+    @expression.setter
+    def expression(self, value: str):
+        self._expression = value
+
+    @property
+    def isValidExpression(self) -> bool:
+        try:
+            _evaluate(self._expression)
+            return True
+        except RuntimeError:
+            return False
+
+    @property
+    def value(self) -> float:
+        return _evaluate(self._expression)
+
+
+class TextBoxCommandInput(CommandInput):
+    def __init__(self, id: str, name: str, formattedText: str):
+        super().__init__(id, name)
+        _set(self, text=formattedText)
+
+
+class CommandInputs(ApiCollection):
+    def _add(self, input):
+        if any(existing._id == input._id for existing in self._items):
+            raise RuntimeError(f"Command input id {input._id} is not unique")
+        self._items.append(input)
+        return input
+
+    def addTabCommandInput(self, id: str, name: str) -> "TabCommandInput":
+        return self._add(TabCommandInput(id, name))
+
+    def addValueInput(
+        self, id: str, name: str, unitType: str, initialValue: ValueInput
+    ) -> ValueCommandInput:
+        return self._add(ValueCommandInput(id, name, unitType, initialValue))
+
+    def addTextBoxCommandInput(
+        self, id: str, name: str, formattedText: str, numRows: int, isReadOnly: bool
+    ) -> TextBoxCommandInput:
+        return self._add(TextBoxCommandInput(id, name, formattedText))
+
+    def itemById(self, id: str):
+        for input in self._items:
+            if input._id == id:
+                return input
+            if isinstance(input, TabCommandInput):
+                found = input._children.itemById(id)
+                if found is not None:
+                    return found
+        return None
+
+
+class TabCommandInput(CommandInput):
+    def __init__(self, id: str, name: str):
+        super().__init__(id, name)
+        self._children = CommandInputs()
+
+    @property
+    def children(self) -> CommandInputs:
+        return self._children
+
+
+class InputChangedEventArgs(ApiObject):
+    def __init__(self, input: CommandInput):
+        self._input = input
+
+    @property
+    def input(self) -> CommandInput:
+        return self._input
+
+
+class Event(ApiObject):
+    def __init__(self):
+        self._handlers: list = []
+
+    def add(self, handler) -> bool:
+        self._handlers.append(handler)
+        return True
+
+    def remove(self, handler) -> bool:
+        self._handlers.remove(handler)
+        return True
+
+
+class CommandDefinition(ApiObject):
+    def __init__(self, id: str, name: str, parent: "CommandDefinitions"):
+        _set(self, id=id, name=name)
+        self._parent = parent
+        self._created = Event()
+
+    @property
+    def commandCreated(self) -> Event:
+        return self._created
+
+    def deleteMe(self) -> bool:
+        self._parent._items.remove(self)
+        return True
+
+
+class CommandDefinitions(ApiCollection):
+    def addButtonDefinition(
+        self, id: str, name: str, tooltip: str, resourceFolder: str = ""
+    ) -> CommandDefinition:
+        if self.itemById(id) is not None:
+            raise RuntimeError(f"Command definition '{id}' already exists")
+        definition = CommandDefinition(id, name, self)
+        self._items.append(definition)
+        return definition
+
+    def itemById(self, id: str) -> Optional[CommandDefinition]:
+        for definition in self._items:
+            if object.__getattribute__(definition, "id") == id:
+                return definition
+        return None
+
+
+class CommandControl(ApiObject):
+    def __init__(self, definition: CommandDefinition, parent: "ToolbarControls"):
+        _set(self, isPromoted=False)
+        self._definition = definition
+        self._parent = parent
+
+    @property
+    def id(self) -> str:
+        return object.__getattribute__(self._definition, "id")
+
+    def deleteMe(self) -> bool:
+        self._parent._items.remove(self)
+        return True
+
+
+class ToolbarControls(ApiCollection):
+    def addCommand(
+        self, definition: CommandDefinition, positionID: str = "", isBefore: bool = True
+    ) -> CommandControl:
+        control = CommandControl(definition, self)
+        self._items.append(control)
+        return control
+
+    def itemById(self, id: str) -> Optional[CommandControl]:
+        for control in self._items:
+            if object.__getattribute__(control, "id") == id:
+                return control
+        return None
+
+
+class ToolbarPanel(ApiObject):
+    def __init__(self):
+        self._controls = ToolbarControls()
+
+    @property
+    def controls(self) -> ToolbarControls:
+        return self._controls
+
+
+class ToolbarPanels(ApiCollection):
+    # Every id names a panel, created on first use
+    def __init__(self):
+        super().__init__()
+        self._panels: dict = {}
+
+    def itemById(self, id: str) -> ToolbarPanel:
+        return self._panels.setdefault(id, ToolbarPanel())
+
+
+class Workspace(ApiObject):
+    def __init__(self):
+        self._panels = ToolbarPanels()
+
+    @property
+    def toolbarPanels(self) -> ToolbarPanels:
+        return self._panels
+
+
+class Workspaces(ApiCollection):
+    def __init__(self):
+        super().__init__()
+        self._workspaces: dict = {}
+
+    def itemById(self, id: str) -> Workspace:
+        return self._workspaces.setdefault(id, Workspace())
+
+
+class UserInterface(ApiObject):
+    def __init__(self):
+        self._messages: List[str] = []
+        self._definitions = CommandDefinitions()
+        self._workspaces = Workspaces()
+
+    def messageBox(self, text: str, *args):
+        self._messages.append(text)
+
+    @property
+    def commandDefinitions(self) -> CommandDefinitions:
+        return self._definitions
+
+    @property
+    def workspaces(self) -> Workspaces:
+        return self._workspaces
+
+
+class Application(ApiObject):
+    _instance: "Application" = None
+
+    def __init__(self):
+        self._ui = UserInterface()
+        self._design = Design()
+
+    @staticmethod
+    def get() -> "Application":
+        _static(Application, "get")
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    @property
+    def userInterface(self) -> UserInterface:
+        return self._ui
+
+    @property
+    def activeProduct(self) -> "Design":
+        return self._design
+
+
+# adsk.fusion
+
+
+class FeatureOperations:
+    JoinFeatureOperation = 0
+    CutFeatureOperation = 1
+    IntersectFeatureOperation = 2
+    NewBodyFeatureOperation = 3
+    NewComponentFeatureOperation = 4
+
+
+class SplineDegrees:
+    SplineDegreeOne = 1
+    SplineDegreeTwo = 2
+    SplineDegreeThree = 3
+    SplineDegreeFive = 5
+
+
+class BRepEntityTypes:
+    BRepBodyEntityType = 0
+    BRepFaceEntityType = 1
+    BRepEdgeEntityType = 2
+    BRepVertexEntityType = 3
+
+
+class Attribute(ApiObject):
+    def __init__(self, group: str, name: str, value: str):
+        self._group = group
+        self._name = name
+        _set(self, value=value)
+
+    @property
+    def groupName(self) -> str:
+        return self._group
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+
+class Attributes(ApiCollection):
+    def add(self, groupName: str, name: str, value: str) -> Attribute:
+        existing = self.itemByName(groupName, name)
+        if existing is not None:
+            _set(existing, value=value)
+            return existing
+        attribute = Attribute(groupName, name, value)
+        self._items.append(attribute)
+        return attribute
+
+    def itemByName(self, groupName: str, name: str) -> Optional[Attribute]:
+        for attribute in self._items:
+            if attribute._group == groupName and attribute._name == name:
+                return attribute
+        return None
+
+
+class UnitsManager(ApiObject):
+    def evaluateExpression(self, expression: str, units: str = "cm") -> float:
+        return _evaluate(expression, units)
+
+    def formatInternalValue(
+        self, internalValue: float, displayUnits: str = "cm", showUnits: bool = True
+    ) -> str:
+        text = f"{internalValue:.6g}"
+        return f"{text} {displayUnits}" if showUnits and displayUnits else text
+
+
+class Snapshots(ApiCollection):
+    def add(self):
+        self._items.append(None)
+        return True
+
+
+class SketchPoint(ApiObject):
+    def __init__(self, geometry: Point3D):
+        self._geometry = geometry
+
+    @property
+    def geometry(self) -> Point3D:
+        return self._geometry
+
+    def merge(self, point: "SketchPoint") -> bool:
+        # Only coincident points can be merged without moving the curves
+        (x, y, _) = point._geometry._xyz
+        (sx, sy, _) = self._geometry._xyz
+        if math.hypot(x - sx, y - sy) > 1e-9:
+            raise RuntimeError("Sketch points to merge are not coincident")
+        return True
+
+
+def _sketch_point(point) -> SketchPoint:
+    return point if isinstance(point, SketchPoint) else SketchPoint(point)
+
+
+class SketchCurve(ApiObject):
+    _always_closed = False
+
+
+class SketchCircle(SketchCurve):
+    _always_closed = True
+
+    def __init__(self, center: Point3D, radius: float):
+        self._center = SketchPoint(center)
+        self._radius = radius
+
+    @property
+    def centerSketchPoint(self) -> SketchPoint:
+        return self._center
+
+    @property
+    def radius(self) -> float:
+        return self._radius
+
+
+class SketchLine(SketchCurve):
+    def __init__(self, start, end):
+        self._start = _sketch_point(start)
+        self._end = _sketch_point(end)
+
+    @property
+    def startSketchPoint(self) -> SketchPoint:
+        return self._start
+
+    @property
+    def endSketchPoint(self) -> SketchPoint:
+        return self._end
+
+
+class SketchSpline(SketchCurve):
+    def __init__(self, points: ObjectCollection):
+        if len(points._items) < 2:
+            raise RuntimeError("A spline needs at least two points")
+        self._points = [_sketch_point(point) for point in points._items]
+        self._closed = False
+
+    @property
+    def startSketchPoint(self) -> SketchPoint:
+        return self._points[0]
+
+    @property
+    def endSketchPoint(self) -> SketchPoint:
+        return self._points[-1]
+
+    @property
+    def isClosed(self) -> bool:
+        return self._closed
+
+    @isClosed.setter
+    def isClosed(self, value: bool):
+        self._closed = value
+
+
+class SketchFittedSpline(SketchSpline):
+    @property
+    def fitPoints(self) -> ObjectCollection:
+        return ObjectCollection(list(self._points))
+
+
+class SketchControlPointSpline(SketchSpline):
+    def __init__(self, points: List[Point3D], degree: int):
+        if len(points) <= degree:
+            raise RuntimeError("Not enough control points for the spline degree")
+        super().__init__(ObjectCollection(list(points)))
+        self._degree = degree
+
+    @property
+    def controlPoints(self) -> list:
+        return [point._geometry for point in self._points]
+
+
+class SketchCurveCollection(ApiCollection):
+    def __init__(self, sketch: "Sketch"):
+        super().__init__()
+        self._sketch = sketch
+
+    def _add(self, curve: SketchCurve) -> SketchCurve:
+        self._items.append(curve)
+        self._sketch._curves.append(curve)
+        return curve
+
+
+class SketchCircles(SketchCurveCollection):
+    def addByCenterRadius(self, centerPoint: Point3D, radius: float) -> SketchCircle:
+        if radius <= 0:
+            raise RuntimeError("Circle radius must be positive")
+        return self._add(SketchCircle(centerPoint, radius))
+
+
+class SketchLines(SketchCurveCollection):
+    def addByTwoPoints(self, startPoint, endPoint) -> SketchLine:
+        return self._add(SketchLine(startPoint, endPoint))
+
+
+class SketchFittedSplines(SketchCurveCollection):
+    def add(self, fitPoints: ObjectCollection) -> SketchFittedSpline:
+        return self._add(SketchFittedSpline(fitPoints))
+
+
+class SketchControlPointSplines(SketchCurveCollection):
+    def add(
+        self, controlPoints: List[Point3D], degree: int
+    ) -> SketchControlPointSpline:
+        return self._add(SketchControlPointSpline(controlPoints, degree))
+
+
+class SketchCurves(ApiObject):
+    def __init__(self, sketch: "Sketch"):
+        self._circles = SketchCircles(sketch)
+        self._lines = SketchLines(sketch)
+        self._fitted = SketchFittedSplines(sketch)
+        self._control = SketchControlPointSplines(sketch)
+
+    @property
+    def sketchCircles(self) -> SketchCircles:
+        return self._circles
+
+    @property
+    def sketchLines(self) -> SketchLines:
+        return self._lines
+
+    @property
+    def sketchFittedSplines(self) -> SketchFittedSplines:
+        return self._fitted
+
+    @property
+    def sketchControlPointSplines(self) -> SketchControlPointSplines:
+        return self._control
+
+
+class Profile(ApiObject):
+    def __init__(self, curves: List[SketchCurve]):
+        self._curves = curves
+
+
+class Sketch(ApiObject):
+    def __init__(self, plane):
+        self._plane = plane
+        self._curves: List[SketchCurve] = []
+        self._sketch_curves = SketchCurves(self)
+
+    @property
+    def sketchCurves(self) -> SketchCurves:
+        return self._sketch_curves
+
+    @property
+    def profiles(self) -> ApiCollection:
+        # One profile per closed curve, and one for the loop formed by the open
+        # curves; nested circles give a disc and an annulus as in Fusion.
+        profiles: List[Profile] = []
+        open_curves = [curve for curve in self._curves if not _is_closed(curve)]
+        if open_curves:
+            profiles.append(Profile(open_curves))
+        closed = [curve for curve in self._curves if _is_closed(curve)]
+        for (i, curve) in enumerate(closed):
+            inner = [
+                other
+                for other in closed[:i]
+                if isinstance(curve, SketchCircle)
+                and isinstance(other, SketchCircle)
+                and other._radius < curve._radius
+            ]
+            profiles.append(Profile([curve] + inner))
+        return ApiCollection(profiles)
+
+
+def _is_closed(curve: SketchCurve) -> bool:
+    return curve._always_closed or (isinstance(curve, SketchSpline) and curve._closed)
+
+
+class Sketches(ApiCollection):
+    def add(self, planarEntity) -> Sketch:
+        sketch = Sketch(planarEntity)
+        self._items.append(sketch)
+        return sketch
+
+
+class ConstructionPlane(ApiObject):
+    def __init__(self, offset: float = 0.0):
+        self._offset = offset
+
+
+class ConstructionAxis(ApiObject):
+    pass
+
+
+class ConstructionPlaneInput(ApiObject):
+    def __init__(self):
+        self._offset = None
+
+    def setByOffset(self, planarEntity: ConstructionPlane, offset: ValueInput) -> bool:
+        self._offset = planarEntity._offset + offset._value()
+        return True
+
+
+class ConstructionPlanes(ApiCollection):
+    def createInput(self) -> ConstructionPlaneInput:
+        return ConstructionPlaneInput()
+
+    def add(self, input: ConstructionPlaneInput) -> ConstructionPlane:
+        if input._offset is None:
+            raise RuntimeError("Construction plane input is not defined")
+        plane = ConstructionPlane(input._offset)
+        self._items.append(plane)
+        return plane
+
+
+def _rotate(point: Optional[tuple], angle: float) -> Optional[tuple]:
+    if point is None:
+        return None
+    (c, s) = (math.cos(angle), math.sin(angle))
+    return (point[0] * c - point[1] * s, point[0] * s + point[1] * c) + point[2:]
+
+
+class BRepEdge(ApiObject):
+    # Only vertical edges are modelled; _xy is where they pierce the sketch plane
+    def __init__(self, length: float, xy: Optional[tuple] = None):
+        self._length = length
+        self._xy = xy
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+class BRepFace(ApiObject):
+    # _circle is (x, y, radius) for the cylindrical side face of a circle
+    def __init__(self, edges: List[BRepEdge], circle: Optional[tuple] = None):
+        self._edges = edges
+        self._circle = circle
+
+    @property
+    def edges(self) -> ApiCollection:
+        return ApiCollection(self._edges)
+
+
+class BRepBody(ApiObject):
+    def __init__(self, faces: List[BRepFace]):
+        _set(self, name="Body")
+        self._faces = faces
+
+    @property
+    def faces(self) -> ApiCollection:
+        return ApiCollection(self._faces)
+
+    def _copy(self, angle: float = 0.0) -> "BRepBody":
+        return BRepBody(
+            [
+                BRepFace(
+                    [BRepEdge(edge._length, _rotate(edge._xy, angle)) for edge in face._edges],
+                    _rotate(face._circle, angle),
+                )
+                for face in self._faces
+            ]
+        )
+
+    def _join(self, faces: List[BRepFace]):
+        # Cylinders that cross gain a vertical edge at each intersection point
+        for face in faces:
+            for other in self._faces:
+                if face._circle is None or other._circle is None:
+                    continue
+                for xy in _circle_intersections(face._circle, other._circle):
+                    face._edges.append(BRepEdge(face._edges[0]._length, xy))
+        self._faces.extend(faces)
+
+
+def _circle_intersections(a: tuple, b: tuple) -> List[tuple]:
+    (dx, dy) = (b[0] - a[0], b[1] - a[1])
+    d = math.hypot(dx, dy)
+    if d == 0 or d > a[2] + b[2] or d < abs(a[2] - b[2]):
+        return []
+    along = (d * d + a[2] * a[2] - b[2] * b[2]) / (2 * d)
+    half = math.sqrt(max(a[2] * a[2] - along * along, 0.0))
+    (mx, my) = (a[0] + dx * along / d, a[1] + dy * along / d)
+    return [
+        (mx - dy * half / d, my + dx * half / d),
+        (mx + dy * half / d, my - dx * half / d),
+    ]
+
+
+def _extrude_faces(profile: Profile, distance: float) -> List[BRepFace]:
+    # A side face per curve, each with a vertical seam edge, plus the two caps
+    sides: List[BRepFace] = []
+    for curve in profile._curves:
+        if isinstance(curve, SketchCircle):
+            (x, y, _) = curve._center._geometry._xyz
+            circle = (x, y, curve._radius)
+            sides.append(BRepFace([BRepEdge(distance, (x + curve._radius, y))], circle))
+        else:
+            sides.append(BRepFace([BRepEdge(distance)]))
+    return [BRepFace([]), BRepFace([])] + sides
+
+
+class Feature(ApiObject):
+    def __init__(self, bodies: List[BRepBody]):
+        self._bodies = bodies
+
+    @property
+    def bodies(self) -> ApiCollection:
+        return ApiCollection(self._bodies)
+
+
+class ExtrudeFeature(Feature):
+    pass
+
+
+class CircularPatternFeature(Feature):
+    pass
+
+
+class CombineFeature(Feature):
+    pass
+
+
+class FilletFeature(Feature):
+    pass
+
+
+class ComponentFeatures(ApiCollection):
+    def __init__(self, component: "Component"):
+        super().__init__()
+        self._component = component
+
+
+class ExtrudeFeatures(ComponentFeatures):
+    def addSimple(
+        self, profile: Profile, distance: ValueInput, operation: int
+    ) -> ExtrudeFeature:
+        if not isinstance(profile, Profile):
+            raise RuntimeError("Extrude needs a sketch profile")
+        faces = _extrude_faces(profile, abs(distance._value()))
+        bodies = self._component._bodies
+        if operation == FeatureOperations.NewBodyFeatureOperation:
+            body = BRepBody(faces)
+            bodies.append(body)
+            created = [body]
+        elif operation == FeatureOperations.JoinFeatureOperation:
+            if not bodies:
+                raise RuntimeError("No target body to join to")
+            # Joins every body in the component into the first
+            target = bodies[0]
+            for body in bodies[1:]:
+                target._join(body._faces)
+            del bodies[1:]
+            target._join(faces)
+            created = [target]
+        elif operation == FeatureOperations.CutFeatureOperation:
+            if not bodies:
+                raise RuntimeError("No target body to cut")
+            created = []
+        else:
+            raise RuntimeError(f"Unsupported extrude operation {operation}")
+        feature = ExtrudeFeature(created)
+        self._items.append(feature)
+        return feature
+
+
+class CircularPatternFeatureInput(ApiObject):
+    def __init__(self, entities: ObjectCollection, axis: ConstructionAxis):
+        self._entities = list(entities._items)
+        _set(self, quantity=None, totalAngle=None, isSymmetric=False)
+
+
+class CircularPatternFeatures(ComponentFeatures):
+    def createInput(
+        self, inputEntities: ObjectCollection, axis: ConstructionAxis
+    ) -> CircularPatternFeatureInput:
+        if not inputEntities._items:
+            raise RuntimeError("Circular pattern has no input entities")
+        return CircularPatternFeatureInput(inputEntities, axis)
+
+    def add(self, input: CircularPatternFeatureInput) -> CircularPatternFeature:
+        quantity: ValueInput = object.__getattribute__(input, "quantity")
+        if quantity is None:
+            raise RuntimeError("Circular pattern quantity is not set")
+        bodies: List[BRepBody] = []
+        for entity in input._entities:
+            # Patterning a body or a body-creating feature copies the bodies
+            sources = [entity] if isinstance(entity, BRepBody) else entity._bodies
+            count = int(quantity._value())
+            for source in sources:
+                bodies.append(source)
+                for i in range(1, count):
+                    copy = source._copy(2 * math.pi * i / count)
+                    self._component._bodies.append(copy)
+                    bodies.append(copy)
+        feature = CircularPatternFeature(bodies)
+        self._items.append(feature)
+        return feature
+
+
+class CombineFeatureInput(ApiObject):
+    def __init__(self, targetBody: BRepBody, toolBodies: ObjectCollection):
+        self._target = targetBody
+        self._tools = list(toolBodies._items)
+        _set(
+            self,
+            operation=FeatureOperations.JoinFeatureOperation,
+            isNewComponent=False,
+        )
+
+
+class CombineFeatures(ComponentFeatures):
+    def createInput(
+        self, targetBody: BRepBody, toolBodies: ObjectCollection
+    ) -> CombineFeatureInput:
+        return CombineFeatureInput(targetBody, toolBodies)
+
+    def add(self, input: CombineFeatureInput) -> CombineFeature:
+        if not input._tools:
+            raise RuntimeError("Combine has no tool bodies")
+        bodies = self._component._bodies
+        for tool in input._tools:
+            input._target._join(tool._faces)
+            bodies.remove(tool)
+        feature = CombineFeature([input._target])
+        self._items.append(feature)
+        return feature
+
+
+class FilletFeatureInput(ApiObject):
+    def __init__(self):
+        self._edge_sets: list = []
+        _set(self, isG2=False, isRollingBallCorner=True)
+
+    def addConstantRadiusEdgeSet(
+        self, edges: ObjectCollection, radius: ValueInput, isTangentChain: bool
+    ) -> bool:
+        self._edge_sets.append((list(edges._items), radius))
+        return True
+
+
+class FilletFeatures(ComponentFeatures):
+    def createInput(self) -> FilletFeatureInput:
+        return FilletFeatureInput()
+
+    def add(self, input: FilletFeatureInput) -> FilletFeature:
+        if not input._edge_sets or not all(edges for (edges, _) in input._edge_sets):
+            raise RuntimeError("Fillet has no edges")
+        feature = FilletFeature([])
+        self._items.append(feature)
+        return feature
+
+
+class Features(ApiObject):
+    def __init__(self, component: "Component"):
+        self._extrude = ExtrudeFeatures(component)
+        self._circular = CircularPatternFeatures(component)
+        self._combine = CombineFeatures(component)
+        self._fillet = FilletFeatures(component)
+
+    @property
+    def extrudeFeatures(self) -> ExtrudeFeatures:
+        return self._extrude
+
+    @property
+    def circularPatternFeatures(self) -> CircularPatternFeatures:
+        return self._circular
+
+    @property
+    def combineFeatures(self) -> CombineFeatures:
+        return self._combine
+
+    @property
+    def filletFeatures(self) -> FilletFeatures:
+        return self._fillet
+
+
+class CustomGraphicsCoordinates(ApiObject):
+    def __init__(self, coordinates: list):
+        self._coordinates = coordinates
+
+    @staticmethod
+    def create(coordinates: list) -> "CustomGraphicsCoordinates":
+        _static(CustomGraphicsCoordinates, "create")
+        if len(coordinates) % 3:
+            raise RuntimeError("Coordinates must be x, y, z triples")
+        return CustomGraphicsCoordinates(list(coordinates))
+
+
+class CustomGraphicsGroup(ApiObject):
+    def __init__(self):
+        self._lines: list = []
+
+    def addLines(
+        self,
+        coordinates: CustomGraphicsCoordinates,
+        indexList: list,
+        isLineStrip: bool,
+        lineStripLengths: list = None,
+    ):
+        if lineStripLengths and sum(lineStripLengths) * 3 != len(
+            coordinates._coordinates
+        ):
+            raise RuntimeError("Line strip lengths do not match the coordinates")
+        self._lines.append((coordinates, lineStripLengths))
+        return self
+
+
+class CustomGraphicsGroups(ApiCollection):
+    def add(self) -> CustomGraphicsGroup:
+        group = CustomGraphicsGroup()
+        self._items.append(group)
+        return group
+
+
+class Occurrence(ApiObject):
+    def __init__(self, component: "Component", transform: Matrix3D, parent):
+        self._component = component
+        self._transform = transform.copy()
+        self._parent = parent
+        self._attributes = Attributes()
+
+    @property
+    def component(self) -> "Component":
+        return self._component
+
+    @property
+    def transform(self) -> Matrix3D:
+        return self._transform.copy()
+
+    @transform.setter
+    def transform(self, value: Matrix3D):
+        self._transform = value.copy()
+
+    @property
+    def attributes(self) -> "Attributes":
+        return self._attributes
+
+    def deleteMe(self) -> bool:
+        self._parent._items.remove(self)
+        return True
+
+
+class Occurrences(ApiCollection):
+    def __init__(self, design: "Design"):
+        super().__init__()
+        self._design = design
+
+    def addNewComponent(self, transform: Matrix3D) -> Occurrence:
+        occurrence = Occurrence(Component(self._design), transform, self)
+        self._items.append(occurrence)
+        return occurrence
+
+    def addExistingComponent(self, component: "Component", transform: Matrix3D) -> Occurrence:
+        occurrence = Occurrence(component, transform, self)
+        self._items.append(occurrence)
+        return occurrence
+
+
+class Component(ApiObject):
+    def __init__(self, design: "Design"):
+        _set(self, name="Component")
+        self._design = design
+        self._bodies: List[BRepBody] = []
+        self._occurrences = Occurrences(design)
+        self._planes = ConstructionPlanes()
+        self._xy_plane = ConstructionPlane()
+        self._z_axis = ConstructionAxis()
+        self._sketches = Sketches()
+        self._features = Features(self)
+        self._graphics = CustomGraphicsGroups()
+        self._attributes = Attributes()
+
+    @property
+    def occurrences(self) -> Occurrences:
+        return self._occurrences
+
+    @property
+    def constructionPlanes(self) -> ConstructionPlanes:
+        return self._planes
+
+    @property
+    def xYConstructionPlane(self) -> ConstructionPlane:
+        return self._xy_plane
+
+    @property
+    def zConstructionAxis(self) -> ConstructionAxis:
+        return self._z_axis
+
+    @property
+    def sketches(self) -> Sketches:
+        return self._sketches
+
+    @property
+    def features(self) -> Features:
+        return self._features
+
+    @property
+    def bRepBodies(self) -> ApiCollection:
+        return ApiCollection(self._bodies)
+
+    def findBRepUsingPoint(
+        self,
+        point: Point3D,
+        entityType: int,
+        proximityTolerance: float = 0.0001,
+        visibleEntitiesOnly: bool = True,
+    ) -> ObjectCollection:
+        if entityType != BRepEntityTypes.BRepEdgeEntityType:
+            raise RuntimeError("Only edge lookups are modelled")
+        (x, y, z) = point._xyz
+        found = ObjectCollection()
+        for body in self._bodies:
+            for face in body._faces:
+                for edge in face._edges:
+                    if (
+                        edge._xy is not None
+                        and 0 <= z <= edge._length
+                        and math.hypot(edge._xy[0] - x, edge._xy[1] - y)
+                        <= proximityTolerance
+                    ):
+                        found._items.append(edge)
+        return found
+
+    @property
+    def customGraphicsGroups(self) -> CustomGraphicsGroups:
+        return self._graphics
+
+    @property
+    def attributes(self) -> Attributes:
+        return self._attributes
+
+
+class Design(ApiObject):
+    def __init__(self):
+        self._attributes = Attributes()
+        self._units = UnitsManager()
+        self._snapshots = Snapshots()
+        self._root = Component(self)
+
+    @staticmethod
+    def cast(product) -> Optional["Design"]:
+        _static(Design, "cast")
+        return product if isinstance(product, Design) else None
+
+    @property
+    def rootComponent(self) -> Component:
+        return self._root
+
+    @property
+    def attributes(self) -> Attributes:
+        return self._attributes
+
+    @property
+    def unitsManager(self) -> UnitsManager:
+        return self._units
+
+    @property
+    def snapshots(self) -> Snapshots:
+        return self._snapshots
+
+
+CORE = (
+    Application,
+    UserInterface,
+    Point3D,
+    Vector3D,
+    Matrix3D,
+    ObjectCollection,
+    ValueInput,
+    CommandInputs,
+    ValueCommandInput,
+    TextBoxCommandInput,
+    TabCommandInput,
+    InputChangedEventArgs,
+    Event,
+)
+FUSION = (
+    Design,
+    Component,
+    Occurrence,
+    FeatureOperations,
+    SplineDegrees,
+    BRepEntityTypes,
+    CustomGraphicsCoordinates,
+    Sketch,
+    SketchCircles,
+    BRepBody,
+    BRepEdge,
+)
+
+
+class _AnnotationModule(types.ModuleType):
+    # Type annotations name many more classes than are modelled; they resolve
+    # to object so the add-in modules import cleanly.
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return object
+
+
+def new_design() -> Design:
+    # Replaces the active product with an empty design
+    application = Application.get()
+    application._design = Design()
+    return application._design
+
+
+def install(new_recorder: Recorder = None) -> Recorder:
+    # Registers adsk, adsk.core and adsk.fusion in sys.modules with a fresh
+    # design, and counts API calls on the given recorder.
+    global recorder
+    recorder = new_recorder or Recorder()
+
+    adsk = types.ModuleType("adsk")
+    adsk.core = _AnnotationModule("adsk.core")
+    adsk.fusion = _AnnotationModule("adsk.fusion")
+    for cls in CORE:
+        setattr(adsk.core, cls.__name__, cls)
+    for cls in FUSION:
+        setattr(adsk.fusion, cls.__name__, cls)
+    sys.modules["adsk"] = adsk
+    sys.modules["adsk.core"] = adsk.core
+    sys.modules["adsk.fusion"] = adsk.fusion
+    return recorder
@@ -0,0 +1,190 @@
+import argparse
+import sys
+from typing import Callable, Dict, List, Tuple
+
+import addin
+import adsk_stub
+
+# Fails (exit status 1) when a dialog event or a gear build makes more Fusion
+# API calls than its budget, as counted by the adsk_stub backend. Raise a budget
+# only together with the change that needs the extra calls.
+#   python tools/api_budget.py
+#   python tools/api_budget.py --verbose
+
+BUDGETS: Dict[str, int] = {
+    "create_inputs": 110,
+    "input_changed/ring_gear_pins": 35,
+    "input_changed/rotor_thickness": 20,
+    "preview/pins=50": 20,
+    "draw_gear/pins=10": 950,
+    "draw_gear/pins=50": 2500,
+    "draw_gear/pins=200": 7000,
+    "draw_compound/3x pins=50": 2800,
+    "draw_compound/pins=20,50": 4000,
+    "regenerate/unchanged": 50,
+    "regenerate/output_pin_diameter": 1900,
+    "regenerate/camshaft_diameter": 125,
+    "execute/output_pin_diameter": 1150,
+}
+
+
+class FailureUI:
+    def messageBox(self, message: str):
+        raise RuntimeError(message)
+
+
+def scenarios(logic) -> List[Tuple[str, Callable]]:
+    import adsk.core
+    from cycloidal_gear_maker.commands.cycloidalGearCreate.cache import ProfileCache
+    from cycloidal_gear_maker.commands.cycloidalGearCreate.settings import (
+        CycloidalGearSettings,
+    )
+
+    def dialog():
+        gear = logic.CycloidalGearLogic(des=adsk_stub.new_design())
+        inputs = adsk.core.CommandInputs()
+        gear.CreateCommandInputs(inputs)
+        return (gear, inputs)
+
+    def create_inputs():
+        gear = logic.CycloidalGearLogic(des=adsk_stub.new_design())
+        return lambda: gear.CreateCommandInputs(adsk.core.CommandInputs())
+
+    def input_changed(field_name: str, expression: str):
+        def setup():
+            (gear, inputs) = dialog()
+            changed = inputs.itemById(field_name)
+            changed.expression = expression
+            args = adsk.core.InputChangedEventArgs(changed)
+            return lambda: gear.HandleInputsChanged(args)
+
+        return setup
+
+    def preview(pins: int):
+        def setup():
+            (gear, inputs) = dialog()
+            gear._settings.ring_gear_pins = pins
+            return lambda: gear.HandlePreview(None)
+
+        return setup
+
+    def draw_gear(pins: int):
+        def setup():
+            gear = logic.CycloidalGearLogic(des=adsk_stub.new_design())
+            gear._settings = CycloidalGearSettings(ring_gear_pins=pins)
+            logic.profile_cache = ProfileCache()
+            return gear._draw_gear
+
+        return setup
+
+    def draw_compound(*pin_counts: int):
+        def setup():
+            gear = logic.CycloidalGearLogic(des=adsk_stub.new_design())
+            stages = [CycloidalGearSettings(ring_gear_pins=pins) for pins in pin_counts]
+            logic.profile_cache = ProfileCache()
+            return lambda: gear.DrawCompound(stages)
+
+        return setup
+
+    def regenerate(**changes):
+        def setup():
+            gear = logic.CycloidalGearLogic(des=adsk_stub.new_design())
+            previous = CycloidalGearSettings(ring_gear_pins=50)
+            gear._settings = previous
+            logic.profile_cache = ProfileCache()
+            gear._draw_gear()
+            gear._settings = CycloidalGearSettings(ring_gear_pins=50, **changes)
+            return lambda: gear._regenerate(previous)
+
+        return setup
+
+    def execute(field_name: str, expression: str, rebuilt: Tuple[str, ...]):
+        # Two OK presses on one design, the second with one input changed; the
+        # check after the counted run fails unless exactly the parts that
+        # depend on the input were rebuilt
+        def setup():
+            design = adsk_stub.new_design()
+            logic.profile_cache = ProfileCache()
+            gear = logic.CycloidalGearLogic(des=design)
+            gear.CreateCommandInputs(adsk.core.CommandInputs())
+            gear.HandleExecute(None)
+
+            gear = logic.CycloidalGearLogic(des=design)
+            inputs = adsk.core.CommandInputs()
+            gear.CreateCommandInputs(inputs)
+            inputs.itemById(field_name).expression = expression
+            before = {id(occurrence) for (_, _, occurrence) in gear._generated_parts()}
+
+            def check():
+                parts = {
+                    part
+                    for (part, _, occurrence) in gear._generated_parts()
+                    if id(occurrence) not in before
+                }
+                if parts != set(rebuilt):
+                    return f"rebuilt {sorted(parts)}, expected {sorted(rebuilt)}"
+                return None
+
+            def run():
+                gear.HandleExecute(None)
+                return check
+
+            return run
+
+        return setup
+
+    return [
+        ("create_inputs", create_inputs),
+        ("input_changed/ring_gear_pins", input_changed("ring_gear_pins", "30")),
+        ("input_changed/rotor_thickness", input_changed("rotor_thickness", "6 mm")),
+        ("preview/pins=50", preview(50)),
+        ("draw_gear/pins=10", draw_gear(10)),
+        ("draw_gear/pins=50", draw_gear(50)),
+        ("draw_gear/pins=200", draw_gear(200)),
+        ("draw_compound/3x pins=50", draw_compound(50, 50, 50)),
+        ("draw_compound/pins=20,50", draw_compound(20, 50)),
+        ("regenerate/unchanged", regenerate()),
+        ("regenerate/output_pin_diameter", regenerate(output_pin_diameter=0.4)),
+        ("regenerate/camshaft_diameter", regenerate(camshaft_diameter=1.2)),
+        (
+            "execute/output_pin_diameter",
+            execute("output_pin_diameter", "4 mm", ("rotor", "output")),
+        ),
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check Fusion API call budgets.")
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="list the most called members"
+    )
+    args = parser.parse_args(argv)
+
+    (logic, recorder) = addin.load()
+    logic.ui = FailureUI()
+
+    failed = 0
+    for (name, setup) in scenarios(logic):
+        run = setup()
+        recorder.reset()
+        result = run()
+        calls = recorder.total
+        budget = BUDGETS[name]
+        # Scenarios may return a check to run outside the counted calls
+        error = result() if callable(result) else None
+
+        status = "ok" if calls <= budget else "OVER BUDGET"
+        if error:
+            status = f"FAILED: {error}"
+        if calls > budget or error:
+            failed += 1
+        print(f"{name:<32} {calls:6d} / {budget:6d}  {status}")
+        if args.verbose:
+            for (member, count) in recorder.counts.most_common(8):
+                print(f"    {member:<40} {count:6d}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, List, Optional
+
+import addin
+import adsk_stub
+
+# Benchmarks for rotor profile generation and the full _draw_gear build against
+# the recording adsk stand-in. Results are written as JSON so runs on different
+# commits can be compared:
+#   python tools/benchmark.py -o before.json
+#   python tools/benchmark.py -o after.json --compare before.json
+
+PIN_COUNTS = (10, 20, 50, 100, 150, 200)
+TOLERANCES = (1e-3, 1e-4, 1e-5)
+DRAW_PIN_COUNTS = (10, 50, 100, 200)
+
+
+class FailureUI:
+    # Replaces logic.ui so a failed build raises instead of opening a message box
+    def messageBox(self, message: str):
+        raise RuntimeError(message)
+
+
+def best_time(run: Callable, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return (best, result)
+
+
+def profile_benchmarks(repeat: int) -> List[dict]:
+    from cycloidalGearCreate import kernel
+    from cycloidalGearCreate.profile import Epitrochoid
+    from cycloidalGearCreate.settings import CycloidalGearSettings
+
+    results: List[dict] = []
+    for pins in PIN_COUNTS:
+        settings = CycloidalGearSettings(ring_gear_pins=pins)
+        trochoid = Epitrochoid.from_settings(settings)
+        # Point spacing the distance-driven samplers were run with
+        maximum_distance = 0.25 * settings.ring_gear_pin_radius
+        samplers = {
+            "bisection": lambda: trochoid.sample_lobe_bisection(
+                maximum_distance, 0.5 * maximum_distance
+            ),
+            "arc_length": lambda: trochoid.sample_lobe(maximum_distance),
+        }
+        for tolerance in TOLERANCES:
+            samplers[f"adaptive_{tolerance:g}"] = (
+                lambda tolerance=tolerance: trochoid.sample_lobe_adaptive(tolerance)
+            )
+
+        for (name, run) in samplers.items():
+            (seconds, sample) = best_time(run, repeat)
+            results.append(
+                {
+                    "benchmark": f"profile/{name}/pins={pins}",
+                    "seconds": seconds,
+                    "points": len(sample.xs),
+                    "evaluations": sample.evaluations,
+                    "fits": 0,
+                    "api_calls": 0,
+                }
+            )
+
+        # Control points per lobe that replace the fitted spline's points
+        for tolerance in TOLERANCES:
+            spline_settings = CycloidalGearSettings(
+                ring_gear_pins=pins, spline_fit_tolerance=tolerance
+            )
+            (seconds, lobe_spline) = best_time(
+                lambda: kernel.rotor_spline(spline_settings), repeat
+            )
+            results.append(
+                {
+                    "benchmark": f"spline_fit_{tolerance:g}/pins={pins}",
+                    "seconds": seconds,
+                    "points": len(lobe_spline),
+                    "evaluations": 0,
+                    "fits": lobe_spline.fits,
+                    "api_calls": 0,
+                }
+            )
+    return results
+
+
+def draw_benchmarks(repeat: int) -> List[dict]:
+    (logic, recorder) = addin.load()
+    from cycloidal_gear_maker.commands.cycloidalGearCreate import kernel
+    from cycloidal_gear_maker.commands.cycloidalGearCreate.cache import ProfileCache
+    from cycloidal_gear_maker.commands.cycloidalGearCreate.settings import (
+        CycloidalGearSettings,
+    )
+
+    logic.ui = FailureUI()
+    results: List[dict] = []
+    for pins in DRAW_PIN_COUNTS:
+        settings = CycloidalGearSettings(ring_gear_pins=pins)
+
+        def run():
+            gear = logic.CycloidalGearLogic(des=adsk_stub.new_design())
+            gear._settings = settings
+            logic.profile_cache = ProfileCache()
+            recorder.reset()
+            gear._draw_gear()
+            return recorder.total
+
+        (seconds, api_calls) = best_time(run, repeat)
+        lobe = kernel.rotor_lobe(settings, logic.profile_cache)
+        results.append(
+            {
+                "benchmark": f"draw_gear/pins={pins}",
+                "seconds": seconds,
+                "points": len(lobe.xs) * settings.rotor_lobes,
+                "evaluations": lobe.evaluations,
+                "fits": 0,
+                "api_calls": api_calls,
+            }
+        )
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=addin.ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the gear generation benchmarks.")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.join(addin.ROOT, "commands"))
+    results = profile_benchmarks(args.repeat) + draw_benchmarks(args.repeat)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    previous: dict = {}
+    if args.compare:
+        with open(args.compare, "r") as f:
+            previous = {r["benchmark"]: r for r in json.load(f)["results"]}
+
+    for result in results:
+        line = (
+            f"{result['benchmark']:<36} {result['seconds'] * 1000:9.3f} ms "
+            f"{result['points']:7d} pts {result['evaluations']:7d} evals "
+            f"{result['fits']:5d} fits {result['api_calls']:7d} api"
+        )
+        if result["benchmark"] in previous:
+            line += f"  x{previous[result['benchmark']]['seconds'] / result['seconds']:.2f}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
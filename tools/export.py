@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Write DXF and SVG outlines of every part outside Fusion 360:
+#   python tools/export.py -o parts
+#   python tools/export.py grid.json -o parts --format dxf --tolerance 0.00001
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.export import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Simulate the drive and its transmission error outside Fusion 360:
+#   python tools/kinematics.py
+#   python tools/kinematics.py settings.json -o motion.json --samples 100000 --frames 60
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.kinematics import main
+
+if __name__ == "__main__":
+    sys.exit(main())
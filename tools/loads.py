@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Ring pin loads against crank angle for an output torque in N m:
+#   python tools/loads.py 20
+#   python tools/loads.py 20 settings.json -o loads.json --samples 36000 --ideal
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.loads import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Write binary STL meshes of the gear parts outside Fusion 360:
+#   python tools/mesh.py -o meshes
+#   python tools/mesh.py settings.json -o meshes --parts rotor ring_gear --tolerance 0.0001
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.mesh import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.mesh import gear_meshes
+from cycloidalGearCreate.optimize import OptimizeTarget, optimize
+from cycloidalGearCreate.settings import CycloidalGearSettings
+
+# Meshes every part of the default gear at several pin counts and of every
+# design on an optimizer front, and fails (exit status 1) when a part cannot be
+# meshed or its mesh is not closed: every edge must be used once in each
+# direction.
+#   python tools/mesh_check.py
+#   python tools/mesh_check.py --target 30 6.0 0.1 0.05
+
+PIN_COUNTS = (12, 20, 41, 50, 80, 150)
+TARGET = (40, 8.0, 0.1, 0.05)
+
+
+def open_edges(mesh) -> int:
+    t = mesh.triangles
+    edges = Counter(zip(t[0::3] + t[1::3] + t[2::3], t[1::3] + t[2::3] + t[0::3]))
+    return sum(
+        1 for (edge, count) in edges.items() if count != 1 or edges[edge[::-1]] != 1
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check that the default and optimized gears mesh closed."
+    )
+    parser.add_argument(
+        "--target",
+        nargs=4,
+        type=float,
+        default=TARGET,
+        metavar=("RATIO", "ENVELOPE", "MIN_WALL", "RATIO_TOLERANCE"),
+        help="optimizer target whose front is meshed",
+    )
+    args = parser.parse_args(argv)
+
+    designs = [(f"pins={pins}", {"ring_gear_pins": pins}) for pins in PIN_COUNTS]
+    (front, _) = optimize(OptimizeTarget(*args.target))
+    designs.extend(
+        (f"front {i}", design.overrides) for (i, design) in enumerate(front)
+    )
+
+    failed = 0
+    for (name, overrides) in designs:
+        try:
+            meshes = gear_meshes(CycloidalGearSettings.from_dict(overrides))
+            problems = [
+                f"{part}: {edges} open edges"
+                for (part, mesh) in meshes
+                if (edges := open_edges(mesh))
+            ]
+        except ValueError as e:
+            problems = [str(e)]
+        if problems:
+            failed += 1
+            print(f"{name:<12} {overrides}  FAILED: {'; '.join(problems)}")
+    print(f"{len(designs)} designs, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
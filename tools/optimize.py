@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Search for settings that meet a ratio, envelope and wall thickness:
+#   python tools/optimize.py 20 6.0 0.2
+#   python tools/optimize.py 30 8.0 0.15 --ratio-tolerance 0.1 -o front.jsonl
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.optimize import main
+
+if __name__ == "__main__":
+    sys.exit(main())
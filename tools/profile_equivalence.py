@@ -0,0 +1,76 @@
+import argparse
+import math
+import sys
+
+import addin
+
+# Checks the batched profile math in profile.py against the original scalar
+# CycloidalGearLogic._getPoint, point by point over whole rotations and over
+# mirrored lobes, and fails (exit status 1) on any difference beyond rounding.
+#   python tools/profile_equivalence.py
+
+PIN_COUNTS = (3, 10, 20, 50, 80, 150)
+SAMPLES = 2000
+# Relative to the rotor radius
+TOLERANCE = 1e-12
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check the batched rotor profile against _getPoint."
+    )
+    parser.add_argument(
+        "-n", "--samples", type=int, default=SAMPLES, help="thetas per check"
+    )
+    args = parser.parse_args(argv)
+
+    (logic, _) = addin.load()
+    from cycloidal_gear_maker.commands.cycloidalGearCreate.profile import Epitrochoid
+    from cycloidal_gear_maker.commands.cycloidalGearCreate.settings import (
+        CycloidalGearSettings,
+    )
+
+    failed = 0
+    for pins in PIN_COUNTS:
+        settings = CycloidalGearSettings(ring_gear_pins=pins)
+        trochoid = Epitrochoid.from_settings(settings)
+
+        def reference(thetas):
+            return [
+                logic.CycloidalGearLogic._getPoint(
+                    None,
+                    theta,
+                    settings.rotor_radius,
+                    settings.ring_gear_pin_radius,
+                    settings.eccentric_offset,
+                    settings.ring_gear_pins,
+                )
+                for theta in thetas
+            ]
+
+        thetas = [2 * math.pi * i / args.samples for i in range(args.samples + 1)]
+        half = [
+            trochoid.lobe_angle / 2 * i / args.samples for i in range(args.samples + 1)
+        ]
+        # The mirrored lobe stands for the points at lobe_angle - theta
+        lobe_thetas = half + [trochoid.lobe_angle - theta for theta in half[-2::-1]]
+        checks = {
+            "points": (trochoid.points(thetas), reference(thetas)),
+            "lobe_points": (trochoid.lobe_points(half), reference(lobe_thetas)),
+        }
+
+        for (name, ((xs, ys), expected)) in checks.items():
+            error = max(
+                math.hypot(x - ex, y - ey) for (x, y, (ex, ey)) in zip(xs, ys, expected)
+            )
+            ok = len(xs) == len(expected) and error <= TOLERANCE * settings.rotor_radius
+            if not ok:
+                failed += 1
+            status = "ok" if ok else "MISMATCH"
+            print(f"pins={pins:<4} {name:<12} {len(xs):6d} pts  {error:.2e}  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import types
+
+import addin
+
+# Loads the add-in the way Fusion 360 does at launch, against adsk_stub, and
+# fails (exit status 1) when startup imports a module that should wait for the
+# first command_created, or takes longer than config.STARTUP_BUDGET_MS.
+#   python tools/startup.py
+
+# Modules only the command itself needs
+DEFERRED = ("logic", "settings", "kernel", "profile", "cache")
+
+
+def loaded_deferred() -> list:
+    prefix = f"{addin.PACKAGE}.commands.cycloidalGearCreate."
+    return [name for name in DEFERRED if prefix + name in sys.modules]
+
+
+def command_created_args():
+    import adsk.core
+
+    command = types.SimpleNamespace(
+        commandInputs=adsk.core.CommandInputs(),
+        execute=adsk.core.Event(),
+        inputChanged=adsk.core.Event(),
+        executePreview=adsk.core.Event(),
+        validateInputs=adsk.core.Event(),
+        destroy=adsk.core.Event(),
+        isExecutedWhenPreEmpted=True,
+    )
+    return types.SimpleNamespace(command=command)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check add-in startup time.")
+    parser.parse_args(argv)
+
+    addin.register()
+
+    path = os.path.join(addin.ROOT, "Cycloidal Gear Maker.py")
+    spec = importlib.util.spec_from_file_location(f"{addin.PACKAGE}.main", path)
+    main_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main_module)
+    main_module.run(None)
+    early = loaded_deferred()
+
+    config = importlib.import_module(f"{addin.PACKAGE}.config")
+    entry = importlib.import_module(f"{addin.PACKAGE}.commands.cycloidalGearCreate.entry")
+    start = time.perf_counter()
+    entry.command_created(command_created_args())
+    created_ms = (time.perf_counter() - start) * 1000
+
+    total_ms = main_module.import_ms + main_module.start_ms
+    print(f"import          {main_module.import_ms:8.1f} ms")
+    print(f"start           {main_module.start_ms:8.1f} ms")
+    print(f"command_created {created_ms:8.1f} ms (first, imports logic)")
+
+    failed = False
+    if early:
+        print(f"Imported at startup: {', '.join(early)}")
+        failed = True
+    if not loaded_deferred():
+        print("command_created did not import logic")
+        failed = True
+    if total_ms > config.STARTUP_BUDGET_MS:
+        print(f"Startup {total_ms:.1f} ms is over {config.STARTUP_BUDGET_MS} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
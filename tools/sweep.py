@@ -0,0 +1,13 @@
+import os
+import sys
+
+# Run the parameter sweep outside Fusion 360:
+#   python tools/sweep.py grid.json -o results.jsonl
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "commands")
+)
+
+from cycloidalGearCreate.sweep import main
+
+if __name__ == "__main__":
+    sys.exit(main())